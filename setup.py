@@ -15,6 +15,10 @@ setup(
         'coverage',
         'postcodes-uk',
     ],
+    extras_require={
+        'zstd': ['zstandard'],
+        'arrow': ['pyarrow'],
+    },
     entry_points={
         'console_scripts': ['fitfile=fitfile.run_jobs:main'],
     },
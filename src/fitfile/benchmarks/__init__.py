@@ -0,0 +1,8 @@
+from fitfile.benchmarks.suite import (
+    BENCHMARKS,
+    DATASETS,
+    Dataset,
+    compare,
+    run_suite,
+)
+__all__ = ['BENCHMARKS', 'DATASETS', 'Dataset', 'compare', 'run_suite']
@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+from typing import (
+    List,
+    Optional,
+)
+
+import pandas
+
+from fitfile.benchmarks.suite import (
+    BENCHMARKS,
+    DATASETS,
+    compare,
+    metadata,
+    parse_size,
+    run_suite,
+)
+
+argument_parser = argparse.ArgumentParser(
+    prog='python -m fitfile.benchmarks',
+    description='Times the loaders, the rules and whole jobs on generated data shaped like the '
+                'sample inputs, and compares the results with those of an earlier run',
+    epilog='For any queries enricserrasanz@gmail.com')
+argument_parser.add_argument('--sizes', dest='sizes', nargs='+', default=['10k'],
+                             help='The numbers of rows to generate, such as 10k 1M 10M')
+argument_parser.add_argument('--datasets', dest='datasets', nargs='+', default=sorted(DATASETS),
+                             choices=sorted(DATASETS), help='The datasets, all by default')
+argument_parser.add_argument('--benchmarks', dest='benchmarks', nargs='+', default=BENCHMARKS,
+                             choices=BENCHMARKS, help='The benchmarks, all by default')
+argument_parser.add_argument('--data-dir', dest='data_dir', default=None,
+                             help='Where to keep the generated inputs so later runs reuse them, '
+                                  'a temporary directory by default')
+argument_parser.add_argument('--seed', dest='seed', type=int, default=0,
+                             help='The random seed of the generated inputs')
+argument_parser.add_argument('--chunksize', dest='chunksize', type=int, default=None,
+                             help='Streams the jobs of the run benchmark in chunks of this size')
+argument_parser.add_argument('--repeat', dest='repeat', type=int, default=3,
+                             help='The number of times each step runs, the fastest one is kept')
+argument_parser.add_argument('--output', dest='output', default=None,
+                             help='Saves the results to this json file')
+argument_parser.add_argument('--compare', dest='baseline', default=None,
+                             help='A results json file of an earlier run to compare against')
+argument_parser.add_argument('--threshold', dest='threshold', type=float, default=0.2,
+                             help='The relative change counted as a regression, defaults to 0.2')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = argument_parser.parse_args(argv)
+    sizes = [parse_size(size) for size in args.sizes]
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        data_dir = args.data_dir or temporary_dir
+        os.makedirs(data_dir, exist_ok=True)
+        results = run_suite(args.datasets, sizes, args.benchmarks, data_dir, temporary_dir,
+                            seed=args.seed, chunksize=args.chunksize, repeat=args.repeat)
+    print(pandas.DataFrame(results).to_string(index=False))  # type: ignore
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump({'metadata': metadata(), 'results': results}, output_file, indent=4)
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    changes, regressions = compare(results, baseline['results'], args.threshold)
+    print('Compared with commit {}, as a ratio of the baseline:'.format(
+        baseline['metadata'].get('commit')))
+    print(pandas.DataFrame(changes).to_string(index=False))  # type: ignore
+    for regression in regressions:
+        print('Regression: {}'.format(regression))
+    return int(bool(regressions))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
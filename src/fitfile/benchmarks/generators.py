@@ -0,0 +1,211 @@
+import datetime
+from typing import Any
+
+import numpy
+import pandas
+
+EXCEL_MAX_ROWS = 2 ** 20 - 1
+# Ages and dates of birth are relative to a fixed date, so a seed always generates the same data
+REFERENCE_DATE = datetime.date(2023, 3, 20)
+
+# Postcode areas of England, Scotland and Wales
+POSTCODE_AREAS = [
+    'AB', 'AL', 'B', 'BA', 'BB', 'BD', 'BH', 'BL', 'BN', 'BR', 'BS', 'CA', 'CB', 'CF', 'CH', 'CM',
+    'CO', 'CR', 'CT', 'CV', 'CW', 'DA', 'DD', 'DE', 'DH', 'DL', 'DN', 'DT', 'DY', 'E', 'EH', 'EN',
+    'EX', 'FK', 'G', 'GL', 'GU', 'HA', 'HD', 'HG', 'HP', 'HR', 'HU', 'HX', 'IG', 'IP', 'KA', 'KT',
+    'KY', 'L', 'LA', 'LD', 'LE', 'LL', 'LN', 'LS', 'LU', 'M', 'ME', 'MK', 'N', 'NE', 'NG', 'NN',
+    'NP', 'NR', 'NW', 'OL', 'OX', 'PA', 'PE', 'PH', 'PL', 'PO', 'PR', 'RG', 'RH', 'RM', 'S', 'SA',
+    'SE', 'SG', 'SK', 'SL', 'SM', 'SN', 'SO', 'SP', 'SR', 'SS', 'ST', 'SW', 'SY', 'TA', 'TD', 'TF',
+    'TN', 'TQ', 'TR', 'TS', 'TW', 'UB', 'W', 'WA', 'WD', 'WF', 'WN', 'WR', 'WS', 'WV', 'YO',
+]
+# The letters used on the inward part of postcodes, C, I, K, M, O and V are never used
+INWARD_LETTERS = list('ABDEFGHJLNPQRSTUWXYZ')
+INVALID_POSTCODES = ['WRONG', 'OX1', 'ox1 5xj', '123 456', 'SW1A1AAA']
+INVALID_DATES = ['1927-18-10', '1963-38-14', '2001-02-30', '12/05/1980']
+REGIONS = [
+    'Leicestershire', 'Brecknockshire', 'Cardiganshire', 'East Lothian', 'Lanarkshire',
+    'Durham', 'Sutherland', 'Kent', 'Yorkshire', 'Cornwall', 'Devon', 'Norfolk', 'Essex',
+    'Fife', 'Gwynedd', 'Cumbria',
+]
+FIRST_NAMES = [
+    'Nayda', 'Hasad', 'Noelle', 'Kylie', 'Hashim', 'Jesse', 'Brett', 'Alma', 'Charlotte',
+    'Indira', 'Jescie', 'Miriam', 'Oliver', 'Amelia', 'Harry', 'Isla', 'George', 'Ava',
+]
+LAST_NAMES = [
+    'Goff', 'Graves', 'Curry', 'Valencia', 'Sparks', 'Malone', 'Hunt', 'Wilcox', 'Hendrix',
+    'Good', 'Wong', 'Watts', 'Smith', 'Jones', 'Taylor', 'Brown', 'Williams', 'Wilson',
+]
+STREETS = ['Enim. Avenue', 'Aliquam Rd.', 'Leo. Rd.', 'At, Ave', 'Odio Rd.', 'Eget Avenue']
+
+
+def postcodes(rng: numpy.random.Generator, rows: int, invalid_rate: float = 0.02,
+              missing_rate: float = 0.005) -> numpy.ndarray:
+    """
+    Postcodes drawn from a pool of distinct postcodes with a long tailed distribution, so a few
+    are shared by many rows and many by only a few rows, as people cluster in postcode units
+    :param rng: The random generator
+    :param rows: The number of postcodes
+    :param invalid_rate: The share of malformed postcodes
+    :param missing_rate: The share of missing postcodes
+    :return: An object array of postcodes, None where missing
+    """
+    pool_size = max(100, min(rows // 10, 200000))
+    pool = _join(  # type: ignore
+        rng.choice(POSTCODE_AREAS, pool_size),
+        rng.integers(1, 30, pool_size),  # type: ignore
+        ' ',
+        rng.integers(0, 10, pool_size),  # type: ignore
+        rng.choice(INWARD_LETTERS, pool_size),
+        rng.choice(INWARD_LETTERS, pool_size),
+    ).to_numpy(dtype=object)
+    weights = 1 / numpy.arange(1, pool_size + 1) ** 0.8
+    values = pool[rng.choice(pool_size, rows, p=weights / weights.sum())]  # type: ignore
+    return _spoil(rng, values, INVALID_POSTCODES, invalid_rate, missing_rate)  # type: ignore
+
+
+def ages(rng: numpy.random.Generator, rows: int) -> numpy.ndarray:
+    """
+    Ages following a flat distribution up to 60 which then tails off up to 100, roughly the
+    shape of the UK population
+    :param rng: The random generator
+    :param rows: The number of ages
+    :return: An integer array of ages
+    """
+    weights = numpy.minimum(1, (101 - numpy.arange(101)) / 41)  # type: ignore
+    return rng.choice(101, rows, p=weights / weights.sum())  # type: ignore
+
+
+def dates_of_birth(rng: numpy.random.Generator, rows: int, invalid_rate: float = 0.01,
+                   missing_rate: float = 0.005,
+                   reference_date: datetime.date = REFERENCE_DATE) -> numpy.ndarray:
+    """
+    Iso format dates of birth, for ages following ages
+    :param rng: The random generator
+    :param rows: The number of dates
+    :param invalid_rate: The share of malformed dates
+    :param missing_rate: The share of missing dates
+    :param reference_date: The date the ages are relative to
+    :return: An object array of iso format dates, None where missing
+    """
+    days = ages(rng, rows) * 365 + rng.integers(0, 365, rows)  # type: ignore
+    reference = numpy.datetime64(reference_date.isoformat(), 'D')  # type: ignore
+    dates = reference - days.astype('timedelta64[D]')
+    values = numpy.datetime_as_string(dates, unit='D').astype(object)  # type: ignore
+    return _spoil(rng, values, INVALID_DATES, invalid_rate, missing_rate)
+
+
+def _spoil(rng: numpy.random.Generator, values: numpy.ndarray, invalid_values: Any,
+           invalid_rate: float, missing_rate: float) -> numpy.ndarray:
+    """
+    Replaces a share of the values with invalid and missing ones
+    :return: The values, modified in place
+    """
+    draw = rng.random(len(values))  # type: ignore
+    invalid = draw < invalid_rate
+    values[invalid] = rng.choice(invalid_values, invalid.sum())
+    values[(draw >= invalid_rate) & (draw < invalid_rate + missing_rate)] = None
+    return values
+
+
+def _join(*parts: Any) -> pandas.Series:
+    """
+    Concatenates arrays, as strings, and string constants element wise
+    :param parts: Arrays of the same length or strings
+    :return: A column of strings
+    """
+    joined = None
+    for part in parts:
+        if not isinstance(part, str):
+            part = pandas.Series(part).astype(str)
+        joined = part if joined is None else joined + part
+    return joined  # type: ignore
+
+
+def _people(rng: numpy.random.Generator, rows: int) -> pandas.DataFrame:
+    """
+    The columns the three datasets share
+    :return: A dataframe with a name, address, PostCode and region
+    """
+    return pandas.DataFrame({
+        'name': _join(rng.choice(FIRST_NAMES, rows), ' ', rng.choice(LAST_NAMES, rows)),
+        'address': _join(rng.integers(1, 9999, rows),  # type: ignore
+                         ' ', rng.choice(STREETS, rows)),
+        'PostCode': postcodes(rng, rows),
+        'region': rng.choice(REGIONS, rows),
+    })
+
+
+def _identifiers(rng: numpy.random.Generator, rows: int) -> pandas.Series:
+    """
+    Identifiers shaped like the nhsnumber and MemberNumber columns, such as RO33Z24ZK
+    """
+    letters = list('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+    return _join(*[rng.choice(letters, rows) for _ in range(2)],
+                 rng.integers(10000, 99999, rows),  # type: ignore
+                 *[rng.choice(letters, rows) for _ in range(2)])
+
+
+def customer(rows: int, seed: int = 0) -> pandas.DataFrame:
+    """
+    Data shaped like customer.csv, with iso dates of birth
+    :param rows: The number of rows
+    :param seed: The random seed, the same seed always generates the same data
+    :return: A dataframe
+    """
+    rng = numpy.random.default_rng(seed)
+    dataframe = _people(rng, rows)
+    dataframe['MemberNumber'] = _identifiers(rng, rows)
+    dataframe['dob'] = dates_of_birth(rng, rows)
+    dataframe['yearscustomer'] = rng.integers(0, 26, rows)  # type: ignore
+    return dataframe
+
+
+def patient_cohorts(rows: int, seed: int = 0) -> pandas.DataFrame:
+    """
+    Data shaped like PatientCohorts.json, with integer ages, some of them negative
+    :param rows: The number of rows
+    :param seed: The random seed, the same seed always generates the same data
+    :return: A dataframe
+    """
+    rng = numpy.random.default_rng(seed)
+    dataframe = _people(rng, rows)
+    dataframe['nhsnumber'] = _identifiers(rng, rows)
+    age = ages(rng, rows)
+    negative = rng.random(rows) < 0.01  # type: ignore
+    age[negative] = -rng.integers(1, 5, negative.sum())  # type: ignore
+    dataframe['age'] = age
+    return dataframe
+
+
+def research_list(rows: int, seed: int = 0) -> pandas.DataFrame:
+    """
+    Data shaped like ResearchList.xlsx
+    :param rows: The number of rows
+    :param seed: The random seed, the same seed always generates the same data
+    :return: A dataframe
+    """
+    rng = numpy.random.default_rng(seed)
+    dataframe = _people(rng, rows)
+    dataframe['nhsnumber'] = _identifiers(rng, rows)
+    dataframe['yearofbirth'] = REFERENCE_DATE.year - ages(rng, rows)
+    return dataframe
+
+
+def write_excel(dataframe: pandas.DataFrame, path: str) -> None:
+    """
+    Writes a dataframe to a single sheet workbook, in write only mode to keep memory flat
+    :param dataframe: The data, at most EXCEL_MAX_ROWS rows
+    :param path: The workbook path
+    :return: None
+    """
+    import openpyxl  # type: ignore
+    if len(dataframe) > EXCEL_MAX_ROWS:
+        raise ValueError('Excel sheets hold at most {} rows, got {}'.format(
+            EXCEL_MAX_ROWS, len(dataframe)))
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('ResearchList')
+    sheet.append(list(dataframe.columns))
+    for row in dataframe.itertuples(index=False, name=None):
+        sheet.append([None if isinstance(value, float) and value != value else value
+                      for value in row])
+    workbook.save(path)
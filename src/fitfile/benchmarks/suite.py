@@ -0,0 +1,347 @@
+import multiprocessing
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
+
+import numpy
+import pandas
+
+from fitfile.benchmarks import generators
+from fitfile.data_managers import (
+    AbstractDataManager,
+    CsvDataManager,
+    ExcelDataManager,
+    JsonDataManager,
+)
+from fitfile.data_managers.run_report import peak_rss_bytes
+from fitfile.data_rules import (
+    AbstractDataRule,
+    AgeBandRule,
+    PostCodeTrimToThreeRule,
+    PostCodeTrimToTwoRule,
+)
+
+BENCHMARKS = ['load', 'pandas', 'rule', 'run', 'memory']
+# The metrics compared across commits, and whether higher is better
+METRICS = {
+    'rows_per_second': True,
+    'peak_rss_bytes': False,
+    'peak_growth_ratio': False,
+}
+
+
+class Dataset(object):
+    """A synthetic dataset shaped like one of the sample inputs, with the job that reads it"""
+    def __init__(self, name: str, extension: str,
+                 generate: Callable[[int, int], pandas.DataFrame],
+                 write: Callable[[pandas.DataFrame, str], None],
+                 data_manager: Type[AbstractDataManager],
+                 read_with_pandas: Callable[[str], pandas.DataFrame],
+                 rules: List[Tuple[Type[AbstractDataRule], str]],
+                 max_rows: Optional[int] = None) -> None:
+        """
+        :param name: The dataset name
+        :param extension: The input file extension
+        :param generate: Generates the data from a number of rows and a seed
+        :param write: Writes the data to an input file
+        :param data_manager: The data manager that loads the input file
+        :param read_with_pandas: The plain pandas reader, the baseline of the data manager
+        :param rules: The rules of the job, as rule class and field pairs, in order
+        :param max_rows: The largest input the format can hold, if limited
+        """
+        self.name = name
+        self.extension = extension
+        self.generate = generate
+        self.write = write
+        self.data_manager = data_manager
+        self.read_with_pandas = read_with_pandas
+        self.rules = rules
+        self.max_rows = max_rows
+
+    def path(self, data_dir: str, rows: int, seed: int) -> str:
+        """
+        The input file for a number of rows and a seed, generated on first use so later runs,
+        of this or other commits, read the very same data
+        :param data_dir: The directory holding the generated inputs
+        :param rows: The number of rows
+        :param seed: The random seed
+        :return: The input file path
+        """
+        path = os.path.join(data_dir, '{}_{}_{}{}'.format(self.name, rows, seed, self.extension))
+        if not os.path.exists(path):
+            partial_path = path + '.partial'
+            self.write(self.generate(rows, seed), partial_path)
+            os.replace(partial_path, path)
+        return path
+
+    def make_data_manager(self, input_file_path: str, output_file_path: str,
+                          **kwargs: Any) -> AbstractDataManager:
+        """
+        :return: A data manager for the job, with its rules set
+        """
+        data_manager = self.data_manager(input_file_path=input_file_path,
+                                         output_file_path=output_file_path,
+                                         request_id='benchmark', write_report=False, **kwargs)
+        data_manager.set_rules([rule(fields=[field], logger=data_manager.logger)
+                                for rule, field in self.rules])
+        return data_manager
+
+
+DATASETS = {
+    dataset.name: dataset for dataset in [
+        Dataset('customer', '.csv', generators.customer,
+                lambda dataframe, path: dataframe.to_csv(path, index=False),  # type: ignore
+                CsvDataManager, pandas.read_csv, [(AgeBandRule, 'dob')]),
+        Dataset('patient_cohorts', '.json', generators.patient_cohorts,
+                lambda dataframe, path: dataframe.to_json(path, orient='records'),  # type: ignore
+                JsonDataManager, pandas.read_json,  # type: ignore
+                [(AgeBandRule, 'age'), (PostCodeTrimToThreeRule, 'PostCode')]),
+        Dataset('research_list', '.xlsx', generators.research_list, generators.write_excel,
+                ExcelDataManager, pandas.read_excel,  # type: ignore
+                [(PostCodeTrimToThreeRule, 'PostCode'), (PostCodeTrimToTwoRule, 'PostCode')],
+                max_rows=generators.EXCEL_MAX_ROWS),
+    ]
+}
+
+
+def parse_size(size: str) -> int:
+    """
+    :param size: A number of rows, such as 10000, 10k or 1M
+    :return: The number of rows
+    """
+    multipliers = {'k': 10 ** 3, 'm': 10 ** 6}
+    suffix = size[-1:].lower()
+    if suffix in multipliers:
+        return int(float(size[:-1]) * multipliers[suffix])
+    return int(size)
+
+
+def benchmark(name: str, dataset_name: str, input_file_path: str, output_dir: str,
+              chunksize: Optional[int] = None, repeat: int = 1) -> List[Dict[str, Any]]:
+    """
+    Runs a single benchmark on an input file, in this process
+    :param name: One of BENCHMARKS, load times the data manager load_data, pandas the plain
+    pandas reader, rule the apply_rule of each rule of the job, on the output of the rules
+    before it, run the whole job and memory how much memory the whole job takes on top of its
+    loaded input
+    :param dataset_name: The dataset of the input file
+    :param input_file_path: The input file
+    :param output_dir: The directory for the job output
+    :param chunksize: The chunksize of the job, for run, memory always runs it in memory
+    :param repeat: The number of times each step runs, the fastest one is kept
+    :return: A result for each timed step
+    """
+    dataset = DATASETS[dataset_name]
+    output_file_path = os.path.join(output_dir, dataset.name + '.json')
+    data_manager = dataset.make_data_manager(input_file_path, output_file_path,
+                                             chunksize=chunksize)
+    if name == 'load':
+        return [_timed('load {}'.format(dataset.data_manager.__name__),
+                       lambda: len(data_manager.load_data()), repeat)]
+    if name == 'pandas':
+        return [_timed('load {}'.format(dataset.read_with_pandas.__name__),
+                       lambda: len(dataset.read_with_pandas(input_file_path)), repeat)]
+    if name == 'run':
+        # A data manager keeps the transformed dataframe, so each run gets a fresh one
+        return [_timed('run {}'.format(dataset.data_manager.__name__),
+                       lambda: _run(dataset.make_data_manager(
+                           input_file_path, output_file_path, chunksize=chunksize)), repeat)]
+    if name == 'memory':
+        return [_memory('memory {}'.format(dataset.data_manager.__name__),
+                        dataset.make_data_manager(input_file_path, output_file_path))]
+    dataframe = data_manager.load_data()
+    results = []
+    for rule in data_manager.rules:
+        errors = rule.error_count
+        result = _timed('rule {}({})'.format(rule.__class__.__name__, rule.fields[0]),
+                        lambda: len(rule.apply_rule(dataframe)), repeat)
+        result['errors'] = (rule.error_count - errors) // max(repeat, 1)
+        results.append(result)
+        # Each rule is timed on the output of the rules before it, as in the job
+        rule.silenced = True
+        dataframe = rule.apply_rule(dataframe)
+    return results
+
+
+def _run(data_manager: AbstractDataManager) -> int:
+    """
+    Runs a job
+    :return: The number of rows saved
+    """
+    data_manager.run()
+    return int(data_manager.run_report['rows_out'])  # type: ignore
+
+
+def _memory(name: str, data_manager: AbstractDataManager) -> Dict[str, Any]:
+    """
+    Measures the peak of the memory allocated while a job runs on its loaded input. Rules only
+    replace the columns they own, so it should stay within the size of the input
+    :param name: The step name
+    :param data_manager: The job, its input is loaded before measuring
+    :return: The step result, with its rows, the size of the loaded input and the peak growth
+    of the memory, also as a ratio of the input size
+    """
+    dataframe = data_manager.dataframe
+    input_bytes = int(dataframe.memory_usage(deep=True).sum())  # type: ignore
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        data_manager.run()
+        peak_growth = tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+    return {
+        'step': name,
+        'rows': len(dataframe),
+        'input_bytes': input_bytes,
+        'peak_growth_bytes': peak_growth,
+        'peak_growth_ratio': round(peak_growth / input_bytes, 3) if input_bytes else None,
+    }
+
+
+def _timed(name: str, step: Callable[[], int], repeat: int = 1) -> Dict[str, Any]:
+    """
+    Times a step, keeping the fastest of repeat runs as the others only add noise
+    :param name: The step name
+    :param step: The step, returning the number of rows it processed
+    :param repeat: The number of runs
+    :return: The step result, with its rows, time and the peak memory of the process
+    """
+    seconds = float('inf')
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        rows = step()
+        seconds = min(seconds, time.perf_counter() - start)
+    return {
+        'step': name,
+        'rows': rows,
+        'seconds': round(seconds, 6),
+        'rows_per_second': round(rows / seconds, 1) if seconds else None,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+
+def _benchmark_process(results: Any, *args: Any) -> None:
+    """Runs benchmark on a child process, sending its results, or its exception, back"""
+    try:
+        results.put(benchmark(*args))
+    except Exception as e:
+        results.put(e)
+
+
+def run_suite(datasets: List[str], sizes: List[int], benchmarks: List[str], data_dir: str,
+              output_dir: str, seed: int = 0, chunksize: Optional[int] = None,
+              repeat: int = 1, isolate: bool = True,
+              log: Callable[[str], None] = print) -> List[Dict[str, Any]]:
+    """
+    Runs every benchmark on every dataset at every size
+    :param datasets: The names of the datasets
+    :param sizes: The numbers of rows
+    :param benchmarks: The benchmarks to run, from BENCHMARKS
+    :param data_dir: The directory holding the generated inputs
+    :param output_dir: The directory for the job outputs
+    :param seed: The random seed of the generated inputs
+    :param chunksize: The chunksize of the run benchmark
+    :param repeat: The number of times each step runs, the fastest one is kept
+    :param isolate: Whether each benchmark runs on a fresh process, so the peak memory it
+    reports is its own
+    :param log: Reports progress
+    :return: A list of results, each identified by its dataset, size and step
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for name in datasets:
+        dataset = DATASETS[name]
+        for rows in sizes:
+            if dataset.max_rows is not None and rows > dataset.max_rows:
+                log('Skipping {} at {} rows, the format holds at most {}'.format(
+                    name, rows, dataset.max_rows))
+                continue
+            log('Generating {} at {} rows'.format(name, rows))
+            input_file_path = dataset.path(data_dir, rows, seed)
+            for benchmark_name in benchmarks:
+                log('Benchmarking {} of {} at {} rows'.format(benchmark_name, name, rows))
+                args = (benchmark_name, name, input_file_path, output_dir, chunksize, repeat)
+                if isolate:
+                    queue = context.Queue()
+                    process = context.Process(target=_benchmark_process, args=(queue, *args))
+                    process.start()
+                    step_results = queue.get()
+                    process.join()
+                    if isinstance(step_results, Exception):
+                        raise step_results
+                else:
+                    step_results = benchmark(*args)
+                for result in step_results:
+                    results.append(dict({'dataset': name, 'size': rows}, **result))
+    return results
+
+
+def metadata() -> Dict[str, Any]:
+    """
+    Describes what the results were measured on, so results of different commits can be told
+    apart
+    :return: A json serialisable dictionary
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pandas.__version__,  # type: ignore
+        'numpy': numpy.__version__,  # type: ignore
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+            threshold: float) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Compares results with the results of a baseline, such as an earlier commit
+    :param results: The results
+    :param baseline: The baseline results
+    :param threshold: The relative change, such as 0.2 for 20%, past which a worse metric is a
+    regression
+    :return: The change of each metric of the results found in the baseline, and a description
+    of each regression
+    """
+    baseline_by_key = {_key(result): result for result in baseline}
+    changes = []
+    regressions = []
+    for result in results:
+        previous = baseline_by_key.get(_key(result))
+        if previous is None:
+            continue
+        change: Dict[str, Any] = {'dataset': result['dataset'], 'size': result['size'],
+                                  'step': result['step']}
+        for metric, higher_is_better in METRICS.items():
+            if not result.get(metric) or not previous.get(metric):
+                continue
+            ratio = result[metric] / previous[metric]
+            change[metric] = round(ratio, 3)
+            worse = ratio < 1 - threshold if higher_is_better else ratio > 1 + threshold
+            if worse:
+                regressions.append('{} {} rows {}: {} went from {} to {}'.format(
+                    result['dataset'], result['size'], result['step'], metric,
+                    previous[metric], result[metric]))
+        changes.append(change)
+    return changes, regressions
+
+
+def _key(result: Dict[str, Any]) -> Tuple[str, int, str]:
+    return result['dataset'], result['size'], result['step']
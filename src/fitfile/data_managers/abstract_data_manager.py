@@ -1,27 +1,137 @@
-import datetime
+import hashlib
+import json
+import os
+import tempfile
 from abc import (
     ABC,
     abstractmethod,
 )
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+)
+from contextlib import (
+    ExitStack,
+    contextmanager,
+)
+import numpy
 import pandas
 from typing import (
     Any,
+    Dict,
+    Iterator,
     List,
     Optional,
+    Tuple,
+    Union,
+)
+from fitfile.data_rules import (
+    AbstractDataRule,
+    ValidationErrors,
+)
+from fitfile.data_rules.fused_rule_chain import plan_rules
+from fitfile.data_rules.postcode_trim_to_three_rule import (
+    postcode_validation_cache,
+    resize_postcode_validation_cache,
 )
-from copy import deepcopy
-from fitfile.data_rules import AbstractDataRule
+from fitfile.data_sinks import (
+    AbstractDataSink,
+    DATA_SINKS,
+)
+from fitfile.data_sinks.exceptions import DataSinkException
+from fitfile.data_managers.input_cache import (
+    HASH_BLOCK_SIZE,
+    InputCache,
+)
+from fitfile.data_managers.run_report import RunProfiler
+from fitfile.data_managers.sharding import apply_rules_sharded
 import logging
-from dateutil.relativedelta import relativedelta
+
+REJECTS_FORMATS = ('csv', 'ndjson')
 
 
 class AbstractDataManager(ABC):
     def __init__(self, input_file_path: str, output_file_path: str, request_id: str,
-                 logger: Optional[Any] = None) -> None:
+                 logger: Optional[Any] = None, chunksize: Optional[int] = None,
+                 shards: Optional[int] = None, output_format: Optional[str] = None,
+                 compression: Optional[str] = 'infer',
+                 output_columns: Optional[List[str]] = None,
+                 dtype: Optional[Dict[str, Any]] = None,
+                 parse_dates: Optional[List[str]] = None, write_report: bool = True,
+                 rejects_format: Optional[str] = 'ndjson', quarantine: bool = False,
+                 fuse_rules: bool = True,
+                 input_cache: Optional[Union[str, InputCache]] = None,
+                 incremental: bool = False) -> None:
+        """
+        :param input_file_path: The file to load the data from
+        :param output_file_path: The file to save the results to
+        :param request_id: The ID of the request this job belongs to
+        :param logger: The logger to use, defaults to fitfile.data_manager
+        :param chunksize: When set, run streams the input in chunks of this many rows and saves
+        the results as newline delimited json, so memory does not depend on the input size
+        :param shards: When above 1, row local rules are applied to this many row shards of the
+        data in parallel worker processes
+        :param output_format: The output sink, json (compact), ndjson, parquet or arrow/feather.
+        By default streaming runs write ndjson and other runs an indented json through
+        save_to_json_out
+        :param compression: The output compression, None, gzip, zstd or infer to pick it from the
+        output extension
+        :param output_columns: When set, only these columns are saved and the loaders only read
+        them and the fields of the rules
+        :param dtype: The dtype of some or all of the columns, such as int32, string or category,
+        applied at load time instead of inferring them
+        :param parse_dates: The columns holding iso format dates, loaded as datetime64
+        :param write_report: Whether run saves its run report next to the output
+        :param rejects_format: The format of the rejects file run saves next to the output, with
+        every entry that failed to validate, csv or ndjson. None to only count them
+        :param quarantine: Whether the rows with an entry that failed to validate are left out of
+        the output and saved, as they were loaded, to the quarantine file instead, with the first
+        rule they failed and the reason
+        :param fuse_rules: Whether consecutive rules on the same field are applied in a single
+        pass over the distinct values of the field, timed as a single stage
+        :param input_cache: The cache to read the parsed input from, or its directory, so an
+        unchanged input is not parsed again. Only used when the input is loaded whole
+        :param incremental: Whether run only transforms the rows that are new or changed since
+        the last run, reusing the results of the others kept on the state file, together with
+        the rows whose results change because the state of a rule on the whole data changed
+        """
         self.input_file_path = input_file_path
         self.output_file_path = output_file_path
         self.request_id = request_id
+        self.chunksize = chunksize
+        self.shards = shards
+        if output_format is not None and output_format not in DATA_SINKS:
+            raise DataSinkException('Unknown output format {}, expected one of {}'.format(
+                output_format, sorted(DATA_SINKS)))
+        self.output_format = output_format
+        self.compression = compression
+        self.output_columns = output_columns
+        self.dtype = dtype
+        self.parse_dates = parse_dates
+        self.write_report = write_report
+        if rejects_format is not None and rejects_format not in REJECTS_FORMATS:
+            raise DataSinkException('Unknown rejects format {}, expected one of {}'.format(
+                rejects_format, list(REJECTS_FORMATS)))
+        self.rejects_format = rejects_format
+        self.quarantine = quarantine
+        self.fuse_rules = fuse_rules
+        if isinstance(input_cache, str):
+            input_cache = InputCache(input_cache)
+        self.input_cache = input_cache
+        if incremental and chunksize is not None:
+            raise ValueError('Incremental runs load the whole input, they can not stream in '
+                             'chunks')
+        self.incremental = incremental
+        # Whether the last load was an input cache hit or miss, None without a cache
+        self.input_cache_status: Optional[str] = None
+        self.run_report: Optional[Dict[str, Any]] = None
+        self._profiler = RunProfiler()
+        self._executor: Optional[Executor] = None
+        self._rejects_sink: Optional[AbstractDataSink] = None
+        self._quarantine_sink: Optional[AbstractDataSink] = None
         self._dataframe: Optional[pandas.DataFrame] = None
+        # The rows reused and processed by the last incremental run
+        self._incremental_stats: Optional[Dict[str, int]] = None
         self._rules: List[Any] = []
         if logger is None:
             logging.basicConfig(
@@ -46,7 +156,7 @@ class AbstractDataManager(ABC):
         :return:
         """
         if self._dataframe is None:
-            self._dataframe = self.load_data()
+            self._dataframe = self.load_cached_data()
         return self._dataframe
 
     def set_rules(self, rules: List[AbstractDataRule]) -> None:
@@ -65,10 +175,87 @@ class AbstractDataManager(ABC):
         """
         return self._rules
 
+    @property
+    def columns(self) -> Optional[List[str]]:
+        """
+        The columns the job uses, the output columns followed by the fields of the rules, for the
+        loaders to read only those
+        :return: A list of column names, None when the job saves every column
+        """
+        if self.output_columns is None:
+            return None
+        columns = list(self.output_columns)
+        for rule in self.rules:
+            columns.extend(field for field in rule.fields if field not in columns)
+        return columns
+
     @abstractmethod
     def load_data(self) -> pandas.DataFrame:
         pass
 
+    def load_options(self) -> Dict[str, Any]:
+        """
+        The options the loaded dataframe depends on besides the input, part of the input cache
+        key. Overwrite on subclass to add the options of the loader
+        :return: A json serialisable dictionary
+        """
+        return {
+            'data_manager': self.__class__.__name__,
+            'columns': self.columns,
+            'dtype': self.dtype,
+            'parse_dates': self.parse_dates,
+        }
+
+    def load_cached_data(self) -> pandas.DataFrame:
+        """
+        Loads the data from the input cache when it holds this input, with the same load options,
+        and with load_data otherwise, adding the result to the cache
+        :return: A pandas.DataFrame
+        """
+        if self.input_cache is None:
+            return self.load_data()
+        key = self.input_cache.key(self.input_file_path, self.load_options())
+        dataframe = self.input_cache.get(key)
+        if dataframe is not None:
+            self.input_cache_status = 'hit'
+            self.logger.info('Loaded {} from the input cache, {}'.format(
+                self.input_file_path, self.input_cache))
+            return dataframe
+        dataframe = self.load_data()
+        self.input_cache_status = 'miss'
+        if not self.input_cache.put(key, dataframe):
+            self.logger.warning('{} can not be cached, its columns mix types'.format(
+                self.input_file_path))
+        return dataframe
+
+    def apply_schema(self, dataframe: pandas.DataFrame) -> pandas.DataFrame:
+        """
+        Types the columns of freshly loaded data with the job dtype and parse_dates, so the rules
+        get typed columns. Dates that do not parse become NaT, which the rules see as missing
+        :param dataframe: The loaded data, its date columns are replaced in place
+        :return: The typed dataframe
+        """
+        for column in self.parse_dates or []:
+            if column in dataframe:
+                dataframe[column] = pandas.to_datetime(  # type: ignore
+                    dataframe[column], format='ISO8601', errors='coerce')
+        dtype = {
+            column: column_dtype for column, column_dtype in (self.dtype or {}).items()
+            if column in dataframe
+        }
+        if dtype:
+            dataframe = dataframe.astype(dtype, copy=False)  # type: ignore
+        return dataframe
+
+    def load_chunks(self) -> Iterator[pandas.DataFrame]:
+        """
+        Loads the data in chunks of chunksize rows, overwrite on subclass to support streaming.
+        Every call must start again from the beginning of the input
+        :return: An iterator of dataframes
+        """
+        raise NotImplementedError('{} does not support streaming'.format(
+            self.__class__.__name__))
+
     def save_to_json_out(self, dataframe: Optional[pandas.DataFrame], *args: Any,
                          **kwargs: Any) -> None:
         """
@@ -92,26 +279,564 @@ class AbstractDataManager(ABC):
 
         )
 
-    def run(self) -> None:
+    def run(self, keep_input: bool = False) -> None:
         """
-        Runs the data management job, copies the dataframe, applies all the rules in order and
-        saves to a json out
+        Runs the data management job, applies all the rules in order and saves to a json out.
+        Rules only replace the columns they own, so no full copy of the dataframe is ever made.
+        Every stage is timed, the run report is kept on run_report and saved next to the output.
+        The entries that fail to validate are saved to the rejects file, and their rows to the
+        quarantine file when quarantining
+        :param keep_input: Whether to leave the dataframe property untouched, otherwise the
+        dataframe is replaced by the transformed one and the original columns are released as
+        soon as each rule replaces them
         :return: None
         """
-        start = datetime.datetime.now()
-        self.logger.info('Executing: {}, start time: {} '.format(self, start))
-        to_save_df = deepcopy(self.dataframe)
+        self._profiler = RunProfiler()
+        self.input_cache_status = None
+        self._incremental_stats: Optional[Dict[str, int]] = None  # type: ignore
+        self.logger.info('Executing: {}, start time: {} '.format(self, self._profiler.started_at))
+        with self._shard_executor(), self._collect_rejects():
+            if self.chunksize is not None:
+                self.run_streaming()
+            elif self.incremental:
+                self.run_incremental(keep_input)
+            else:
+                with self._profiler.stage('load') as stats:
+                    to_save_df = self.dataframe
+                    stats.rows_out += len(to_save_df)
+                if not keep_input:
+                    self._dataframe = None
+                to_save_df = self._split_rejects(to_save_df,
+                                                 self._apply_rules(to_save_df, self.rules))
+                if not keep_input:
+                    self._dataframe = to_save_df
+                self._save(self._project(to_save_df))
         for rule in self.rules:
-
-            to_save_df = rule.apply_rule(to_save_df)
-        self.save_to_json_out(to_save_df)
-        wallclock = relativedelta(datetime.datetime.now(), start).microseconds
-        self.logger.info('Completed {} with status {} in {} microseconds'.format(
+            summary = rule.summary()
+            if summary is not None:
+                self.logger.info('{}: {}'.format(rule, summary))
+        validation_errors = self.validation_error_counts
+        if validation_errors:
+            self.logger.error('{} entries of {} failed to validate, by exception: {}{}'.format(
+                sum(validation_errors.values()), self, validation_errors,
+                '' if self.rejects_format is None else ', saved to ' + self.rejects_path))
+        self.run_report = self._profiler.report(
+            request_id=self.request_id,
+            data_manager=self.__class__.__name__,
+            input_file_path=self.input_file_path,
+            output_file_path=self.output_file_path,
+            status=self.error_string,
+            validation_errors=validation_errors,
+            rejects_file_path=None if self.rejects_format is None else self.rejects_path,
+            quarantine_file_path=self.quarantine_path if self.quarantine else None,
+            input_cache=self.input_cache_status,
+            incremental=self._incremental_stats,
+        )
+        if self.write_report:
+            self.save_run_report()
+        self.logger.info('Completed {} with status {} in {:.3f} seconds'.format(
             self,
             self.error_string,
-            wallclock
+            self.run_report['wall_seconds']
         ))
 
+    def run_streaming(self) -> None:
+        """
+        Streams the input through the rules chunk by chunk and writes each transformed chunk to
+        the output sink as soon as it is ready. Rules that are not row local get an extra
+        pass over the input first, where they only accumulate the state they need
+        :return: None
+        """
+        for rule in self.rules:
+            rule.reset_state()
+        for index, rule in enumerate(self.rules):
+            if rule.row_local:
+                continue
+            self.logger.info('Accumulating state for {}'.format(rule))
+            stage = 'accumulate ' + _stage_name(index, rule)
+            with _silenced(self.rules[:index]):
+                for chunk in self._load_chunks_profiled('load for ' + stage):
+                    chunk = self._apply_rules(chunk, self.rules[:index])
+                    with self._profiler.stage(stage, rows_in=len(chunk)):
+                        rule.accumulate(chunk)
+        self.logger.info('Streaming {} results to {}'.format(self, self.output_file_path))
+        with self.make_sink() as sink:
+            for chunk in self._load_chunks_profiled():
+                chunk = self._project(self._split_rejects(chunk,
+                                                          self._apply_rules(chunk, self.rules)))
+                with self._profiler.stage('save', rows_in=len(chunk)) as stats:
+                    sink.write(chunk)
+                    stats.rows_out += len(chunk)
+
+    def run_incremental(self, keep_input: bool = False) -> None:
+        """
+        Transforms only the rows that are new or changed since the last run and reuses the
+        results of the others, kept on the state file. Rows are matched by a fingerprint of the
+        fields the rules read, so appended, removed and reordered rows are all found and rows
+        where only other columns changed are reused. Rules that are not row local gather their
+        state from every row, using the values the reused rows gave them on the last run, and
+        the reused rows whose results depend on a part of that state that changed are
+        reprocessed too. When rows were only appended to a csv or ndjson input, and no earlier
+        row changed, their results are appended to a csv or ndjson output, otherwise the whole
+        output is saved again. Every row is processed when there is no state yet, or when the
+        load options, output columns, quarantining or rules changed. The rejects file, the error
+        counts and the job status only cover the rows processed on this run
+        :param keep_input: Whether to leave the dataframe property untouched, otherwise the
+        dataframe is replaced by the saved one
+        :return: None
+        """
+        with self._profiler.stage('load') as stats:
+            loaded = self.dataframe
+            stats.rows_out += len(loaded)
+        signature = json.dumps(self.incremental_signature(), sort_keys=True, default=str)
+        state = self.load_state(signature)
+        fields = list(dict.fromkeys(field for rule in self.rules for field in rule.fields))
+        with self._profiler.stage('match', rows_in=len(loaded)) as stats:
+            fingerprints = _fingerprint(loaded[fields])
+            # The position on the state of the results of each row, -1 for new and changed rows
+            previous = numpy.full(len(loaded), -1)
+            if state is not None:
+                saved_fingerprints = pandas.Index(state['fingerprints'])
+                previous = saved_fingerprints.get_indexer(fingerprints)  # type: ignore
+            stats.rows_out += int((previous >= 0).sum())
+        work = loaded[previous < 0]
+        keys: Dict[int, pandas.DataFrame] = {}
+        start = 0
+        for index, rule in enumerate(self.rules):
+            if rule.row_local:
+                continue
+            work = self._apply_rules(work, self.rules[start:index], start)
+            reused = ~loaded.index.isin(work.index)  # type: ignore
+            if state is None or not reused.any():
+                keys[index] = work[rule.fields]
+            else:
+                # The values every row gives the rule, the reused rows gave the same last time
+                saved_keys = state['keys'][index]
+                rule_keys = saved_keys.iloc[previous[reused]]
+                rule_keys.index = loaded.index[reused]
+                rule_keys = pandas.concat([rule_keys, work[rule.fields]])
+                keys[index] = rule_keys.sort_index()  # type: ignore
+                # Nothing to reprocess when no row was added, changed or removed. A row changed
+                # into a copy of another one is reused, only the counts of each row tell it
+                if len(work) or _counts_changed(previous, state['rows']):
+                    saved_rows = numpy.repeat(numpy.arange(len(saved_keys)), state['rows'])
+                    stale = reused & rule.stale_rows(saved_keys.iloc[saved_rows], keys[index])
+                    if stale.any():
+                        self.logger.info('Reprocessing {} unchanged rows for {}'.format(
+                            int(stale.sum()), rule))
+                        work = pandas.concat([work, self._apply_rules(  # type: ignore
+                            loaded[stale], self.rules[:index])]).sort_index()  # type: ignore
+            rule.reset_state()
+            rule.accumulate(keys[index])
+            work = self._apply_stage(work, [([index], rule)])
+            rule.reset_state()
+            start = index + 1
+        work = self._apply_rules(work, self.rules[start:], start)
+        saved = self._split_rejects(loaded.loc[work.index], work)
+        valid = work.index.isin(saved.index)  # type: ignore
+        processed = loaded.index.isin(work.index)  # type: ignore
+        # Every row takes its results from the saved results or, once processed, from work
+        table, kept = work[fields], valid
+        positions = previous.copy()
+        if state is not None and len(work):
+            table = pandas.concat([state['results'], table], ignore_index=True)
+            kept = numpy.concatenate([state['kept'], valid])
+            positions[processed] = len(state['results']) + numpy.arange(len(work))  # type: ignore
+        elif state is not None:
+            table, kept = state['results'], state['kept']
+        else:
+            positions = numpy.arange(len(work))
+        row_results = table.iloc[positions]
+        row_kept = kept[positions]
+        results = loaded.copy(deep=False)
+        for field in fields:
+            column = row_results[field]
+            column.index = loaded.index  # type: ignore
+            results[field] = column
+        if not row_kept.all():
+            results = results[row_kept]  # type: ignore
+        input_prefix = self._input_prefix(loaded)
+        appended_rows = self._appended_rows(state, loaded, input_prefix, processed)
+        self._incremental_stats = {
+            'rows_reused': int((~processed).sum()),
+            'rows_processed': int(processed.sum()),
+            'rows_appended': appended_rows,  # type: ignore
+        }
+        self.logger.info('Reused {rows_reused} rows and processed {rows_processed} rows '
+                         'of {0}'.format(self, **self._incremental_stats))
+        if not keep_input:
+            self._dataframe = results
+        if appended_rows is None:
+            self._save(self._project(results))
+        else:
+            self.logger.info('Appending {} rows to {}'.format(appended_rows,
+                                                              self.output_file_path))
+            new_rows = results.index >= len(loaded) - appended_rows  # type: ignore
+            self._save(self._project(results[new_rows]), append=True)  # type: ignore
+        # Rows with the same fingerprint have the same results, they are saved once
+        unique, first, rows = numpy.unique(  # type: ignore
+            fingerprints, return_index=True, return_counts=True)
+        self.save_state({
+            'signature': signature,
+            'fingerprints': unique,
+            'rows': rows,
+            'results': row_results.iloc[first].reset_index(drop=True),
+            'kept': row_kept[first],
+            'keys': {
+                index: rule_keys.iloc[first].reset_index(drop=True)
+                for index, rule_keys in keys.items()
+            },
+            'input_prefix': input_prefix,
+            'output_size': os.path.getsize(self.output_file_path),
+        })
+
+    def _input_prefix(self, loaded: pandas.DataFrame) -> Optional[Dict[str, Any]]:
+        """
+        Describes the input of an incremental run with an appendable output, so the next run can
+        tell whether rows were only appended to it
+        :param loaded: The loaded input
+        :return: The size, content hash, number of rows and dtypes of the input, None when the
+        output can not be appended to
+        """
+        sink = DATA_SINKS.get(self.output_format)  # type: ignore
+        if sink is None or not sink.appendable:
+            return None
+        size = os.path.getsize(self.input_file_path)
+        return {
+            'size': size,
+            'hash': _file_hash(self.input_file_path, size),
+            'rows': len(loaded),
+            'dtypes': loaded.dtypes.astype(str).to_dict(),
+        }
+
+    def _appended_rows(self, state: Optional[Dict[str, Any]], loaded: pandas.DataFrame,
+                       input_prefix: Optional[Dict[str, Any]],
+                       processed: numpy.ndarray) -> Optional[int]:
+        """
+        Finds out whether rows were only appended to the input since the last run, with the
+        earlier rows, their dtypes and their results unchanged, and the output left as it was
+        :param state: The state of the last run
+        :param loaded: The loaded input
+        :param input_prefix: The description of the input, from _input_prefix
+        :param processed: Whether each row was processed on this run
+        :return: The number of rows appended, None when the whole output must be saved again
+        """
+        if state is None or input_prefix is None or state['input_prefix'] is None:
+            return None
+        saved_prefix = state['input_prefix']
+        if not os.path.exists(self.output_file_path):
+            return None
+        if os.path.getsize(self.output_file_path) != state['output_size']:
+            return None
+        if input_prefix['dtypes'] != saved_prefix['dtypes']:
+            return None
+        if input_prefix['size'] < saved_prefix['size'] or len(loaded) < saved_prefix['rows']:
+            return None
+        if processed[:saved_prefix['rows']].any():
+            return None
+        # The earlier rows are those of the last run when its input is a prefix of this one
+        # that ends on a whole line
+        if _file_hash(self.input_file_path, saved_prefix['size']) != saved_prefix['hash']:
+            return None
+        with open(self.input_file_path, 'rb') as input_file:
+            input_file.seek(max(saved_prefix['size'] - 1, 0))
+            if saved_prefix['size'] and input_file.read(1) not in (b'\n', b'\r'):
+                return None
+        return len(loaded) - saved_prefix['rows']  # type: ignore
+
+    def incremental_signature(self) -> Dict[str, Any]:
+        """
+        What the results of an incremental run depend on besides the rows, the state of the last
+        run is only reused when it matches
+        :return: A json serialisable dictionary
+        """
+        return {
+            'load_options': self.load_options(),
+            'output_columns': self.output_columns,
+            'quarantine': self.quarantine,
+            'rules': [rule.signature() for rule in self.rules],
+        }
+
+    def load_state(self, signature: str) -> Optional[Dict[str, Any]]:
+        """
+        Reads the state of the last incremental run
+        :param signature: The json incremental signature of this run
+        :return: The state, None when there is none or it does not match this run
+        """
+        if not os.path.exists(self.state_path):
+            return None
+        state: Dict[str, Any] = pandas.read_pickle(self.state_path)  # type: ignore
+        if state.get('signature') != signature:
+            self.logger.info('{} changed since the last run, processing every row'.format(self))
+            return None
+        return state
+
+    def save_state(self, state: Dict[str, Any]) -> None:
+        """
+        Saves the state of an incremental run to state_path, written then renamed so a failed
+        run leaves the state of the last one
+        :param state: The state
+        :return: None
+        """
+        descriptor, partial_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.state_path)), suffix='.partial')
+        os.close(descriptor)
+        try:
+            pandas.to_pickle(state, partial_path)  # type: ignore
+            os.replace(partial_path, self.state_path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+    @property
+    def state_path(self) -> str:
+        """
+        Where incremental runs keep the fingerprints and results of the rows, next to the output
+        :return: A file path
+        """
+        return self.output_file_path + '.state.pickle'
+
+    @property
+    def run_report_path(self) -> str:
+        """
+        Where the run report is saved, next to the output
+        :return: A file path
+        """
+        return self.output_file_path + '.report.json'
+
+    @property
+    def rejects_path(self) -> str:
+        """
+        Where the entries that failed to validate are saved, next to the output
+        :return: A file path
+        """
+        return '{}.rejects.{}'.format(self.output_file_path, self.rejects_format)
+
+    @property
+    def quarantine_path(self) -> str:
+        """
+        Where the rows that failed to validate are saved when quarantining, next to the output
+        and in the output format
+        :return: A file path
+        """
+        return '{}.quarantine.{}'.format(self.output_file_path, self.output_format or 'ndjson')
+
+    @property
+    def validation_error_counts(self) -> Dict[str, int]:
+        """
+        The number of entries that failed to validate on the last run, per exception class
+        :return: A dictionary
+        """
+        counts: Dict[str, int] = {}
+        for rule in self.rules:
+            if rule.validation_errors is not None:
+                for error, count in rule.validation_errors.counts.items():
+                    counts[error] = counts.get(error, 0) + count
+        return counts
+
+    def save_run_report(self) -> None:
+        """
+        Saves the report of the last run to run_report_path in json format
+        :return: None
+        """
+        with open(self.run_report_path, 'w') as report_file:
+            json.dump(self.run_report, report_file, indent=4)
+
+    def _load_chunks_profiled(self, stage: str = 'load') -> Iterator[pandas.DataFrame]:
+        """
+        Iterates over load_chunks, timing each chunk as part of a load stage
+        :param stage: The stage name, the passes that only accumulate state have their own
+        :return: An iterator of dataframes
+        """
+        chunks = self.load_chunks()
+        while True:
+            with self._profiler.stage(stage) as stats:
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    stats.rows_out += len(chunk)
+            if chunk is None:
+                return
+            yield chunk
+
+    def _save(self, dataframe: pandas.DataFrame, append: bool = False) -> None:
+        """
+        Saves the results of a whole run as a timed stage, through save_to_json_out unless an
+        output_format is given
+        :param dataframe: The results to save
+        :param append: Whether to add them to the end of the output, for appendable sinks
+        :return: None
+        """
+        with self._profiler.stage('save', rows_in=len(dataframe)) as stats:
+            if self.output_format is None:
+                self.save_to_json_out(dataframe)
+            else:
+                self.logger.info('Saving {} results to {}'.format(self, self.output_file_path))
+                with self.make_sink(append) as sink:
+                    sink.write(dataframe)
+            stats.rows_out += len(dataframe)
+
+    def make_sink(self, append: bool = False) -> AbstractDataSink:
+        """
+        Creates the sink for the output of this job, ndjson unless an output_format is given
+        :param append: Whether the sink adds to the end of the existing output
+        :return: A data sink, not opened yet
+        """
+        sink = DATA_SINKS[self.output_format or 'ndjson']
+        if append:
+            return sink(self.output_file_path, compression=self.compression, append=True)
+        return sink(self.output_file_path, compression=self.compression)
+
+    def _project(self, dataframe: pandas.DataFrame) -> pandas.DataFrame:
+        """
+        Keeps the output columns of a dataframe, in their order, without copying them
+        :param dataframe: A transformed dataframe
+        :return: The dataframe to save
+        """
+        if self.output_columns is None or list(dataframe.columns) == self.output_columns:
+            return dataframe
+        return pandas.DataFrame(  # type: ignore
+            {column: dataframe[column] for column in self.output_columns}, copy=False)
+
+    def _apply_rules(self, dataframe: pandas.DataFrame, rules: List[AbstractDataRule],
+                     offset: int = 0) -> pandas.DataFrame:
+        """
+        Applies the rules in order to a dataframe, consecutive rules on the same field are fused
+        unless fuse_rules is off. When sharding, consecutive row local rules are applied together
+        on the row shards, and timed as a single stage, and the rules needing global state in
+        this process
+        :param dataframe: The dataframe to transform
+        :param rules: The rules to apply, consecutive job rules
+        :param offset: The position of the first of the rules in the job rules
+        :return: The transformed dataframe
+        """
+        if self.fuse_rules:
+            plan = plan_rules(rules)
+        else:
+            plan = [([index], rule) for index, rule in enumerate(rules)]
+        if offset:
+            plan = [([offset + index for index in indices], rule) for indices, rule in plan]
+        executor = self._executor
+        if executor is None or len(dataframe) < 2:
+            for step in plan:
+                dataframe = self._apply_stage(dataframe, [step])
+            return dataframe
+        row_local_steps: List[Tuple[List[int], AbstractDataRule]] = []
+        for step in plan:
+            if step[1].row_local:
+                row_local_steps.append(step)
+                continue
+            if row_local_steps:
+                dataframe = self._apply_stage(dataframe, row_local_steps, executor)
+                row_local_steps = []
+            dataframe = self._apply_stage(dataframe, [step])
+        if row_local_steps:
+            dataframe = self._apply_stage(dataframe, row_local_steps, executor)
+        return dataframe
+
+    def _apply_stage(self, dataframe: pandas.DataFrame,
+                     steps: List[Tuple[List[int], AbstractDataRule]],
+                     executor: Optional[Executor] = None) -> pandas.DataFrame:
+        """
+        Applies a single rule, a fused rule chain, or a group of row local rules on the row
+        shards, as a timed stage
+        :param dataframe: The dataframe to transform
+        :param steps: The rules to apply, with the positions in the job rules of the rules they
+        chain
+        :param executor: The executor to run the row shards on, the rules are applied in this
+        process otherwise
+        :return: The transformed dataframe
+        """
+        name = ' + '.join(
+            _stage_name(index, chained)
+            for indices, rule in steps for index, chained in zip(indices, rule.chained_rules)
+        )
+        stage_rules = [rule for _, rule in steps]
+        chained_rules = [chained for rule in stage_rules for chained in rule.chained_rules]
+        with self._profiler.stage(name, rows_in=len(dataframe), rules=chained_rules) as stats:
+            if executor is None:
+                for rule in stage_rules:
+                    dataframe = rule.apply_rule(dataframe)
+            else:
+                dataframe = apply_rules_sharded(dataframe, stage_rules, executor,
+                                                self.shards or 1)
+            stats.rows_out += len(dataframe)
+        return dataframe
+
+    def _split_rejects(self, loaded: pandas.DataFrame,
+                       transformed: pandas.DataFrame) -> pandas.DataFrame:
+        """
+        Writes the entries the rules collected on a dataframe, or chunk, to the rejects file, so
+        only the rejects of a single chunk are ever kept in memory. When quarantining, the rows
+        with a rejected entry are written to the quarantine file and dropped from the results
+        :param loaded: The dataframe as it was loaded
+        :param transformed: The dataframe with all the rules applied
+        :return: The results to save
+        """
+        rejects = pandas.concat([
+            rule.validation_errors.take() for rule in self.rules
+            if rule.validation_errors is not None
+        ] or [ValidationErrors().take()], ignore_index=True)
+        if self._rejects_sink is not None:
+            self._rejects_sink.write(rejects)
+        if self._quarantine_sink is None:
+            return transformed
+        valid = ~transformed.index.isin(rejects['row'])
+        with self._profiler.stage('quarantine', rows_in=len(transformed)) as stats:
+            # The first rule each row failed, rules are applied and collected in order
+            reasons = rejects.drop_duplicates('row').set_index('row').drop(columns='value')
+            quarantined = loaded[~valid].join(reasons.add_prefix('rejected_'))  # type: ignore
+            quarantined.insert(len(loaded.columns), 'rejected_row', quarantined.index)
+            self._quarantine_sink.write(quarantined)
+            stats.rows_out += len(quarantined)
+        if valid.all():
+            return transformed
+        return transformed[valid]  # type: ignore
+
+    @contextmanager
+    def _collect_rejects(self) -> Iterator[None]:
+        """
+        Gives every rule a fresh validation error collector and keeps the rejects and quarantine
+        files open while the context is active. The rules only count their errors when neither
+        is written
+        :return: None
+        """
+        for rule in self.rules:
+            rule.validation_errors = ValidationErrors(
+                keep_rows=self.rejects_format is not None or self.quarantine)
+            rule.logged_errors = 0
+        with ExitStack() as stack:
+            if self.rejects_format is not None:
+                self._rejects_sink = stack.enter_context(DATA_SINKS[self.rejects_format](
+                    self.rejects_path, compression=None))
+            if self.quarantine:
+                self._quarantine_sink = stack.enter_context(
+                    DATA_SINKS[self.output_format or 'ndjson'](self.quarantine_path,
+                                                               compression=None))
+            try:
+                yield
+            finally:
+                self._rejects_sink = None
+                self._quarantine_sink = None
+
+    @contextmanager
+    def _shard_executor(self) -> Iterator[None]:
+        """
+        Keeps a process pool for the row shards open while the context is active, when sharding.
+        The workers use the postcode validation cache size of this process
+        :return: None
+        """
+        if self.shards is None or self.shards < 2:
+            yield
+            return
+        with ProcessPoolExecutor(max_workers=self.shards,
+                                 initializer=resize_postcode_validation_cache,
+                                 initargs=(postcode_validation_cache.maxsize,)) as executor:
+            self._executor = executor
+            try:
+                yield
+            finally:
+                self._executor = None
+
     @property
     def error(self) -> bool:
         """
@@ -130,3 +855,67 @@ class AbstractDataManager(ABC):
             False: 'SUCCESS',
             True: 'FAIL'
         }[self.error]
+
+
+def _counts_changed(previous: numpy.ndarray, rows: numpy.ndarray) -> bool:
+    """
+    :param previous: The position on the state of the results of each row, -1 for new rows
+    :param rows: The number of rows of each position on the last run
+    :return: Whether any of the rows of the last run is not there as many times now
+    """
+    counts = numpy.bincount(previous[previous >= 0], minlength=len(rows))  # type: ignore
+    return not numpy.array_equal(counts, rows)
+
+
+def _fingerprint(dataframe: pandas.DataFrame) -> numpy.ndarray:
+    """
+    Identifies the rows of a dataframe by their content
+    :param dataframe: The fields of the rows to identify them by
+    :return: A uint64 hash of each row
+    """
+    if len(dataframe.columns) == 0:
+        return numpy.zeros(len(dataframe), dtype=numpy.uint64)
+    return pandas.util.hash_pandas_object(dataframe, index=False).to_numpy()  # type: ignore
+
+
+def _file_hash(path: str, size: int) -> str:
+    """
+    :param path: A file
+    :param size: The number of bytes to hash, from the start of the file
+    :return: The sha256 hex digest of the first size bytes of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as hashed_file:
+        while size > 0:
+            block = hashed_file.read(min(size, HASH_BLOCK_SIZE))
+            if not block:
+                break
+            digest.update(block)
+            size -= len(block)
+    return digest.hexdigest()
+
+
+def _stage_name(index: int, rule: AbstractDataRule) -> str:
+    """
+    :param index: The position of the rule in the job rules
+    :param rule: The rule
+    :return: The name of the stage applying the rule, such as rule 0 AgeBandRule(dob)
+    """
+    return 'rule {} {}({})'.format(index, rule.__class__.__name__, ', '.join(rule.fields))
+
+
+@contextmanager
+def _silenced(rules: List[AbstractDataRule]) -> Iterator[None]:
+    """
+    Stops the rules from reporting validation errors while the context is active, used on the
+    passes that only accumulate state so errors are reported once
+    :param rules: The rules to silence
+    :return: None
+    """
+    for rule in rules:
+        rule.silenced = True
+    try:
+        yield
+    finally:
+        for rule in rules:
+            rule.silenced = False
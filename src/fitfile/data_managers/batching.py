@@ -0,0 +1,30 @@
+from itertools import islice
+from typing import (
+    Any,
+    Iterator,
+    List,
+    Optional,
+)
+
+import pandas
+
+
+def batch_dataframes(rows: Iterator[Any], batch_size: Optional[int],
+                     columns: Optional[List[str]] = None) -> Iterator[pandas.DataFrame]:
+    """
+    Groups the rows of a streaming reader into dataframes, indexed as if they were slices of a
+    single dataframe
+    :param rows: Tuples of values in the order of columns, or dictionaries when columns is None
+    :param batch_size: The number of rows of each dataframe, None for a single dataframe
+    :param columns: The column names
+    :return: An iterator of dataframes, always yielding at least one
+    """
+    start = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch and start:
+            return
+        yield pandas.DataFrame(batch, columns=columns, index=range(start, start + len(batch)))
+        if batch_size is None or len(batch) < batch_size:
+            return
+        start += len(batch)
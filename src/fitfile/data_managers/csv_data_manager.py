@@ -1,9 +1,85 @@
 import pandas
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+)
 
 from fitfile.data_managers.abstract_data_manager import AbstractDataManager
+from fitfile.data_managers.parallel_csv import (
+    read_csv_arrow,
+    read_csv_parallel,
+)
+
+CSV_ENGINES = ('c', 'parallel', 'pyarrow')
+STRING_DTYPES = ('str', 'string', 'object', 'category')
 
 
 class CsvDataManager(AbstractDataManager):
     """Class to manage process with an input coming from csv"""
+    def __init__(self, *args: Any, engine: str = 'c', parse_workers: Optional[int] = None,
+                 **kwargs: Any) -> None:
+        """
+        :param engine: How the whole input is parsed. c parses it with pandas.read_csv, parallel
+        memory maps it and parses byte ranges of whole records on parse_workers processes, and
+        pyarrow uses the multithreaded pyarrow csv reader, falling back to pandas.read_csv when
+        a column does not keep the type arrow inferred. Streaming runs always use pandas.read_csv
+        :param parse_workers: The number of processes of the parallel engine, the number of CPUs
+        by default
+        Any other argument is passed to AbstractDataManager
+        """
+        super().__init__(*args, **kwargs)
+        if engine not in CSV_ENGINES:
+            raise ValueError('Unknown csv engine {}, expected one of {}'.format(
+                engine, CSV_ENGINES))
+        self.engine = engine
+        self.parse_workers = parse_workers
+
+    def load_options(self) -> Dict[str, Any]:
+        return dict(super().load_options(), engine=self.engine)
+
     def load_data(self) -> pandas.DataFrame:
-        return pandas.read_csv(self.input_file_path)
+        if self.engine == 'parallel':
+            dataframe = read_csv_parallel(self.input_file_path, self.parse_workers,
+                                          {'usecols': self.columns, 'dtype': self.dtype})
+        elif self.engine == 'pyarrow':
+            dataframe = self._read_csv_arrow()
+        else:
+            dataframe = pandas.read_csv(self.input_file_path, usecols=self.columns,
+                                        dtype=self.dtype)
+        return self.apply_schema(dataframe)
+
+    def load_chunks(self) -> Iterator[pandas.DataFrame]:
+        """
+        Reads the csv in chunks of chunksize rows
+        :return: An iterator of dataframes
+        """
+        reader = pandas.read_csv(self.input_file_path, usecols=self.columns, dtype=self.dtype,
+                                 chunksize=self.chunksize)
+        with reader:  # type: ignore
+            for chunk in reader:
+                yield self.apply_schema(chunk)
+
+    def _read_csv_arrow(self) -> pandas.DataFrame:
+        """
+        Reads the csv with pyarrow, the columns with a string dtype are read as strings and the
+        others are typed by apply_schema
+        :return: A dataframe
+        """
+        try:
+            import pyarrow  # type: ignore
+        except ImportError:
+            raise ImportError('The pyarrow csv engine needs the pyarrow package, '
+                              'pip install fitfile[arrow]')
+        string_columns: List[str] = [
+            column for column, dtype in (self.dtype or {}).items()
+            if str(dtype) in STRING_DTYPES or dtype is str
+        ]
+        try:
+            return read_csv_arrow(self.input_file_path, self.columns, string_columns)
+        except pyarrow.ArrowInvalid as e:
+            self.logger.warning('Falling back to pandas.read_csv, pyarrow could not parse '
+                                '{}: {}'.format(self.input_file_path, e))
+            return pandas.read_csv(self.input_file_path, usecols=self.columns, dtype=self.dtype)
@@ -1,9 +1,115 @@
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import openpyxl  # type: ignore
 import pandas
 
 from fitfile.data_managers.abstract_data_manager import AbstractDataManager
+from fitfile.data_managers.batching import batch_dataframes
 
 
 class ExcelDataManager(AbstractDataManager):
-    """Class to manage process with an input coming from excel"""
+    """
+    Class to manage process with an input coming from excel. The workbook is read in read-only
+    mode, streaming the rows of a single sheet and only converting the selected columns
+    """
+    def __init__(self, *args: Any, sheet_name: Union[str, int] = 0,
+                 usecols: Optional[List[str]] = None, **kwargs: Any) -> None:
+        """
+        :param sheet_name: The name or the position of the sheet to read, the first by default
+        :param usecols: The columns to read, by default the columns the job uses when it sets
+        output_columns, or all of them
+        Any other argument is passed to AbstractDataManager
+        """
+        super().__init__(*args, **kwargs)
+        self.sheet_name = sheet_name
+        self.usecols = usecols
+
+    def load_options(self) -> Dict[str, Any]:
+        return dict(super().load_options(), sheet_name=self.sheet_name, usecols=self.usecols)
+
     def load_data(self) -> pandas.DataFrame:
-        return pandas.read_excel(self.input_file_path)  # type: ignore
+        for dataframe in self._read_batches(None):
+            return dataframe
+        raise ValueError('Sheet {} of {} has no header row'.format(
+            self.sheet_name, self.input_file_path))
+
+    def load_chunks(self) -> Iterator[pandas.DataFrame]:
+        """
+        Streams the sheet in chunks of chunksize rows
+        :return: An iterator of dataframes
+        """
+        return self._read_batches(self.chunksize)
+
+    def _read_batches(self, batch_size: Optional[int]) -> Iterator[pandas.DataFrame]:
+        """
+        Reads the sheet rows, the first one being the header, into dataframes of batch_size rows.
+        Blank rows at the end of the sheet are dropped, as pandas.read_excel does
+        :param batch_size: The number of rows of each dataframe, None for a single dataframe
+        :return: An iterator of dataframes, always yielding at least one for a sheet with a header
+        """
+        workbook = openpyxl.load_workbook(self.input_file_path, read_only=True, data_only=True)
+        try:
+            if isinstance(self.sheet_name, int):
+                sheet = workbook.worksheets[self.sheet_name]
+            else:
+                sheet = workbook[self.sheet_name]
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [
+                'Unnamed: {}'.format(index) if name is None else str(name)
+                for index, name in enumerate(header)
+            ]
+            indices = self._column_indices(columns)
+            columns = [columns[index] for index in indices]
+            selected = (
+                tuple(row[index] if index < len(row) else None for index in indices)
+                for row in rows
+            )
+            non_blank = _without_trailing_blank_rows(selected)
+            for dataframe in batch_dataframes(non_blank, batch_size, columns):
+                yield self.apply_schema(dataframe)
+        finally:
+            workbook.close()
+
+    def _column_indices(self, columns: List[str]) -> List[int]:
+        """
+        The positions of the columns to read
+        :param columns: The names of all the columns of the sheet
+        :return: The positions of the usecols, in sheet order, or of every column
+        """
+        usecols = self.usecols if self.usecols is not None else self.columns
+        if usecols is None:
+            return list(range(len(columns)))
+        missing = set(usecols) - set(columns)
+        if missing:
+            raise ValueError('Columns {} are not in sheet {} of {}'.format(
+                sorted(missing), self.sheet_name, self.input_file_path))
+        return [index for index, name in enumerate(columns) if name in usecols]
+
+
+def _without_trailing_blank_rows(rows: Iterator[Tuple[Any, ...]]) -> Iterator[Tuple[Any, ...]]:
+    """
+    Holds blank rows back until a row with a value follows them, so the empty rows at the end of
+    a sheet, which read-only worksheets often report, are dropped
+    :param rows: The rows of a sheet
+    :return: An iterator of rows
+    """
+    blank_rows: List[Tuple[Any, ...]] = []
+    for row in rows:
+        if all(value is None for value in row):
+            blank_rows.append(row)
+            continue
+        if blank_rows:
+            yield from blank_rows
+            blank_rows = []
+        yield row
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+import numpy
+import pandas
+
+INPUT_CACHE_SIZE = 2 ** 30
+HASH_BLOCK_SIZE = 2 ** 20
+# The arrow schema metadata key listing the object columns whose missing values are NaN
+NAN_COLUMNS_KEY = b'fitfile.nan_columns'
+
+
+class InputCacheException(Exception):
+    pass
+
+
+class InputCache(object):
+    """
+    On disk cache of parsed inputs, stored as feather files so an input that did not change is
+    read back instead of parsed again. Entries are keyed by the input path, size, modification
+    time and content hash, and by the load options of the job, such as the columns it reads and
+    their dtypes. Reading a cached entry refreshes its modification time, the least recently used
+    entries are evicted once the cache is above max_bytes. Needs the optional pyarrow dependency
+    """
+    def __init__(self, cache_dir: str, max_bytes: int = INPUT_CACHE_SIZE) -> None:
+        """
+        :param cache_dir: The directory holding the cached inputs, created if needed
+        :param max_bytes: The maximum size of the cached inputs
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self) -> str:
+        return 'Input cache hits: {}, misses: {}, evictions: {}, size: {}/{} bytes'.format(
+            self.hits, self.misses, self.evictions, self.currsize, self.max_bytes)
+
+    @property
+    def pyarrow(self) -> Any:
+        """
+        The pyarrow module
+        :return: The module, raises InputCacheException when pyarrow is not installed
+        """
+        try:
+            import pyarrow  # type: ignore
+            import pyarrow.feather  # type: ignore # noqa: F401
+        except ImportError:
+            raise InputCacheException('The input cache needs the pyarrow package, '
+                                      'pip install fitfile[arrow]')
+        return pyarrow
+
+    def key(self, input_file_path: str, options: Dict[str, Any]) -> str:
+        """
+        The cache key of an input, hashes the whole input so an input rewritten in place with
+        the same size and modification time is not mistaken for the cached one
+        :param input_file_path: The input file
+        :param options: The load options the parsed dataframe depends on, json serialisable
+        :return: A hex digest
+        """
+        stat = os.stat(input_file_path)
+        content = hashlib.sha256()
+        with open(input_file_path, 'rb') as input_file:
+            for block in iter(lambda: input_file.read(HASH_BLOCK_SIZE), b''):
+                content.update(block)
+        key = json.dumps([os.path.abspath(input_file_path), stat.st_size, stat.st_mtime_ns,
+                          content.hexdigest(), options], sort_keys=True, default=str)
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.feather')
+
+    def get(self, key: str) -> Optional[pandas.DataFrame]:
+        """
+        Reads a cached input, counting a hit or a miss
+        :param key: The cache key
+        :return: The dataframe, None when it is not cached
+        """
+        path = self.path(key)
+        try:
+            table = self.pyarrow.feather.read_table(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        os.utime(path)
+        dataframe = table.to_pandas()
+        nan_columns = json.loads((table.schema.metadata or {}).get(NAN_COLUMNS_KEY, b'[]'))
+        for column in nan_columns:
+            # Arrow keeps a single kind of null, restore the NaN the loader produced
+            dataframe[column] = dataframe[column].fillna(numpy.nan)
+        return dataframe  # type: ignore
+
+    def put(self, key: str, dataframe: pandas.DataFrame) -> bool:
+        """
+        Caches a parsed input, then evicts the least recently used entries above max_bytes
+        :param key: The cache key
+        :param dataframe: The parsed input, with a default index
+        :return: Whether it was cached, columns arrow can not type, such as a mix of numbers
+        and strings, are not
+        """
+        pyarrow = self.pyarrow
+        try:
+            table = pyarrow.Table.from_pandas(dataframe, preserve_index=False)
+        except (pyarrow.ArrowException, TypeError, ValueError):
+            return False
+        metadata = dict(table.schema.metadata or {})
+        metadata[NAN_COLUMNS_KEY] = json.dumps(_nan_columns(dataframe)).encode()
+        table = table.replace_schema_metadata(metadata)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write then rename, so concurrent jobs never read a partial entry
+        descriptor, partial_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.partial')
+        os.close(descriptor)
+        try:
+            pyarrow.feather.write_feather(table, partial_path)
+            os.replace(partial_path, self.path(key))
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        self.evict()
+        return True
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries until the cache is within max_bytes
+        :return: None
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime_ns)
+        size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if size <= self.max_bytes:
+                return
+            size -= entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                # Evicted by another job
+                continue
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Removes every entry and resets the counters
+        :return: None
+        """
+        for entry in self._entries():
+            os.remove(entry.path)
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def currsize(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self) -> List[os.DirEntry]:
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.feather')]
+
+
+def _nan_columns(dataframe: pandas.DataFrame) -> List[str]:
+    """
+    :param dataframe: A parsed input
+    :return: The object columns whose missing values are all NaN, rather than None
+    """
+    columns = []
+    for column in dataframe.columns:
+        series = dataframe[column]
+        if series.dtype != object:
+            continue
+        missing = series[series.isna()]
+        if len(missing) and not any(value is None for value in missing):
+            columns.append(str(column))
+    return columns
@@ -1,9 +1,218 @@
+import json
+import os
+import re
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+)
+
 import pandas
 
 from fitfile.data_managers.abstract_data_manager import AbstractDataManager
+from fitfile.data_managers.batching import batch_dataframes
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+READ_SIZE = 2 ** 20
+LINES_EXTENSIONS = ('.ndjson', '.jsonl')
 
 
 class JsonDataManager(AbstractDataManager):
-    """Class to manage process with an input coming from json"""
+    """
+    Class to manage process with an input coming from json, either an array of records or
+    newline delimited records
+    """
+    def __init__(self, *args: Any, lines: Optional[bool] = None, **kwargs: Any) -> None:
+        """
+        :param lines: Whether the input has one record per line, inferred from an .ndjson or
+        .jsonl extension by default
+        Any other argument is passed to AbstractDataManager
+        """
+        super().__init__(*args, **kwargs)
+        if lines is None:
+            lines = os.path.splitext(self.input_file_path)[1].lower() in LINES_EXTENSIONS
+        self.lines = lines
+
+    def load_options(self) -> Dict[str, Any]:
+        return dict(super().load_options(), lines=self.lines)
+
     def load_data(self) -> pandas.DataFrame:
-        return pandas.read_json(self.input_file_path)  # type: ignore
+        """
+        Decodes arrays of records and newline delimited records as load_chunks does, so the
+        values and dtypes do not depend on chunksize or output_columns. Only the dtype and
+        parse_dates of the job convert them
+        :return: A dataframe
+        """
+        if self.lines or self._is_array():
+            [dataframe] = self._read_batches(None)
+            return dataframe
+        dataframe = pandas.read_json(self.input_file_path, dtype=False,  # type: ignore
+                                     convert_dates=False)
+        columns = self.columns
+        if columns is not None:
+            self._check_columns(set(columns) - set(dataframe.columns))
+            dataframe = dataframe[columns]
+        return self.apply_schema(dataframe)
+
+    def load_chunks(self) -> Iterator[pandas.DataFrame]:
+        """
+        Decodes the input incrementally, in chunks of chunksize records, so only one chunk of
+        records is ever in memory
+        :return: An iterator of dataframes
+        """
+        return self._read_batches(self.chunksize)
+
+    def _read_batches(self, batch_size: Optional[int]) -> Iterator[pandas.DataFrame]:
+        """
+        Decodes the records of the input into dataframes of batch_size rows, keeping only the
+        columns the job uses when it sets output_columns. Records may miss some of them, but
+        each one must be in a record of the first batch
+        :param batch_size: The number of rows of each dataframe, None for a single dataframe
+        :return: An iterator of dataframes
+        """
+        columns = self.columns
+        with open(self.input_file_path) as input_file:
+            records = iter_lines(input_file) if self.lines else iter_array(input_file)
+            if columns is None:
+                batches = batch_dataframes(records, batch_size)
+            else:
+                missing = set(columns)
+                rows = (_project(record, columns, missing) for record in records)
+                batches = batch_dataframes(rows, batch_size, columns)
+            for index, dataframe in enumerate(batches):
+                if columns is not None and index == 0 and len(dataframe):
+                    self._check_columns(missing)
+                yield self.apply_schema(dataframe)
+
+    def _check_columns(self, missing: Set[str]) -> None:
+        """
+        :param missing: The columns the job uses that are not in the input
+        :return: None, raises ValueError when there are any
+        """
+        if missing:
+            raise ValueError('Columns {} are not in {}'.format(
+                sorted(missing), self.input_file_path))
+
+    def _is_array(self) -> bool:
+        """
+        :return: Whether the input is a json array, rather than an object
+        """
+        with open(self.input_file_path) as input_file:
+            for line in input_file:
+                if line.strip():
+                    return line.lstrip().startswith('[')
+        return False
+
+
+def iter_lines(input_file: TextIO) -> Iterator[Dict[str, Any]]:
+    """
+    Decodes newline delimited json records one line at a time, blank lines are skipped
+    :param input_file: The input, opened in text mode
+    :return: An iterator of records
+    """
+    for line in input_file:
+        if line.strip():
+            yield _check_record(json.loads(line))
+
+
+def iter_array(input_file: TextIO, read_size: int = READ_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Decodes the records of a json array incrementally, only the current block of text and the
+    record being decoded are kept in memory
+    :param input_file: The input, opened in text mode
+    :param read_size: The number of characters to read at a time
+    :return: An iterator of records
+    """
+    reader = _ArrayReader(input_file, read_size)
+    if reader.next_token() != '[':
+        raise reader.error("Expecting '['")
+    reader.position += 1
+    if reader.next_token() == ']':
+        return
+    while True:
+        yield _check_record(reader.decode())
+        token = reader.next_token()
+        if token == ']':
+            return
+        if token != ',':
+            raise reader.error("Expecting ',' delimiter")
+        reader.position += 1
+
+
+class _ArrayReader(object):
+    """A buffer over a json text file, read in blocks as the array is decoded"""
+    def __init__(self, input_file: TextIO, read_size: int) -> None:
+        self.input_file = input_file
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+
+    def read(self, size: int) -> bool:
+        """
+        Drops the decoded text from the buffer and appends the next block of the file
+        :param size: The number of characters to read
+        :return: Whether anything was read, False at the end of the file
+        """
+        text = self.input_file.read(size)
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+        return bool(text)
+
+    def next_token(self) -> str:
+        """
+        Moves past any whitespace, reading more of the file when needed
+        :return: The next character
+        """
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()  # type: ignore
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read(self.read_size):
+                raise self.error('Unterminated array')
+
+    def decode(self) -> Any:
+        """
+        Decodes the value at the current position, reading more of the file while it is
+        incomplete. Each retry reads at least as much as is buffered, so a large value is
+        decoded in a logarithmic number of attempts
+        :return: The decoded value
+        """
+        self.next_token()
+        while True:
+            try:
+                value, self.position = self.decoder.raw_decode(self.buffer, self.position)
+                return value
+            except json.JSONDecodeError:
+                if not self.read(max(self.read_size, len(self.buffer))):
+                    raise
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self.buffer, self.position)
+
+
+def _project(record: Dict[str, Any], columns: List[str], missing: Set[str]) -> Tuple[Any, ...]:
+    """
+    :param record: A decoded record
+    :param columns: The columns to keep
+    :param missing: The columns not seen in any record yet, updated with the record keys
+    :return: The values of the columns, None for the keys the record does not have
+    """
+    if missing:
+        missing.difference_update(record)
+    return tuple(record.get(column) for column in columns)
+
+
+def _check_record(record: Any) -> Dict[str, Any]:
+    """
+    :param record: A decoded json value
+    :return: The value, when it is a record
+    """
+    if not isinstance(record, dict):
+        raise ValueError('Expected a json object for each record, got {!r}'.format(record))
+    return record
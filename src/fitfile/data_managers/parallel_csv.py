@@ -0,0 +1,186 @@
+import io
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy
+import pandas
+
+# The number of bytes counted at once when counting quotes
+SCAN_SIZE = 2 ** 24
+# The number of bytes first scanned for the end of a record, doubled until one is found
+RECORD_SCAN_SIZE = 2 ** 16
+# Ranges smaller than this are not worth a worker of their own
+MIN_RANGE_SIZE = 2 ** 20
+QUOTE = ord('"')
+NEWLINE = ord('\n')
+
+
+def split_csv(input_file_path: str, parts: int,
+              min_range_size: int = MIN_RANGE_SIZE) -> Tuple[int, List[Tuple[int, int]]]:
+    """
+    Splits a csv file into byte ranges of whole records. A record ends on a newline outside of
+    quotes, so newlines inside quoted fields, such as multi line addresses, never split one.
+    Escaped quotes are doubled, which keeps the count of quotes before a newline even outside of
+    quotes
+    :param input_file_path: The csv file, with a header line
+    :param parts: The number of ranges to aim for
+    :param min_range_size: The smallest range worth splitting off, in bytes
+    :return: The size of the header, and the start and end offset of each range
+    """
+    with open(input_file_path, 'rb') as input_file:
+        size = os.fstat(input_file.fileno()).st_size
+        if size == 0:
+            return 0, []
+        with mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header_size = _record_end(data, 0, 0)
+            parts = max(1, min(parts, (size - header_size) // min_range_size))
+            targets = numpy.linspace(header_size, size, parts + 1).astype(int)[1:-1]
+            bounds = [header_size]
+            quotes = 0
+            counted = header_size
+            for target in targets:
+                if target <= bounds[-1]:
+                    continue
+                quotes += _count_quotes(data, counted, target)
+                counted = target
+                bounds.append(_record_end(data, target, quotes % 2))
+    bounds.append(size)
+    ranges = [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+    return header_size, ranges
+
+
+def read_csv_range(input_file_path: str, header_size: int, start: int, end: int,
+                   read_options: Dict[str, Any]) -> pandas.DataFrame:
+    """
+    Parses a byte range of whole records of a csv file, with the header of the file
+    :param input_file_path: The csv file
+    :param header_size: The size of the header line
+    :param start: The offset of the first record of the range
+    :param end: The offset where the range ends
+    :param read_options: Keyword arguments for pandas.read_csv, such as usecols and dtype
+    :return: A dataframe
+    """
+    with open(input_file_path, 'rb') as input_file:
+        with mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            records = data[:header_size] + data[start:end]
+    return pandas.read_csv(io.BytesIO(records), **read_options)
+
+
+def read_csv_parallel(input_file_path: str, workers: Optional[int] = None,
+                      read_options: Optional[Dict[str, Any]] = None,
+                      min_range_size: int = MIN_RANGE_SIZE) -> pandas.DataFrame:
+    """
+    Reads a csv file by parsing byte ranges of it on a pool of worker processes, each one memory
+    maps the file and only reads its range. Like read_csv, which parses large files in chunks
+    too, a column whose values have different types on different ranges ends up as object
+    :param input_file_path: The csv file
+    :param workers: The number of worker processes, the number of CPUs by default
+    :param read_options: Keyword arguments for pandas.read_csv, such as usecols and dtype
+    :param min_range_size: The smallest range worth a worker, in bytes
+    :return: A dataframe, indexed as if it was read at once
+    """
+    read_options = read_options or {}
+    workers = workers or os.cpu_count() or 1
+    header_size, ranges = split_csv(input_file_path, workers, min_range_size)
+    if len(ranges) < 2:
+        return pandas.read_csv(input_file_path, **read_options)
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+        frames = list(executor.map(
+            read_csv_range, *zip(*[
+                (input_file_path, header_size, start, end, read_options)
+                for start, end in ranges
+            ])))
+    return pandas.concat(frames, ignore_index=True)
+
+
+def _count_quotes(data: mmap.mmap, start: int, end: int) -> int:
+    """
+    :return: The number of quote characters between two offsets
+    """
+    quotes = 0
+    for block_start in range(start, end, SCAN_SIZE):
+        block = numpy.frombuffer(data, dtype=numpy.uint8, offset=block_start,  # type: ignore
+                                 count=min(SCAN_SIZE, end - block_start))
+        quotes += int(numpy.count_nonzero(block == QUOTE))  # type: ignore
+    return quotes
+
+
+def _record_end(data: mmap.mmap, start: int, quoted: int) -> int:
+    """
+    Finds the end of the record an offset falls in
+    :param data: The memory mapped file
+    :param start: The offset
+    :param quoted: 1 when the offset is inside quotes, 0 otherwise
+    :return: The offset just after the first newline outside of quotes from start, the end of
+    the file when there is none
+    """
+    size = len(data)
+    scan_size = RECORD_SCAN_SIZE
+    while start < size:
+        block = numpy.frombuffer(data, dtype=numpy.uint8, offset=start,  # type: ignore
+                                 count=min(scan_size, size - start))
+        inside = (numpy.cumsum(block == QUOTE) + quoted) % 2
+        ends = numpy.flatnonzero((block == NEWLINE) & (inside == 0))
+        if len(ends):
+            return start + int(ends[0]) + 1
+        quoted = int(inside[-1])
+        start += len(block)
+        scan_size = min(scan_size * 2, SCAN_SIZE)
+    return size
+
+
+def read_csv_arrow(input_file_path: str, columns: Optional[List[str]] = None,
+                   string_columns: Optional[List[str]] = None) -> pandas.DataFrame:
+    """
+    Reads a csv file with the multithreaded pyarrow csv reader, typed like read_csv types it:
+    columns arrow infers as dates or times are read as strings, and missing strings are NaN.
+    Like read_csv, quoted fields may hold newlines
+    :param input_file_path: The csv file
+    :param columns: The columns to read, every column by default
+    :param string_columns: The columns to read as strings instead of inferring their type
+    :return: A dataframe, raises pyarrow.ArrowInvalid when a column does not keep the type
+    inferred from the first block of the file, or ImportError when pyarrow is not installed
+    """
+    import pyarrow  # type: ignore
+    import pyarrow.csv  # type: ignore
+    parse_options = pyarrow.csv.ParseOptions(newlines_in_values=True)
+    # The schema of the first block, to keep the dates and times arrow infers as text
+    with pyarrow.csv.open_csv(input_file_path, parse_options=parse_options) as reader:
+        schema = reader.schema
+    if columns is not None:
+        missing = [column for column in columns if column not in schema.names]
+        if missing:
+            raise ValueError('Columns {} are not in {}'.format(missing, input_file_path))
+        # In the order of the file, as read_csv keeps it
+        columns = [column for column in schema.names if column in columns]
+    column_types = {
+        field.name: pyarrow.string() for field in schema
+        if pyarrow.types.is_temporal(field.type) or field.name in (string_columns or [])
+    }
+    convert_options = pyarrow.csv.ConvertOptions(include_columns=columns,
+                                                 column_types=column_types,
+                                                 strings_can_be_null=True)
+    table = pyarrow.csv.read_csv(input_file_path, parse_options=parse_options,
+                                 convert_options=convert_options)
+    for field in table.schema:
+        if field.name not in column_types and field.type != schema.field(field.name).type:
+            # Arrow promotes such columns to text, read_csv mixes the types of each chunk
+            raise pyarrow.ArrowInvalid('Column {} was inferred as {} but read as {}'.format(
+                field.name, schema.field(field.name).type, field.type))
+    dataframe = table.to_pandas()
+    for field in table.schema:
+        if pyarrow.types.is_null(field.type):
+            # Columns with no values, which read_csv reads as float
+            dataframe[field.name] = dataframe[field.name].astype(float)
+        elif pyarrow.types.is_string(field.type):
+            # Arrow keeps a single kind of null, read_csv gives NaN
+            dataframe[field.name] = dataframe[field.name].fillna(numpy.nan)
+    return dataframe  # type: ignore
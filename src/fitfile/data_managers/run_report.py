@@ -0,0 +1,137 @@
+import datetime
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+)
+
+from fitfile.data_rules import AbstractDataRule
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    The peak resident memory of this process so far, worker processes are not included. It never
+    goes down, so it covers every job this process ran before
+    :return: A number of bytes, None where the platform does not provide it
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return int(peak) if sys.platform == 'darwin' else int(peak) * 1024
+
+
+def rss_bytes() -> Optional[int]:
+    """
+    The current resident memory of this process, worker processes are not included
+    :return: A number of bytes, None where the platform does not provide it
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StageStats(object):
+    """
+    The totals of a stage of a job, over every time it ran, with the largest growth of the
+    resident memory over a single run of the stage
+    """
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.errors = 0
+        self.rss_growth_bytes: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'wall_seconds': round(self.wall_seconds, 6),
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'errors': self.errors,
+            'rss_growth_bytes': self.rss_growth_bytes,
+        }
+
+
+class RunProfiler(object):
+    """
+    Times the stages of a job run, load, each rule and save. A stage that runs several times,
+    once per chunk when streaming, adds up. CPU time is that of this process, so it does not
+    include the work of shard worker processes
+    """
+    def __init__(self) -> None:
+        self.stages: Dict[str, StageStats] = {}
+        self.started_at = datetime.datetime.now()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int = 0,
+              rules: Optional[List[AbstractDataRule]] = None) -> Iterator[StageStats]:
+        """
+        Times a single run of a stage, the caller adds the rows it produced to the stage
+        :param name: The stage name
+        :param rows_in: The number of rows given to the stage
+        :param rules: The rules the stage applies, to count the validation errors they report
+        :return: The stage totals
+        """
+        rules = rules or []
+        stats = self.stages.setdefault(name, StageStats(name))
+        errors = sum(rule.error_count for rule in rules)
+        rss_start = rss_bytes()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield stats
+        finally:
+            stats.wall_seconds += time.perf_counter() - wall_start
+            stats.cpu_seconds += time.process_time() - cpu_start
+            stats.calls += 1
+            stats.rows_in += rows_in
+            stats.errors += sum(rule.error_count for rule in rules) - errors
+            rss_end = rss_bytes()
+            if rss_start is not None and rss_end is not None:
+                stats.rss_growth_bytes = max(stats.rss_growth_bytes or 0, rss_end - rss_start)
+
+    def report(self, **fields: Any) -> Dict[str, Any]:
+        """
+        The run report, the totals of the whole run followed by those of each stage. Its
+        peak_rss_bytes is the peak of the process, including the jobs it ran before
+        :param fields: Fields describing the job to add to the report
+        :return: A json serialisable dictionary
+        """
+        stages = [stats.to_dict() for stats in self.stages.values()]
+        load = self.stages.get('load')
+        save = self.stages.get('save')
+        quarantine = self.stages.get('quarantine')
+        return dict(
+            fields,
+            started_at=self.started_at.isoformat(),
+            wall_seconds=round(time.perf_counter() - self._wall_start, 6),
+            cpu_seconds=round(time.process_time() - self._cpu_start, 6),
+            rows_in=load.rows_out if load is not None else 0,
+            rows_out=save.rows_in if save is not None else 0,
+            rows_quarantined=quarantine.rows_out if quarantine is not None else 0,
+            errors=sum(stage['errors'] for stage in stages),
+            peak_rss_bytes=peak_rss_bytes(),
+            stages=stages,
+        )
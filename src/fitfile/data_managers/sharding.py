@@ -0,0 +1,111 @@
+import logging
+from concurrent.futures import Executor
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy
+import pandas
+
+from fitfile.data_rules import (
+    AbstractDataRule,
+    ValidationErrors,
+)
+
+# The error flag, error count, number of logged errors, validation errors and growth of the
+# shard_stats counters of a rule on a shard
+RuleErrors = Tuple[bool, int, int, Optional[ValidationErrors], Dict[str, int]]
+
+
+class _RecordingHandler(logging.Handler):
+    """Keeps the log records of a rule on a worker so they can be sent back to the parent"""
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Format now, the arguments might not be picklable
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        self.records.append(record)
+
+
+def apply_rules_to_shard(
+        dataframe: pandas.DataFrame,
+        rules: List[AbstractDataRule],
+) -> Tuple[pandas.DataFrame, List[RuleErrors], List[List[logging.LogRecord]]]:
+    """
+    Applies row local rules to a shard of a dataframe, runs on a worker process. Each rule
+    logs at most the validation errors the parent rule has left to log, plus one so the limit
+    notice is never among them, the parent then replays them within its own limit
+    :param dataframe: The shard to transform
+    :param rules: The rules to apply, in order
+    :return: The transformed shard, the errors of each rule, or each rule of a chain, on this
+    shard and its log records
+    """
+    handlers = []
+    chained_rules = [chained for rule in rules for chained in rule.chained_rules]
+    stats = [rule.shard_stats() for rule in chained_rules]
+    for index, rule in enumerate(chained_rules):
+        rule.max_logged_errors = max(rule.max_logged_errors - rule.logged_errors, 0) + 1
+        rule.logged_errors = 0
+        rule.error_count = 0
+        if rule.validation_errors is not None:
+            rule.validation_errors = ValidationErrors(rule.validation_errors.keep_rows)
+        handler = _RecordingHandler()
+        handlers.append(handler)
+        if rule.logger is not None:
+            logger = logging.Logger('fitfile.shard.{}'.format(index))
+            logger.addHandler(handler)
+            rule.logger = logger
+    for rule in rules:
+        dataframe = rule.apply_rule(dataframe)
+    errors = [
+        (rule.error, rule.error_count, rule.logged_errors, rule.validation_errors,
+         {name: value - before.get(name, 0) for name, value in rule.shard_stats().items()})
+        for rule, before in zip(chained_rules, stats)
+    ]
+    return dataframe, errors, [handler.records for handler in handlers]
+
+
+def apply_rules_sharded(dataframe: pandas.DataFrame, rules: List[AbstractDataRule],
+                        executor: Executor, shards: int) -> pandas.DataFrame:
+    """
+    Splits a dataframe into row shards and applies row local rules to each of them on the
+    executor, then merges the shards, the rules errors, shard_stats and log records back. The
+    log records are replayed in shard order while the rule has validation errors left to log
+    :param dataframe: The dataframe to transform
+    :param rules: The row local rules to apply, in order
+    :param executor: The executor to run the shards on
+    :param shards: The number of shards
+    :return: The transformed dataframe
+    """
+    bounds = numpy.linspace(0, len(dataframe), min(shards, len(dataframe)) + 1).astype(int)
+    futures = [
+        executor.submit(apply_rules_to_shard, dataframe.iloc[start:stop], rules)
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+    results = []
+    for future in futures:
+        shard, errors, records = future.result()
+        results.append(shard)
+        chained_rules = [chained for rule in rules for chained in rule.chained_rules]
+        for rule, rule_errors, rule_records in zip(chained_rules, errors, records):
+            error, error_count, logged_errors, validation_errors, stats = rule_errors
+            rule.error = rule.error or error
+            rule.error_count += error_count
+            if rule.validation_errors is not None and validation_errors is not None:
+                rule.validation_errors.extend(validation_errors)
+            rule.add_shard_stats(stats)
+            left_to_log = max(rule.max_logged_errors - rule.logged_errors, 0)
+            rule.logged_errors += logged_errors
+            if rule.logger is not None:
+                for record in rule_records[:left_to_log]:
+                    rule.logger.handle(record)
+                if left_to_log and rule.logged_errors >= rule.max_logged_errors:
+                    rule.log_error_limit()
+    return pandas.concat(results)
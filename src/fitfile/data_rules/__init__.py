@@ -1,5 +1,8 @@
 from fitfile.data_rules.abstract_data_rule import AbstractDataRule
 from fitfile.data_rules.age_band_rule import AgeBandRule
+from fitfile.data_rules.fused_rule_chain import FusedRuleChain
 from fitfile.data_rules.postcode_trim_to_three_rule import PostCodeTrimToThreeRule
 from fitfile.data_rules.postcode_trim_to_two_rule import PostCodeTrimToTwoRule
-__all__ = ['AbstractDataRule', 'AgeBandRule', 'PostCodeTrimToThreeRule', 'PostCodeTrimToTwoRule']
+from fitfile.data_rules.validation_errors import ValidationErrors
+__all__ = ['AbstractDataRule', 'AgeBandRule', 'FusedRuleChain', 'PostCodeTrimToThreeRule',
+           'PostCodeTrimToTwoRule', 'ValidationErrors']
@@ -2,34 +2,230 @@ from abc import (
     ABC,
     abstractmethod,
 )
+import numpy
 import pandas
 from typing import (
     Any,
+    Dict,
     List,
     Optional,
+    Tuple,
+    Type,
 )
-from copy import deepcopy
+
+from fitfile.data_rules.validation_errors import ValidationErrors
+
+# The number of failing values quoted on each validation error log line
+ERROR_SAMPLE_SIZE = 5
+
+# An exception, the positions of the entries that raised it and their messages, if they differ
+Failure = Tuple[Exception, numpy.ndarray, Optional[List[str]]]
 
 
 class AbstractDataRule(ABC):
-    def __init__(self, fields: Optional[List[str]] = None, logger: Optional[Any] = None) -> None:
+    # Exception reported through on_validation_error when the series path finds invalid entries
+    validation_exception: Type[Exception] = Exception
+    # The reason given for each entry the series path finds invalid
+    validation_message: str = 'Failed to validate'
+    # Whether each row can be transformed on its own, rules that need state from the whole
+    # dataframe set it to False and implement accumulate so they can be applied on chunks
+    row_local: bool = True
+    # The number of validation errors logged by on_validation_error, later errors are only counted
+    # and collected on validation_errors
+    max_logged_errors: int = 10
+
+    def __init__(self, fields: Optional[List[str]] = None, logger: Optional[Any] = None,
+                 factorize: bool = False) -> None:
+        """
+        :param fields: The fields to transform
+        :param logger: The logger to report validation errors to
+        :param factorize: Whether rules without a series implementation validate and transform
+        each distinct value of a column once, instead of every datum
+        """
         if fields is None:
             fields = []
         self.fields: List[str] = fields
         self.logger = logger
+        self.factorize = factorize
         self.error: bool = False
+        # The number of entries that failed to validate
+        self.error_count: int = 0
+        # The number of validation errors logged so far
+        self.logged_errors: int = 0
+        # When set, every entry that fails to validate is collected here with its row and field
+        self.validation_errors: Optional[ValidationErrors] = None
+        # When silenced, validation errors are not reported, used when data is transformed twice
+        self.silenced: bool = False
 
     def apply_rule(self, dataframe: pandas.DataFrame) -> pandas.DataFrame:
         """
-        Apply this specific rule to the dataframe and return a transformed dataframe, where all
-        age, date of birth, and year of birth fields are converted to a band of 10 up to 90+
+        Apply this specific rule to every field of the dataframe and return a transformed
+        dataframe. The input is not modified, the returned dataframe is a shallow copy where only
+        the columns in fields are replaced, all other columns share memory with the input
         :return: A pandas.DataFrame with the specific transformation applied
         """
-        new_df = deepcopy(dataframe)
+        new_df = dataframe.copy(deep=False)
         for field in self.fields:
-            new_df[field] = new_df[field].apply(self.validate_and_transform, True)
+            new_df[field] = self.apply_to_series(new_df[field])
         return new_df
 
+    @property
+    def supports_series(self) -> bool:
+        """
+        Whether this rule provides a column at a time implementation, that is, it overwrites both
+        transform_series and validate_series
+        :return: A boolean
+        """
+        cls = type(self)
+        overrides_transform = cls.transform_series is not AbstractDataRule.transform_series
+        overrides_validate = cls.validate_series is not AbstractDataRule.validate_series
+        return overrides_transform and overrides_validate
+
+    @property
+    def fusable(self) -> bool:
+        """
+        Whether this rule can be applied on a fused rule chain, through apply_to_values, that is,
+        it does not overwrite apply_to_series
+        :return: A boolean
+        """
+        return type(self).apply_to_series is AbstractDataRule.apply_to_series
+
+    @property
+    def chained_rules(self) -> List['AbstractDataRule']:
+        """
+        The rules applied by this rule, only itself unless it chains other rules
+        :return: A list of rules
+        """
+        return [self]
+
+    def apply_to_series(self, series: pandas.Series) -> pandas.Series:
+        """
+        Validates and transforms a whole column and reports the entries that failed to validate
+        :param series: The column to transform
+        :return: The transformed column, invalid entries are returned as strings
+        """
+        result, failures = self.apply_to_values(series)
+        for exception, positions, messages in failures:
+            self._report_validation_error(series.iloc[positions], exception, messages)
+        return result
+
+    def apply_to_values(
+            self,
+            values: pandas.Series,
+            counts: Optional[numpy.ndarray] = None,
+    ) -> Tuple[pandas.Series, List[Failure]]:
+        """
+        Validates and transforms a column, or the distinct values of a column on a fused rule
+        chain, without reporting the entries that failed to validate. Uses the vectorized series
+        methods when the rule supports them and validates and transforms each datum otherwise
+        :param values: The column, or values, to transform
+        :param counts: The number of rows holding each value, None when each value is a row
+        :return: The transformed values, invalid entries are returned as strings, and the
+        failures, each an exception with the positions of the values that raised it and their
+        messages, None when they share that of the exception
+        """
+        if len(values) == 0:
+            return values, []
+        if not self.supports_series:
+            if self.factorize:
+                return self._apply_factorized(values)
+            return self._apply_per_datum(values)
+        invalid = self.validate_series(values).astype(bool)
+        if not invalid.any():
+            return self.transform_series(values), []
+        valid = ~invalid  # type: ignore
+        failed = values[invalid]
+        failures: List[Failure] = [(self.validation_exception(self.validation_message),
+                                    numpy.flatnonzero(invalid.to_numpy()), None)]
+        transformed = self.transform_series(values[valid])
+        result = values.astype(object)
+        if valid.any():
+            result[valid] = transformed.astype(object)  # type: ignore
+        result[invalid] = failed.astype(str)  # type: ignore
+        if isinstance(transformed.dtype, pandas.CategoricalDtype):  # type: ignore
+            # Keep categorical results categorical, the failed entries become extra categories
+            categories = transformed.cat.categories  # type: ignore
+            extra = pandas.Index(result[invalid].unique())
+            categories = categories.append(extra[~extra.isin(categories)])
+            return result.astype(pandas.CategoricalDtype(categories)), failures  # type: ignore
+        return result, failures
+
+    def _apply_factorized(self, series: pandas.Series) -> Tuple[pandas.Series, List[Failure]]:
+        """
+        Validates and transforms each distinct value of a column once and rebuilds the column
+        from the factorized codes. Each failure is that of a distinct value, with all its
+        occurrences
+        :param series: The column to transform
+        :return: The transformed column, invalid entries are returned as strings, and the failures
+        """
+        try:
+            codes, uniques = pandas.factorize(series)  # type: ignore
+        except TypeError:
+            # Unhashable values
+            return self._apply_per_datum(series)
+        data = list(uniques)
+        # Missing values get code -1, give them their own code
+        missing = codes == -1
+        if missing.any():
+            data.append(series[missing].iloc[0])
+            codes = numpy.where(missing, len(data) - 1, codes)
+        results = []
+        failures: List[Failure] = []
+        for code, datum in enumerate(data):
+            try:
+                self.validate_datum(datum)
+                results.append(self.transform_datum(datum))
+            except Exception as e:
+                failures.append((e, numpy.flatnonzero(codes == code), None))
+                results.append(str(datum))
+        values = numpy.empty(len(results), dtype=object)  # type: ignore
+        values[:] = results
+        return pandas.Series(values[codes], index=series.index,  # type: ignore
+                             name=series.name).infer_objects(), failures  # type: ignore
+
+    def _apply_per_datum(self, series: pandas.Series) -> Tuple[pandas.Series, List[Failure]]:
+        """
+        Validates and transforms each datum of a column. Failures are grouped by exception
+        class, with all the entries that raised it and the message of each
+        :param series: The column to transform
+        :return: The transformed column, invalid entries are returned as strings, and the failures
+        """
+        results = []
+        failures: Dict[type, Tuple[Exception, List[int], List[str]]] = {}
+        for position, datum in enumerate(series):
+            try:
+                self.validate_datum(datum)
+                results.append(self.transform_datum(datum))
+            except Exception as e:
+                _, positions, messages = failures.setdefault(type(e), (e, [], []))
+                positions.append(position)
+                messages.append(str(e))
+                results.append(str(datum))
+        values = numpy.empty(len(results), dtype=object)  # type: ignore
+        values[:] = results
+        return pandas.Series(values, index=series.index,  # type: ignore
+                             name=series.name).infer_objects(), [  # type: ignore
+            (exception, numpy.array(positions), messages)
+            for exception, positions, messages in failures.values()
+        ]
+
+    def transform_series(self, series: pandas.Series) -> pandas.Series:
+        """
+        Transforms a whole column at once, only receives entries that passed validate_series.
+        Overwrite on subclass together with validate_series to enable the vectorized path
+        :param series: A column of datapoints
+        :return: A transformed column with the same index
+        """
+        raise NotImplementedError
+
+    def validate_series(self, series: pandas.Series) -> pandas.Series:
+        """
+        Validates a whole column at once
+        :param series: A column of datapoints
+        :return: A boolean mask with the same index, True where the entry is invalid
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def transform_datum(self, datum: Any) -> Any:
         """
@@ -44,21 +240,122 @@ class AbstractDataRule(ABC):
             self.validate_datum(datum)
             return self.transform_datum(datum)
         except Exception as e:
-            self.on_validation_error(datum, e)
+            self._report_validation_error(datum, e)
             return str(datum)
 
+    def _report_validation_error(self, datum: Any, exception: Exception,
+                                 messages: Optional[List[str]] = None) -> None:
+        """
+        Counts the failed entries, collects them on validation_errors when set and calls
+        on_validation_error, unless this rule is silenced
+        :param datum: An entry, or a pandas.Series of entries
+        :param exception: The validation exception
+        :param messages: The message of each entry, when they differ from that of the exception
+        :return: None
+        """
+        if self.silenced:
+            return
+        self.error_count += len(datum) if isinstance(datum, pandas.Series) else 1
+        if self.validation_errors is not None:
+            self.validation_errors.add(self.__class__.__name__, datum, exception, messages)
+        self.on_validation_error(datum, exception)
+
+    def accumulate(self, dataframe: pandas.DataFrame) -> None:
+        """
+        Gathers the state this rule needs from a chunk of the data, called on every chunk before
+        any chunk is transformed. Only used by rules that are not row_local
+        :param dataframe: A chunk of the data, with all the previous rules applied
+        :return: None
+        """
+        pass
+
+    def signature(self) -> Dict[str, Any]:
+        """
+        The configuration the results of this rule depend on, incremental runs reprocess every
+        row when it changes. Overwrite on subclass to add the options of the rule
+        :return: A json serialisable dictionary
+        """
+        return {'rule': self.__class__.__name__, 'fields': self.fields}
+
+    def stale_rows(self, previous: pandas.DataFrame, current: pandas.DataFrame) -> numpy.ndarray:
+        """
+        Finds the rows whose result changes because the state this rule gathers from the whole
+        dataframe changed, used by incremental runs to reprocess unchanged rows. Row local rules
+        have no such rows, other rules reprocess every row unless they overwrite it
+        :param previous: The fields this rule was given on the previous run, for every row
+        :param current: The fields this rule is given on this run, for every row
+        :return: A boolean mask over the current rows
+        """
+        return numpy.full(len(current), not self.row_local)
+
+    def summary(self) -> Optional[str]:
+        """
+        Statistics about this rule to add to the job log once the job completes, if any
+        :return: A string or None
+        """
+        return None
+
+    def shard_stats(self) -> Dict[str, int]:
+        """
+        Counters this rule keeps besides its errors, such as cache statistics, so sharded runs
+        can add those of the worker processes to the rule of the parent process. Overwrite on
+        subclass along with add_shard_stats
+        :return: A dictionary of counters
+        """
+        return {}
+
+    def add_shard_stats(self, stats: Dict[str, int]) -> None:
+        """
+        Adds the counters a worker process gathered on a shard, see shard_stats
+        :param stats: How much each counter of shard_stats grew on the worker
+        :return: None
+        """
+        pass
+
+    def reset_state(self) -> None:
+        """
+        Clears any state gathered with accumulate
+        :return: None
+        """
+        pass
+
     def on_validation_error(self, datum: Any, exception: Exception) -> None:
         """
         What to do when an entry fails to validate (usually log it, stop or take other actions),
         default behaviour is to keep on processing as this might be a stream of data, overwrite on
-        subclass to change behaviour.
-        :param datum: An entry
+        subclass to change behaviour. Logs a single line per call, quoting the first few values,
+        and only the first max_logged_errors calls so dirty inputs do not flood the log
+        :param datum: An entry, or a pandas.Series with the failing entries of a column when
+        called in bulk
         :param exception: The Exception to raise
         :return: None
         """
-        if self.logger is not None:
-            self.logger.error('Failed to validate {}, exception {}'.format(datum, exception))
         self.error = True
+        if self.logger is None:
+            return
+        self.logged_errors += 1
+        if self.logged_errors > self.max_logged_errors:
+            return
+        if isinstance(datum, pandas.Series):
+            field = datum.name  # type: ignore
+            sample = list(datum.iloc[:ERROR_SAMPLE_SIZE])
+            self.logger.error('Failed to validate {} entries of {}, exception {}: {}, '
+                              'first values {}'.format(len(datum), field,
+                                                       type(exception).__name__, exception,
+                                                       sample))
+        else:
+            self.logger.error('Failed to validate {}, exception {}'.format(datum, exception))
+        if self.logged_errors == self.max_logged_errors:
+            self.log_error_limit()
+
+    def log_error_limit(self) -> None:
+        """
+        Logs that max_logged_errors validation errors were logged and later ones are only counted
+        :return: None
+        """
+        if self.logger is not None:
+            self.logger.error('{}: logged {} validation errors, further errors are only '
+                              'counted'.format(self, self.max_logged_errors))
 
     @abstractmethod
     def validate_datum(self, datum: Any) -> None:
@@ -1,15 +1,223 @@
 import datetime
 
+import numpy
+import pandas
 from dateutil.relativedelta import relativedelta
-from typing import Union
-from fitfile.data_rules.abstract_data_rule import AbstractDataRule
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from fitfile.data_rules.abstract_data_rule import (
+    AbstractDataRule,
+    Failure,
+)
 from .exceptions import AgeDatumException
 
+AGE_BAND_EDGES = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, numpy.inf]
+AGE_BAND_LABELS = ['{} - {}'.format(edge, edge + 10) for edge in AGE_BAND_EDGES[:-2]] + ['90+']
+# The dates parsed in bulk, any other string goes through datetime.fromisoformat
+FULL_DATE = '[0-9]{4}-[0-9]{2}-[0-9]{2}'
+
 
 class AgeBandRule(AbstractDataRule):
+    validation_exception = AgeDatumException
+    validation_message = 'Not a non negative age or an iso format date of birth in the past'
+
+    def __init__(self, fields: Optional[List[str]] = None, logger: Optional[Any] = None,
+                 reference_date: Optional[datetime.datetime] = None) -> None:
+        """
+        :param fields: The fields to transform
+        :param logger: The logger to report validation errors to
+        :param reference_date: Date the ages are computed against on the series path, defaults to
+        the time each column starts being processed
+        """
+        super().__init__(fields=fields, logger=logger)
+        self.reference_date = reference_date
+        self._reference = pandas.Timestamp.now()  # type: ignore
+
     def __repr__(self) -> str:
         return 'Rule one – Age Band Group 0-10, 10-20 ... 90+'
 
+    def signature(self) -> Dict[str, Any]:
+        """
+        Adds the reference date, ages are computed against today's date unless one is given
+        :return: A json serialisable dictionary
+        """
+        if self.reference_date is None:
+            reference = datetime.date.today().isoformat()
+        else:
+            reference = pandas.Timestamp(self.reference_date).isoformat()  # type: ignore
+        return dict(super().signature(), reference_date=reference)
+
+    def apply_to_values(
+            self,
+            values: pandas.Series,
+            counts: Optional[numpy.ndarray] = None,
+    ) -> Tuple[pandas.Series, List[Failure]]:
+        """
+        Captures a single reference date for the whole column before transforming it
+        :param values: The column, or values, to transform
+        :param counts: The number of rows holding each value, unused
+        :return: The transformed values and the failures
+        """
+        if self.reference_date is None:
+            self._reference = pandas.Timestamp.now()  # type: ignore
+        else:
+            self._reference = pandas.Timestamp(self.reference_date)  # type: ignore
+        return super().apply_to_values(values, counts)
+
+    def transform_series(self, series: pandas.Series) -> pandas.Series:
+        """
+        Bands a whole column of ages or iso format dates of birth with a single pandas.cut
+        :param series: A column of previously validated datapoints
+        :return: A categorical column of age bands
+        """
+        ages = self._series_to_ages(series)
+        return pandas.cut(ages, AGE_BAND_EDGES, labels=AGE_BAND_LABELS,  # type: ignore
+                          right=False)
+
+    def validate_series(self, series: pandas.Series) -> pandas.Series:
+        """
+        Validates a whole column of ages or dates of birth, unparseable dates, dates in the future
+        and negative ages are invalid
+        :param series: A column of datapoints
+        :return: A boolean mask, True where the datum is invalid
+        """
+        return self._series_to_ages(series).isna()
+
+    def _series_to_ages(self, series: pandas.Series) -> pandas.Series:
+        """
+        Converts a column of ages and/or iso format dates into ages in years against the
+        reference date. Typed columns take a single path, datetimes and numbers directly and
+        categoricals through their categories only
+        :param series: A column of datapoints
+        :return: A float column of ages, NaN where the datum is not a valid age
+        """
+        if pandas.api.types.is_datetime64_any_dtype(series):  # type: ignore
+            return self._years_since(series)
+        if isinstance(series.dtype, pandas.CategoricalDtype):  # type: ignore
+            categories = self._series_to_ages(pandas.Series(series.cat.categories))  # type: ignore
+            # Missing values have code -1, which picks the trailing NaN
+            ages = numpy.append(categories.to_numpy(), numpy.nan)[series.cat.codes]  # type: ignore
+            return pandas.Series(ages, index=series.index)
+        numeric = self._numeric_mask(series)
+        ages = pandas.Series(numpy.nan, index=series.index)  # type: ignore
+        if numeric.any():
+            ages[numeric] = series[numeric].astype(float)  # type: ignore
+        if not numeric.all():
+            ages[~numeric] = self._dates_to_ages(series[~numeric])  # type: ignore
+        ages[(ages < 0) | ~numpy.isfinite(ages)] = numpy.nan  # type: ignore
+        return ages
+
+    def _dates_to_ages(self, dates: pandas.Series) -> pandas.Series:
+        """
+        Converts a column of iso format dates, and of timestamps, into ages. The strings are
+        converted once per distinct value, accepting the same strings as
+        datetime.fromisoformat
+        :param dates: A column of datapoints that are not numbers
+        :return: A float column of ages, NaN where the datum is not a valid date in the past
+        """
+        ages = pandas.Series(numpy.nan, index=dates.index)  # type: ignore
+        if pandas.api.types.infer_dtype(dates) == 'string':  # type: ignore
+            strings = dates.notna()  # type: ignore
+        else:
+            # Parsing timestamps mixing time zones and naive ones coerces some to NaT
+            dates = self._wall_times(dates)
+            strings = dates.map(lambda datum: isinstance(datum, str)).astype(bool)
+            ages[~strings] = self._years_since(pandas.to_datetime(  # type: ignore
+                dates[~strings], format='ISO8601', errors='coerce'))  # type: ignore
+        if strings.any():
+            codes, uniques = pandas.factorize(dates[strings])  # type: ignore
+            unique_ages = self._strings_to_ages(pandas.Series(uniques))
+            ages[strings] = unique_ages.to_numpy()[codes]  # type: ignore
+        return ages
+
+    def _strings_to_ages(self, strings: pandas.Series) -> pandas.Series:
+        """
+        Converts iso format date strings into ages. Plain dates, most of them, are parsed at once
+        and any other string, or date out of the datetime64 range, through
+        datetime.fromisoformat
+        :param strings: A column of strings
+        :return: A float column of ages, NaN where the string is not a valid date in the past
+        """
+        ages = pandas.Series(numpy.nan, index=strings.index)  # type: ignore
+        full_dates = strings.str.fullmatch(FULL_DATE)  # type: ignore
+        if full_dates.any():
+            ages[full_dates] = self._years_since(pandas.to_datetime(  # type: ignore
+                strings[full_dates], format='%Y-%m-%d', errors='coerce'))
+        others = ~full_dates | ages.isna()
+        if others.any():
+            ages[others] = strings[others].map(self._isoformat_age)  # type: ignore
+        return ages
+
+    def _isoformat_age(self, datum: str) -> float:
+        """
+        :param datum: A string
+        :return: The age against the reference date of the date in datum, NaN when it is not an
+        iso format date in the past
+        """
+        try:
+            date_of_birth = datetime.datetime.fromisoformat(datum).replace(tzinfo=None)
+        except ValueError:
+            return numpy.nan
+        reference = self._reference.to_pydatetime()
+        if date_of_birth > reference:
+            return numpy.nan
+        birthday = (date_of_birth.month, date_of_birth.day)
+        before_birthday = birthday > (reference.month, reference.day)
+        return float(reference.year - date_of_birth.year - before_birthday)
+
+    @staticmethod
+    def _numeric_mask(series: pandas.Series) -> pandas.Series:
+        """
+        Finds the numerical entries of a column, numerical dtypes are checked once and only mixed
+        object columns are checked per datum
+        :param series: A column of datapoints
+        :return: A boolean mask, True where the datum is an int or a float
+        """
+        if pandas.api.types.is_numeric_dtype(series):  # type: ignore
+            return pandas.Series(True, index=series.index)
+        if pandas.api.types.infer_dtype(series, skipna=False) == 'string':  # type: ignore
+            return pandas.Series(False, index=series.index)
+        return series.map(lambda datum: isinstance(datum, (int, float))).astype(bool)
+
+    def _years_since(self, dates: pandas.Series) -> pandas.Series:
+        """
+        Computes the full years elapsed between each date and the reference date
+        :param dates: A datetime64 column, may contain NaT, or a column of timestamps with
+        different time zones
+        :return: A float column of ages, NaN for NaT and dates in the future
+        """
+        dates = self._wall_times(dates)
+        if dates.dtype == object:  # type: ignore
+            dates = pandas.to_datetime(dates)  # type: ignore
+        reference = self._reference
+        years = (reference.year - dates.dt.year).astype(float)  # type: ignore
+        before_birthday = (dates.dt.month > reference.month) | (  # type: ignore
+            (dates.dt.month == reference.month) & (dates.dt.day > reference.day))  # type: ignore
+        years = years - before_birthday.astype(float)
+        years[dates.isna() | (dates > reference)] = numpy.nan
+        return years  # type: ignore
+
+    @staticmethod
+    def _wall_times(dates: pandas.Series) -> pandas.Series:
+        """
+        Drops the time zone of dates with one, keeping their local date and time, as the date of
+        birth is the local date
+        :param dates: A datetime64 column, with or without a time zone, or an object column
+        :return: The column without time zone, the timestamps of an object column lose theirs
+        """
+        if isinstance(dates.dtype, pandas.DatetimeTZDtype):  # type: ignore
+            return dates.dt.tz_localize(None)  # type: ignore
+        if dates.dtype == object:  # type: ignore
+            return dates.map(lambda date: date.replace(tzinfo=None)
+                             if isinstance(date, datetime.datetime) else date)
+        return dates
+
     def transform_datum(self, datum: Union[str, int, float]) -> str:
         """
         Transforms a single datapoint, onto an age band of 10 up to 90+
@@ -18,7 +226,7 @@ class AgeBandRule(AbstractDataRule):
         """
         if isinstance(datum, int) or isinstance(datum, float):
             return self._to_ten_up_to_ninety_multiple(int(datum))
-        date_of_birth = datetime.date.fromisoformat(datum)
+        date_of_birth = datetime.datetime.fromisoformat(datum).replace(tzinfo=None)
         now = datetime.datetime.now()
         return self._to_ten_up_to_ninety_multiple(relativedelta(now, date_of_birth).years)
 
@@ -67,7 +275,8 @@ class AgeBandRule(AbstractDataRule):
         """
         try:
             now = datetime.datetime.now()
-            date_of_birth = datetime.datetime.fromisoformat(datum)
+            # The local date of birth, whatever the time zone
+            date_of_birth = datetime.datetime.fromisoformat(datum).replace(tzinfo=None)
             if date_of_birth > now:
                 raise AgeDatumException('Date of birth is in the future, {}'.format(date_of_birth))
         except ValueError as e:
@@ -0,0 +1,166 @@
+from typing import (
+    Any,
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy
+import pandas
+
+from fitfile.data_rules.abstract_data_rule import AbstractDataRule
+
+
+class FusedRuleChain(AbstractDataRule):
+    """
+    Applies consecutive rules on the same field in a single pass. The column is factorized once
+    and every rule of the chain is applied to its distinct values in turn, the column is only
+    rebuilt from the codes at the end so no intermediate column is materialized. Each rule still
+    reports the rows that failed its validation, with the values it was given, so the results and
+    the errors are those of applying the rules in sequence. Factorizing merges equal values of
+    different types, such as 1, 1.0 and True, so chains with a rule that transforms each datum
+    without factorize are applied in sequence instead
+    """
+    def __init__(self, rules: List[AbstractDataRule], logger: Optional[Any] = None) -> None:
+        """
+        :param rules: The rules to apply in order, each on the same single field and fusable
+        :param logger: Unused, each rule reports its own validation errors
+        """
+        fields = {tuple(rule.fields) for rule in rules}
+        if len(fields) != 1 or len(rules[0].fields) != 1:
+            raise ValueError('Only rules on the same single field can be fused, got {}'.format(
+                [rule.fields for rule in rules]))
+        unfusable = [rule for rule in rules if not rule.fusable]
+        if unfusable:
+            raise ValueError('Rules overwriting apply_to_series can not be fused, got {}'.format(
+                unfusable))
+        super().__init__(fields=list(rules[0].fields), logger=logger)
+        self.rules = rules
+        self.row_local = all(rule.row_local for rule in rules)
+
+    def __repr__(self) -> str:
+        return ' + '.join(repr(rule) for rule in self.rules)
+
+    @property
+    def chained_rules(self) -> List[AbstractDataRule]:
+        return self.rules
+
+    def apply_to_series(self, series: pandas.Series) -> pandas.Series:
+        """
+        Applies every rule of the chain to the distinct values of a column
+        :param series: The column to transform
+        :return: The transformed column
+        """
+        if len(series) == 0 or not all(_factorizable(rule) for rule in self.rules):
+            return self._apply_in_sequence(series)
+        try:
+            codes, uniques = pandas.factorize(series)  # type: ignore
+        except TypeError:
+            # Unhashable values
+            return self._apply_in_sequence(series)
+        values = pandas.Series(uniques, name=series.name)  # type: ignore
+        # Missing values get code -1, give them their own code
+        missing = codes == -1
+        if missing.any():
+            values = pandas.concat(  # type: ignore
+                [values, series[missing].iloc[:1]], ignore_index=True)  # type: ignore
+            codes = numpy.where(missing, len(values) - 1, codes)
+        counts = numpy.bincount(codes, minlength=len(values))  # type: ignore
+        for rule in self.rules:
+            result, failures = rule.apply_to_values(values, counts)
+            for exception, positions, messages in failures:
+                failed, row_messages = _failed_rows(series, codes, values, positions, messages)
+                rule._report_validation_error(failed, exception, row_messages)
+            values = result
+        return _rebuild(values, codes, series.index)
+
+    def _apply_in_sequence(self, series: pandas.Series) -> pandas.Series:
+        for rule in self.rules:
+            series = rule.apply_to_series(series)
+        return series
+
+    def transform_datum(self, datum: Any) -> Any:
+        """
+        Validates and transforms a single datapoint with each rule in turn
+        :param datum: A single datapoint
+        :return: A transformed datapoint
+        """
+        for rule in self.rules:
+            datum = rule.validate_and_transform(datum)
+        return datum
+
+    def validate_datum(self, datum: Any) -> None:
+        """
+        Each rule validates the datapoint it is given on transform_datum
+        :return: None
+        """
+        pass
+
+
+def plan_rules(rules: List[AbstractDataRule]) -> List[Tuple[List[int], AbstractDataRule]]:
+    """
+    Compiles an ordered list of rules into a plan where each run of consecutive fusable rules on
+    the same single field, with a series path or factorize set, becomes a FusedRuleChain
+    :param rules: The rules, in order
+    :return: The rules to apply in order, each with the positions of the rules it applies
+    """
+    plan: List[Tuple[List[int], List[AbstractDataRule]]] = []
+    for index, rule in enumerate(rules):
+        if plan and _can_fuse(plan[-1][1][-1], rule):
+            plan[-1][0].append(index)
+            plan[-1][1].append(rule)
+        else:
+            plan.append(([index], [rule]))
+    return [
+        (indices, chain[0] if len(chain) == 1 else FusedRuleChain(chain))
+        for indices, chain in plan
+    ]
+
+
+def _can_fuse(previous: AbstractDataRule, rule: AbstractDataRule) -> bool:
+    return all([len(rule.fields) == 1, rule.fields == previous.fields, rule.fusable,
+                previous.fusable, _factorizable(rule), _factorizable(previous)])
+
+
+def _factorizable(rule: AbstractDataRule) -> bool:
+    """
+    :param rule: A rule
+    :return: Whether the rule can be applied to the distinct values of a column, it has a series
+    path or it factorizes columns itself
+    """
+    return rule.supports_series or rule.factorize
+
+
+def _failed_rows(series: pandas.Series, codes: numpy.ndarray, values: pandas.Series,
+                 positions: numpy.ndarray,
+                 messages: Optional[List[str]]) -> Tuple[pandas.Series, Optional[List[str]]]:
+    """
+    Expands the values that failed a rule of the chain to the rows holding them
+    :param series: The column the chain is applied to
+    :param codes: The position of the value of each row
+    :param values: The values the rule was given
+    :param positions: The positions of the values that failed
+    :param messages: The message of each failed value, if they differ
+    :return: The failed entries, with their row index, and the message of each
+    """
+    failed_values = numpy.zeros(len(values), dtype=bool)  # type: ignore
+    failed_values[positions] = True
+    rows = numpy.flatnonzero(failed_values[codes])  # type: ignore
+    failed = _rebuild(values, codes[rows], series.index[rows])
+    if messages is None:
+        return failed, None
+    value_messages = numpy.empty(len(values), dtype=object)  # type: ignore
+    value_messages[positions] = messages
+    return failed, list(value_messages[codes[rows]])  # type: ignore
+
+
+def _rebuild(values: pandas.Series, codes: numpy.ndarray, index: pandas.Index) -> pandas.Series:
+    """
+    :param values: The values
+    :param codes: The position of the value of each row
+    :param index: The index of the rows
+    :return: The column holding the value of each row, with the dtype of the values
+    """
+    column = values.iloc[codes]
+    column.index = index  # type: ignore
+    return column
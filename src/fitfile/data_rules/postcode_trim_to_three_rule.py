@@ -1,20 +1,156 @@
+import functools
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+import numpy
+import pandas
 from fitfile.data_rules.abstract_data_rule import AbstractDataRule
 from .exceptions import PostCodeValidationException
 import postcodes_uk  # type: ignore
 
+POSTCODE_CACHE_SIZE = 2 ** 16
+
+
+class PostcodeValidationCache(object):
+    """
+    Bounded LRU cache of postcode validation results. postcodes_uk validation is case and
+    whitespace sensitive, so postcodes are keyed as they are
+    """
+    def __init__(self, maxsize: Optional[int] = POSTCODE_CACHE_SIZE) -> None:
+        """
+        :param maxsize: The maximum number of postcodes to keep, None for no limit
+        """
+        self.resize(maxsize)
+
+    def __reduce__(self) -> Any:
+        """
+        The cached results are not sent to other processes, the shared cache is sent as a
+        reference to the shared cache of the receiving process and any other as an empty cache
+        """
+        if self is postcode_validation_cache:
+            return 'postcode_validation_cache'
+        return PostcodeValidationCache, (self.maxsize,)
+
+    def __repr__(self) -> str:
+        return 'Postcode validation cache hits: {}, misses: {}, size: {}/{}'.format(
+            self.hits, self.misses, self.currsize, self.maxsize)
+
+    def resize(self, maxsize: Optional[int]) -> None:
+        """
+        Sets the maximum number of postcodes to keep, clears the cache and its counters
+        :param maxsize: The maximum number of postcodes to keep, None for no limit
+        :return: None
+        """
+        self.maxsize = maxsize
+        self._validate = functools.lru_cache(maxsize=maxsize)(postcodes_uk.validate)
+        self._other_hits = 0
+        self._other_misses = 0
+
+    def validate(self, postcode: str) -> bool:
+        """
+        Validates a postcode, only running postcodes_uk validation on cache misses
+        :param postcode: The postcode to validate
+        :return: Whether the postcode is valid
+        """
+        return bool(self._validate(postcode))
+
+    def clear(self) -> None:
+        """
+        Empties the cache and resets its counters
+        :return: None
+        """
+        self._validate.cache_clear()
+        self._other_hits = 0
+        self._other_misses = 0
+
+    def add_counts(self, hits: int, misses: int) -> None:
+        """
+        Adds the hits and misses of the cache of another process, such as a shard worker, to
+        those reported by this cache
+        :param hits: The number of hits to add
+        :param misses: The number of misses to add
+        :return: None
+        """
+        self._other_hits += hits
+        self._other_misses += misses
+
+    @property
+    def hits(self) -> int:
+        return int(self._validate.cache_info().hits) + self._other_hits
+
+    @property
+    def misses(self) -> int:
+        return int(self._validate.cache_info().misses) + self._other_misses
+
+    @property
+    def currsize(self) -> int:
+        return int(self._validate.cache_info().currsize)
+
+
+# Shared by all the rules, and so all the jobs, of a process
+postcode_validation_cache = PostcodeValidationCache()
+
+
+def resize_postcode_validation_cache(maxsize: Optional[int]) -> None:
+    """
+    Resizes the cache shared by the rules of this process, unless it already has that size. The
+    initializer of worker processes, which would otherwise start with the default size when
+    spawned
+    :param maxsize: The maximum number of postcodes to keep, None for no limit
+    :return: None
+    """
+    if postcode_validation_cache.maxsize != maxsize:
+        postcode_validation_cache.resize(maxsize)
+
 
 class PostCodeTrimToThreeRule(AbstractDataRule):
+    validation_exception = PostCodeValidationException
+    validation_message = 'Postcode failed to validate'
+
+    def __init__(self, fields: Optional[List[str]] = None, logger: Optional[Any] = None,
+                 cache: Optional[PostcodeValidationCache] = None) -> None:
+        """
+        :param fields: The fields to transform
+        :param logger: The logger to report validation errors to
+        :param cache: The validation cache to use, defaults to the one shared by the process
+        """
+        super().__init__(fields=fields, logger=logger)
+        if cache is None:
+            cache = postcode_validation_cache
+        self.cache = cache
+
     def __repr__(self) -> str:
         return 'Rule two – Trim postcode to 3 characters'
 
+    def summary(self) -> Optional[str]:
+        return repr(self.cache)
+
+    def shard_stats(self) -> Dict[str, int]:
+        return {'hits': self.cache.hits, 'misses': self.cache.misses}
+
+    def add_shard_stats(self, stats: Dict[str, int]) -> None:
+        self.cache.add_counts(stats.get('hits', 0), stats.get('misses', 0))
+
     def transform_datum(self, datum: str) -> str:
         """
-        Transforms a single datapoint, onto an age band of 10 up to 90+
+        Transforms a single datapoint, trims a postcode to its first 3 characters
         :param datum: A single datapoint
         :return: A transformed datapoint
         """
         return datum[0:3]
 
+    def transform_series(self, series: pandas.Series) -> pandas.Series:
+        """
+        Trims a column of postcodes to their first 3 characters
+        :param series: A column of previously validated postcodes
+        :return: A transformed column
+        """
+        return series.str.slice(0, 3)  # type: ignore
+
     def validate_datum(self, to_validate: str) -> None:
         """
         Validates a postcode string
@@ -22,7 +158,22 @@ class PostCodeTrimToThreeRule(AbstractDataRule):
         :return:
         """
         # Leave the validation to postcodes_uk package
-        if not postcodes_uk.validate(to_validate):
+        if not self.cache.validate(to_validate):
             raise PostCodeValidationException('Postcode failed to validate {} '.format(
                 to_validate
             ))
+
+    def validate_series(self, series: pandas.Series) -> pandas.Series:
+        """
+        Validates a column of postcodes, each distinct postcode is only validated once and the
+        results are mapped back to the rows
+        :param series: A column of postcodes
+        :return: A boolean mask, True where the postcode is invalid
+        """
+        codes, uniques = pandas.factorize(series)  # type: ignore
+        # Missing values get code -1, which picks the trailing False
+        valid_uniques = [
+            isinstance(postcode, str) and self.cache.validate(postcode) for postcode in uniques
+        ]
+        valid = numpy.array(valid_uniques + [False], dtype=bool)[codes]
+        return pandas.Series(~valid, index=series.index)
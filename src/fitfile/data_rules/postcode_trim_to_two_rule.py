@@ -1,50 +1,123 @@
+import numpy
 import pandas
-from fitfile.data_rules.abstract_data_rule import AbstractDataRule
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+from fitfile.data_rules.abstract_data_rule import (
+    AbstractDataRule,
+    Failure,
+)
 from .exceptions import PostCodeValidationException
-from copy import deepcopy
 
 
 class PostCodeTrimToTwoRule(AbstractDataRule):
+    validation_exception = PostCodeValidationException
+    validation_message = 'Postcode is not a string of length 3'
+    row_local = False
+
+    def __init__(self, fields: Optional[List[str]] = None, logger: Optional[Any] = None) -> None:
+        super().__init__(fields=fields, logger=logger)
+        # Postcode counts per field gathered over all the chunks with accumulate
+        self._counts: Dict[str, pandas.Series] = {}
+
     def __repr__(self) -> str:
         return 'Rule three – Trim postcode to 2 when less than 10 entries'
 
-    def apply_rule(self, dataframe: pandas.DataFrame) -> pandas.DataFrame:
-        """
-        Overwrites the original apply_rule, and does a group by and conditional before transforming
-        :return: A transformed dataframe
-        """
-        def transform_if_lt_ten(row):  # type: ignore
-            """
-            Inner function to keep context
-            :param row: The row to process
-            :return: Modified row if counts < 10, unmodified row otherwise
-            """
-            try:
-                self.validate_datum(row[field])
-            except Exception as e:
-                self.on_validation_error(row, e)
-                return row
-            if row['postcode_counts'] < 10:
-                row[field] = self.transform_datum(row[field])
-            return row
-
-        toreturn_dataframe = deepcopy(dataframe)
+    def apply_to_values(
+            self,
+            values: pandas.Series,
+            counts: Optional[numpy.ndarray] = None,
+    ) -> Tuple[pandas.Series, List[Failure]]:
+        """
+        Overwrites the original apply_to_values, counts the entries of each postcode and only
+        trims the valid postcodes with less than 10 entries, invalid postcodes are left untouched.
+        Uses the accumulated counts when present, and the counts of the column otherwise
+        :param values: The postcode column, or its distinct postcodes
+        :param counts: The number of rows holding each postcode, None when each one is a row
+        :return: The transformed values and the failures
+        """
+        if len(values) == 0:
+            return values, []
+        if isinstance(values.dtype, pandas.CategoricalDtype):  # type: ignore
+            # Trimmed postcodes are new categories, trim plain strings and type them back
+            result, failures = self.apply_to_values(values.astype(object), counts)
+            return result.astype('category'), failures  # type: ignore
+        invalid = self.validate_series(values)
+        postcode_counts = self._counts.get(values.name)  # type: ignore
+        if postcode_counts is None and counts is None:
+            postcode_counts = values.value_counts()
+        elif postcode_counts is None:
+            # Postcodes can repeat once earlier rules of a chain transformed them
+            postcode_counts = pandas.Series(counts).groupby(  # type: ignore
+                values.to_numpy(), sort=False).sum()
+        to_trim = ~invalid & (values.map(postcode_counts) < 10)
+        result = values.copy()
+        if to_trim.any():
+            result[to_trim] = self.transform_series(values[to_trim])  # type: ignore
+        if not invalid.any():
+            return result, []
+        return result, [(self.validation_exception(self.validation_message),
+                         numpy.flatnonzero(invalid.to_numpy()), None)]
+
+    def accumulate(self, dataframe: pandas.DataFrame) -> None:
+        """
+        Adds the postcode counts of a chunk to the counts of each field
+        :param dataframe: A chunk of the data
+        :return: None
+        """
         for field in self.fields:
+            # Categories without rows are not postcodes of the data
+            counts = dataframe[field].astype(object).value_counts()
+            if field in self._counts:
+                counts = self._counts[field].add(counts, fill_value=0)  # type: ignore
+            self._counts[field] = counts
 
-            toreturn_dataframe['postcode_counts'] = toreturn_dataframe.groupby(  # type: ignore
-                field)[field].transform('count')
-            toreturn_dataframe = pandas.DataFrame(
-                toreturn_dataframe.apply(transform_if_lt_ten, axis=1))
-        return toreturn_dataframe
+    def stale_rows(self, previous: pandas.DataFrame, current: pandas.DataFrame) -> numpy.ndarray:
+        """
+        Finds the rows of the postcodes whose count crossed 10 since the previous run, the only
+        ones whose trimming changes
+        :param previous: The postcodes of every row on the previous run
+        :param current: The postcodes of every row on this run
+        :return: A boolean mask over the current rows
+        """
+        stale = numpy.zeros(len(current), dtype=bool)  # type: ignore
+        for field in self.fields:
+            postcodes = current[field].astype(object)
+            trimmed = postcodes.value_counts() < 10
+            was_trimmed = previous[field].astype(object).value_counts() < 10
+            # A postcode new to this run had no rows, so it was under 10
+            was_trimmed = was_trimmed.reindex(trimmed.index, fill_value=True)  # type: ignore
+            changed = trimmed != was_trimmed
+            stale |= postcodes.map(changed).fillna(False).to_numpy(dtype=bool)  # type: ignore
+        return stale
+
+    def reset_state(self) -> None:
+        """
+        Clears the accumulated postcode counts
+        :return: None
+        """
+        self._counts = {}
 
     def transform_datum(self, datum: str) -> str:
         """
-        Transforms a single datapoint, onto an age band of 10 up to 90+
+        Transforms a single datapoint, trims a postcode to its first 2 characters
         :param datum: A single datapoint
         :return: A transformed datapoint
         """
         return datum[0:2]
 
+    def transform_series(self, series: pandas.Series) -> pandas.Series:
+        """
+        Trims a column of postcodes to their first 2 characters
+        :param series: A column of previously validated postcodes
+        :return: A transformed column
+        """
+        return series.str.slice(0, 2)  # type: ignore
+
     def validate_datum(self, to_validate: str) -> None:
         """
         Validates a previously trimmed to length 3 postcode string
@@ -58,3 +131,17 @@ class PostCodeTrimToTwoRule(AbstractDataRule):
         if len(to_validate) != 3:
             raise PostCodeValidationException(
                 'Postcode is supposed to be length 3, got {}'.format(to_validate))
+
+    def validate_series(self, series: pandas.Series) -> pandas.Series:
+        """
+        Validates a column of previously trimmed to length 3 postcodes
+        :param series: A column of postcodes
+        :return: A boolean mask, True where the postcode is not a string of length 3
+        """
+        try:
+            # The str accessor returns NaN for the entries that are not strings
+            lengths = series.str.len()
+        except AttributeError:
+            # No strings at all on this column
+            return pandas.Series(True, index=series.index)
+        return lengths != 3
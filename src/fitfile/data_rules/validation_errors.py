@@ -0,0 +1,83 @@
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+import pandas
+
+
+class ValidationErrors(object):
+    """
+    Collects the entries that failed to validate as rows of a rejects table, with the row index
+    and field of each entry, its value, the rule and the exception class and message. Only the
+    counts per exception class are kept once the rows are taken, so the rows can be written out
+    as the job goes instead of piling up in memory
+    """
+    columns = ['row', 'field', 'value', 'rule', 'error', 'message']
+
+    def __init__(self, keep_rows: bool = True) -> None:
+        """
+        :param keep_rows: Whether to keep the rows, otherwise only the counts are kept
+        """
+        self.keep_rows = keep_rows
+        # The number of entries that failed to validate per exception class, over all the rows
+        self.counts: Dict[str, int] = {}
+        self._frames: List[pandas.DataFrame] = []
+
+    def __len__(self) -> int:
+        """
+        :return: The number of rows not taken yet
+        """
+        return sum(len(frame) for frame in self._frames)
+
+    def add(self, rule: str, datum: Any, exception: Exception,
+            messages: Optional[List[str]] = None) -> None:
+        """
+        Adds the entries of a validation error
+        :param rule: The name of the rule that failed
+        :param datum: An entry, or a pandas.Series of entries keeping their row index and field
+        :param exception: The validation exception
+        :param messages: A message for each entry, the message of the exception by default
+        :return: None
+        """
+        error = type(exception).__name__
+        count = len(datum) if isinstance(datum, pandas.Series) else 1
+        self.counts[error] = self.counts.get(error, 0) + count
+        if not self.keep_rows:
+            return
+        if isinstance(datum, pandas.Series):
+            rows: Any = datum.index
+            field = datum.name  # type: ignore
+            values: Any = datum.astype(object).to_numpy()
+        else:
+            rows, field, values = [None], None, [datum]
+        self._frames.append(pandas.DataFrame({
+            'row': rows,
+            'field': field,
+            'value': values,
+            'rule': rule,
+            'error': error,
+            'message': str(exception) if messages is None else messages,
+        }, columns=self.columns))
+
+    def extend(self, other: 'ValidationErrors') -> None:
+        """
+        Adds the rows and counts collected by another instance, such as on a worker process
+        :param other: The collected errors to add
+        :return: None
+        """
+        self._frames.extend(other._frames)
+        for error, count in other.counts.items():
+            self.counts[error] = self.counts.get(error, 0) + count
+
+    def take(self) -> pandas.DataFrame:
+        """
+        Returns the rows collected so far and forgets them, the counts are kept
+        :return: A dataframe with the rejects columns
+        """
+        frames, self._frames = self._frames, []
+        if not frames:
+            return pandas.DataFrame(columns=self.columns)
+        return pandas.concat(frames, ignore_index=True)
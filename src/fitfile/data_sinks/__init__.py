@@ -0,0 +1,22 @@
+from typing import (
+    Dict,
+    Type,
+)
+from fitfile.data_sinks.abstract_data_sink import AbstractDataSink
+from fitfile.data_sinks.abstract_arrow_data_sink import AbstractArrowDataSink
+from fitfile.data_sinks.arrow_data_sink import ArrowDataSink
+from fitfile.data_sinks.csv_data_sink import CsvDataSink
+from fitfile.data_sinks.json_data_sink import JsonDataSink
+from fitfile.data_sinks.ndjson_data_sink import NdjsonDataSink
+from fitfile.data_sinks.parquet_data_sink import ParquetDataSink
+__all__ = ['AbstractDataSink', 'AbstractArrowDataSink', 'ArrowDataSink', 'CsvDataSink',
+           'JsonDataSink', 'NdjsonDataSink', 'ParquetDataSink', 'DATA_SINKS']
+
+DATA_SINKS: Dict[str, Type[AbstractDataSink]] = {
+    'json': JsonDataSink,
+    'ndjson': NdjsonDataSink,
+    'parquet': ParquetDataSink,
+    'arrow': ArrowDataSink,
+    'feather': ArrowDataSink,
+    'csv': CsvDataSink,
+}
@@ -0,0 +1,148 @@
+from abc import abstractmethod
+from typing import (
+    Any,
+    Dict,
+    IO,
+    Optional,
+)
+
+import pandas
+
+from fitfile.data_sinks.abstract_data_sink import AbstractDataSink
+from .exceptions import DataSinkException
+
+
+class AbstractArrowDataSink(AbstractDataSink):
+    """
+    Base for the typed columnar sinks, built on the optional pyarrow dependency. The schema is
+    taken from the whole first chunk written, categorical columns, such as age bands, are
+    dictionary encoded and their dictionary only grows from batch to batch. Columns without a
+    single value on the first chunk, or mixing types, are stored as strings, so later chunks
+    where they do hold values still fit the schema
+    """
+    def __init__(self, output_file_path: str, compression: Optional[str] = 'infer',
+                 batch_size: int = 10000) -> None:
+        super().__init__(output_file_path, compression=compression, batch_size=batch_size)
+        self._writer: Any = None
+        self._schema: Any = None
+        self._dictionaries: Dict[str, pandas.Index] = {}
+
+    @property
+    def pyarrow(self) -> Any:
+        """
+        The pyarrow module
+        :return: The module, raises DataSinkException when pyarrow is not installed
+        """
+        try:
+            import pyarrow  # type: ignore
+        except ImportError:
+            raise DataSinkException('{} needs the pyarrow package, pip install fitfile[arrow]'
+                                    .format(self.__class__.__name__))
+        return pyarrow
+
+    def on_open(self) -> None:
+        # Fail before writing anything when pyarrow is missing
+        self.pyarrow
+        self._writer = None
+        self._schema = None
+        self._dictionaries = {}
+
+    def write(self, dataframe: pandas.DataFrame) -> None:
+        if self._schema is None and len(dataframe):
+            # From the whole chunk rather than its first batch, so sparse columns get a type
+            self._schema = self._make_schema(dataframe)
+            self._writer = self.make_writer(self.file, self._schema)
+        super().write(dataframe)
+
+    def write_batch(self, dataframe: pandas.DataFrame) -> None:
+        arrays = [
+            self._dictionary_array(field, dataframe[field.name])
+            if self.pyarrow.types.is_dictionary(field.type)
+            else self._array(field, dataframe[field.name])
+            for field in self._schema
+        ]
+        self._writer.write_batch(self.pyarrow.RecordBatch.from_arrays(arrays,
+                                                                      schema=self._schema))
+
+    def on_close(self) -> None:
+        if self._writer is None:
+            # No rows were written, write an empty file without columns
+            self._writer = self.make_writer(self.file, self.pyarrow.schema([]))
+        self._writer.close()
+
+    def _open_file(self) -> IO[Any]:
+        # Compression is handled by the writers
+        return open(self.output_file_path, 'wb')
+
+    def _make_schema(self, dataframe: pandas.DataFrame) -> Any:
+        """
+        Infers the schema from the first chunk, with int32 dictionary indices so dictionaries can
+        grow on later batches. Columns arrow can not type, or without values, are strings
+        :param dataframe: The first chunk
+        :return: A pyarrow.Schema
+        """
+        pyarrow = self.pyarrow
+        fields = []
+        for column in dataframe.columns:
+            try:
+                field = pyarrow.Schema.from_pandas(dataframe[[column]], preserve_index=False)[0]
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                field = pyarrow.field(str(column), pyarrow.string())
+            if dataframe[column].isna().all() and not pyarrow.types.is_dictionary(field.type):
+                field = field.with_type(pyarrow.string())
+            if pyarrow.types.is_dictionary(field.type):
+                field = field.with_type(pyarrow.dictionary(pyarrow.int32(),
+                                                           field.type.value_type))
+                self._dictionaries[field.name] = pandas.Index([])
+            fields.append(field)
+        return pyarrow.schema(fields)
+
+    def _array(self, field: Any, column: pandas.Series) -> Any:
+        """
+        Converts a column to the type of its field, the values of a string column that are not
+        strings are stored as their text
+        :param field: The pyarrow.Field of the column
+        :param column: The column
+        :return: A pyarrow.Array, raises DataSinkException when the column does not fit the type
+        """
+        pyarrow = self.pyarrow
+        try:
+            return pyarrow.array(column, type=field.type, from_pandas=True)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as e:
+            if not pyarrow.types.is_string(field.type):
+                raise DataSinkException('Column {} does not fit the {} type of the first chunk '
+                                        'written to {}: {}'.format(field.name, field.type,
+                                                                   self, e))
+        text = column.astype(object).map(str, na_action='ignore')
+        return pyarrow.array(text, type=field.type, from_pandas=True)
+
+    def _dictionary_array(self, field: Any, column: pandas.Series) -> Any:
+        """
+        Dictionary encodes a column, appending unseen values to the dictionary of the field so
+        earlier indices stay valid
+        :param field: The pyarrow.Field of the column
+        :param column: The column, categorical or not
+        :return: A pyarrow.DictionaryArray
+        """
+        known = self._dictionaries[field.name]
+        if isinstance(column.dtype, pandas.CategoricalDtype):  # type: ignore
+            candidates = column.cat.categories  # type: ignore
+        else:
+            candidates = pandas.Index(column.dropna().unique())  # type: ignore
+        known = known.append(candidates[~candidates.isin(known)])  # type: ignore
+        self._dictionaries[field.name] = known
+        codes = pandas.Categorical(column, categories=known).codes  # type: ignore
+        return self.pyarrow.DictionaryArray.from_arrays(
+            self.pyarrow.array(codes, type=self.pyarrow.int32(), mask=codes == -1),
+            self.pyarrow.array(known, type=field.type.value_type),
+        )
+
+    @abstractmethod
+    def make_writer(self, output_file: IO[Any], schema: Any) -> Any:
+        """
+        Creates the pyarrow writer, it needs write_batch and close methods
+        :param output_file: The open binary output file
+        :param schema: The pyarrow.Schema of the output
+        :return: A writer
+        """
+        pass
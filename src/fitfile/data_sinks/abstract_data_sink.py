@@ -0,0 +1,155 @@
+import gzip
+import io
+from abc import (
+    ABC,
+    abstractmethod,
+)
+from types import TracebackType
+from typing import (
+    Any,
+    IO,
+    Optional,
+    Type,
+)
+
+import pandas
+
+from .exceptions import DataSinkException
+
+COMPRESSION_BY_EXTENSION = {
+    '.gz': 'gzip',
+    '.zst': 'zstd',
+}
+
+
+class AbstractDataSink(ABC):
+    """
+    Writes dataframes to an output file chunk by chunk, so results can be written as they are
+    produced. Use as a context manager, or call open and close
+    """
+    # Whether rows can be added to the end of an existing output, formats with a footer can not
+    appendable: bool = False
+
+    def __init__(self, output_file_path: str, compression: Optional[str] = 'infer',
+                 batch_size: int = 10000, append: bool = False) -> None:
+        """
+        :param output_file_path: The file to write to
+        :param compression: None, gzip, zstd or infer to pick it from the output extension
+        :param batch_size: The maximum number of rows serialized at once
+        :param append: Whether to add the rows to the end of the existing output, only for
+        appendable sinks, compressed outputs get a new compressed frame
+        """
+        self.output_file_path = output_file_path
+        if compression == 'infer':
+            compression = next((
+                value for extension, value in COMPRESSION_BY_EXTENSION.items()
+                if output_file_path.endswith(extension)
+            ), None)
+        if compression not in (None, 'gzip', 'zstd'):
+            raise DataSinkException('Unknown compression {}'.format(compression))
+        self.compression = compression
+        self.batch_size = batch_size
+        if append and not self.appendable:
+            raise DataSinkException('{} can not append to an existing output'.format(
+                self.__class__.__name__))
+        self.append = append
+        self.rows_written = 0
+        self._file: Optional[IO[Any]] = None
+
+    def __repr__(self) -> str:
+        return '{} to {}'.format(self.__class__.__name__, self.output_file_path)
+
+    def __enter__(self) -> 'AbstractDataSink':
+        self.open()
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]],
+                 exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.close()
+
+    @property
+    def file(self) -> IO[Any]:
+        """
+        The open output file
+        :return: A text file object
+        """
+        if self._file is None:
+            raise DataSinkException('{} is not open'.format(self))
+        return self._file
+
+    def open(self) -> None:
+        """
+        Opens the output file, compressed when needed
+        :return: None
+        """
+        self.rows_written = 0
+        self._file = self._open_file()
+        self.on_open()
+
+    def write(self, dataframe: pandas.DataFrame) -> None:
+        """
+        Writes a chunk of results, in batches of at most batch_size rows
+        :param dataframe: The chunk to write
+        :return: None
+        """
+        if self._file is None:
+            raise DataSinkException('{} is not open'.format(self))
+        for start in range(0, len(dataframe), self.batch_size):
+            self.write_batch(dataframe.iloc[start:start + self.batch_size])
+        self.rows_written += len(dataframe)
+
+    def close(self) -> None:
+        """
+        Finishes the output and closes the file
+        :return: None
+        """
+        if self._file is None:
+            return
+        try:
+            self.on_close()
+        finally:
+            self._file.close()
+            self._file = None
+
+    def on_open(self) -> None:
+        """
+        Writes anything needed before the first batch, overwrite on subclass
+        :return: None
+        """
+        pass
+
+    def on_close(self) -> None:
+        """
+        Writes anything needed after the last batch, overwrite on subclass
+        :return: None
+        """
+        pass
+
+    @abstractmethod
+    def write_batch(self, dataframe: pandas.DataFrame) -> None:
+        """
+        Serializes a batch of rows to the open file
+        :param dataframe: The batch to write
+        :return: None
+        """
+        pass
+
+    def _open_file(self) -> IO[Any]:
+        """
+        Opens the output file for text writing, through the compressor if any
+        :return: A text file object
+        """
+        mode = 'a' if self.append else 'w'
+        if self.compression == 'gzip':
+            return gzip.open(self.output_file_path, mode + 't', encoding='utf-8')  # type: ignore
+        if self.compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise DataSinkException('zstd compression needs the zstandard package, '
+                                        'pip install fitfile[zstd]')
+            writer = zstandard.ZstdCompressor().stream_writer(
+                open(self.output_file_path, mode + 'b'))
+            return io.TextIOWrapper(writer, encoding='utf-8')
+        return open(self.output_file_path, mode, encoding='utf-8')
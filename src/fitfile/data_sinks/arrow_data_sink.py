@@ -0,0 +1,22 @@
+from typing import (
+    Any,
+    IO,
+    Optional,
+)
+
+from fitfile.data_sinks.abstract_arrow_data_sink import AbstractArrowDataSink
+from .exceptions import DataSinkException
+
+
+class ArrowDataSink(AbstractArrowDataSink):
+    """Writes an Arrow IPC file, also known as Feather version 2"""
+    def __init__(self, output_file_path: str, compression: Optional[str] = 'infer',
+                 batch_size: int = 10000) -> None:
+        super().__init__(output_file_path, compression=compression, batch_size=batch_size)
+        if self.compression == 'gzip':
+            raise DataSinkException('Arrow IPC files only support zstd compression')
+
+    def make_writer(self, output_file: IO[Any], schema: Any) -> Any:
+        options = self.pyarrow.ipc.IpcWriteOptions(emit_dictionary_deltas=True,
+                                                   compression=self.compression)
+        return self.pyarrow.ipc.new_file(output_file, schema, options=options)
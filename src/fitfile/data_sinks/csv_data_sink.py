@@ -0,0 +1,18 @@
+import pandas
+
+from fitfile.data_sinks.abstract_data_sink import AbstractDataSink
+
+
+class CsvDataSink(AbstractDataSink):
+    """Writes csv with a header line, one batch at a time"""
+    appendable = True
+
+    def on_open(self) -> None:
+        # An appended output already has its header
+        self._header = not self.append
+
+    def write_batch(self, dataframe: pandas.DataFrame) -> None:
+        if len(dataframe) == 0:
+            return
+        dataframe.to_csv(self.file, header=self._header, index=False)  # type: ignore
+        self._header = False
@@ -0,0 +1,23 @@
+import pandas
+
+from fitfile.data_sinks.abstract_data_sink import AbstractDataSink
+
+
+class JsonDataSink(AbstractDataSink):
+    """Writes a compact json array of records, one batch at a time"""
+    def on_open(self) -> None:
+        self._empty = True
+        self.file.write('[')
+
+    def write_batch(self, dataframe: pandas.DataFrame) -> None:
+        if len(dataframe) == 0:
+            return
+        records = dataframe.to_json(orient='records')  # type: ignore
+        if not self._empty:
+            self.file.write(',')
+        # Drop the enclosing brackets, the array spans all the batches
+        self.file.write(records[1:-1])
+        self._empty = False
+
+    def on_close(self) -> None:
+        self.file.write(']')
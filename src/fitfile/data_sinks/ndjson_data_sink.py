@@ -0,0 +1,14 @@
+import pandas
+
+from fitfile.data_sinks.abstract_data_sink import AbstractDataSink
+
+
+class NdjsonDataSink(AbstractDataSink):
+    """Writes newline delimited json, one record per line"""
+    appendable = True
+
+    def write_batch(self, dataframe: pandas.DataFrame) -> None:
+        if len(dataframe) == 0:
+            return
+        records = dataframe.to_json(orient='records', lines=True)  # type: ignore
+        self.file.write(records.rstrip('\n') + '\n')
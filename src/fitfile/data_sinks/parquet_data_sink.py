@@ -0,0 +1,14 @@
+from typing import (
+    Any,
+    IO,
+)
+
+from fitfile.data_sinks.abstract_arrow_data_sink import AbstractArrowDataSink
+
+
+class ParquetDataSink(AbstractArrowDataSink):
+    """Writes a parquet file, one row group per batch, compressed with snappy by default"""
+    def make_writer(self, output_file: IO[Any], schema: Any) -> Any:
+        import pyarrow.parquet  # type: ignore
+        return pyarrow.parquet.ParquetWriter(output_file, schema,
+                                             compression=self.compression or 'snappy')
@@ -0,0 +1,137 @@
+import logging
+import os
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    as_completed,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+from fitfile.data_managers import AbstractDataManager
+from fitfile.data_rules.postcode_trim_to_three_rule import (
+    postcode_validation_cache,
+    resize_postcode_validation_cache,
+)
+
+SUCCESS = 'SUCCESS'
+FAIL = 'FAIL'
+
+
+class JobScheduler(object):
+    """Runs independent data manager jobs, concurrently on a process pool when workers > 1"""
+    def __init__(self, workers: int = 1, log_dir: Optional[str] = None,
+                 logger: Optional[Any] = None) -> None:
+        """
+        :param workers: The number of processes to run jobs on, 1 runs them in this process
+        :param log_dir: When set, each job logs to its own file in this directory
+        :param logger: The logger for the scheduler itself
+        """
+        self.workers = workers
+        self.log_dir = log_dir
+        self.jobs: List[AbstractDataManager] = []
+        self.statuses: Dict[str, str] = {}
+        if logger is None:
+            logger = logging.getLogger('fitfile.job_scheduler')
+        self.logger = logger
+
+    def add_job(self, data_manager: AbstractDataManager) -> None:
+        """
+        Adds a job to run
+        :param data_manager: A data manager with its rules already set
+        :return: None, raises ValueError when a job with the same request ID was added, as
+        statuses and log files are kept by request ID
+        """
+        if any(job.request_id == data_manager.request_id for job in self.jobs):
+            raise ValueError('A job with request ID {} was already added'.format(
+                data_manager.request_id))
+        self.jobs.append(data_manager)
+
+    def run(self) -> Dict[str, str]:
+        """
+        Runs all the jobs and gathers their status
+        :return: A dictionary of request ID to SUCCESS or FAIL
+        """
+        self.statuses = {}
+        if self.workers <= 1:
+            for data_manager in self.jobs:
+                self._set_status(data_manager, lambda: run_job(data_manager, self.log_dir))
+            return self.statuses
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 initializer=resize_postcode_validation_cache,
+                                 initargs=(postcode_validation_cache.maxsize,)) as executor:
+            futures = {
+                executor.submit(run_job, data_manager, self.log_dir): data_manager
+                for data_manager in self.jobs
+            }
+            for future in as_completed(futures):
+                self._set_status(futures[future], future.result)
+        return self.statuses
+
+    def _set_status(self, data_manager: AbstractDataManager, get_status: Any) -> None:
+        """
+        Stores the status of a job, a job raising an exception is a failure
+        :param data_manager: The job
+        :param get_status: A callable returning the job status
+        :return: None
+        """
+        try:
+            status = get_status()
+        except Exception as e:
+            self.logger.exception('Job {} raised {}'.format(data_manager, e))
+            status = FAIL
+        self.statuses[data_manager.request_id] = status
+
+    @property
+    def exit_code(self) -> int:
+        """
+        The exit code of the whole batch
+        :return: 0 if every job succeeded, 1 otherwise
+        """
+        return int(any(status != SUCCESS for status in self.statuses.values()))
+
+
+def job_log_file_name(data_manager: AbstractDataManager) -> str:
+    """
+    The log file name for a job, of the form CsvProcessing_123.log
+    :param data_manager: The job
+    :return: A file name
+    """
+    return '{}_{}.log'.format(
+        data_manager.__class__.__name__.replace('DataManager', 'Processing'),
+        data_manager.request_id,
+    )
+
+
+def run_job(data_manager: AbstractDataManager, log_dir: Optional[str] = None) -> str:
+    """
+    Runs a single job, module level so it can be sent to a process pool. When a log directory
+    is given the job and its rules log to their own file instead of the global logging config
+    :param data_manager: The job to run
+    :param log_dir: The directory for the job log file
+    :return: The job error_string, SUCCESS or FAIL
+    """
+    if log_dir is None:
+        data_manager.run()
+        return data_manager.error_string
+    logger = logging.getLogger('fitfile.jobs.{}'.format(data_manager.request_id))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handler = logging.FileHandler(os.path.join(log_dir, job_log_file_name(data_manager)),
+                                  mode='w')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s',
+                                           datefmt='%H:%M:%S'))
+    logger.addHandler(handler)
+    data_manager.logger = logger
+    for rule in data_manager.rules:
+        if rule.logger is not None:
+            rule.logger = logger
+    try:
+        data_manager.run()
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    return data_manager.error_string
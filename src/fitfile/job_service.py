@@ -0,0 +1,394 @@
+import asyncio
+import collections
+import importlib
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from fitfile import manifest
+from fitfile.data_managers import AbstractDataManager
+from fitfile.data_rules.postcode_trim_to_three_rule import (
+    POSTCODE_CACHE_SIZE,
+    postcode_validation_cache,
+    resize_postcode_validation_cache,
+)
+from fitfile.job_scheduler import (
+    FAIL,
+    run_job,
+)
+
+QUEUED = 'QUEUED'
+RUNNING = 'RUNNING'
+# The modules the workers import before their first job, so no job pays for them
+WARM_IMPORTS = ('pandas', 'numpy', 'openpyxl', 'postcodes_uk', 'fitfile.data_managers',
+                'fitfile.data_rules', 'fitfile.data_sinks')
+# The keys a job spec may set, others such as shards or parse_workers size process pools and
+# are left to the service
+SPEC_KEYS = frozenset([
+    'request_id', 'input', 'output', 'format', 'rules', 'chunksize', 'output_format',
+    'compression', 'output_columns', 'dtype', 'parse_dates', 'write_report', 'rejects_format',
+    'quarantine', 'fuse_rules', 'input_cache', 'incremental', 'lines', 'sheet_name', 'usecols',
+    'engine',
+])
+RULE_KEYS = frozenset(['rule', 'fields', 'factorize'])
+# The keys of a job spec holding paths, which must be in the base directory
+PATH_KEYS = ('input', 'output', 'input_cache')
+MAX_PENDING = 100
+MAX_FINISHED = 1000
+MAX_BODY_SIZE = 2 ** 20
+HTTP_REASONS = {
+    200: 'OK',
+    202: 'Accepted',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    409: 'Conflict',
+    413: 'Payload Too Large',
+    503: 'Service Unavailable',
+}
+
+
+class JobServiceBusy(Exception):
+    pass
+
+
+class JobServiceConflict(Exception):
+    pass
+
+
+def warm_imports(postcode_cache_size: Optional[int] = POSTCODE_CACHE_SIZE) -> None:
+    """
+    Imports the modules jobs need and sizes the postcode validation cache, the initializer of
+    the worker processes
+    :param postcode_cache_size: The size of the postcode validation cache of the workers
+    :return: None
+    """
+    for module in WARM_IMPORTS:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            continue
+    resize_postcode_validation_cache(postcode_cache_size)
+
+
+def run_service_job(data_manager: AbstractDataManager,
+                    log_dir: Optional[str] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Runs a single job of the service, module level so it can be sent to a process pool
+    :param data_manager: The job to run
+    :param log_dir: The directory for the job log file
+    :return: The job error_string, SUCCESS or FAIL, and its run report
+    """
+    status = run_job(data_manager, log_dir)
+    return status, data_manager.run_report
+
+
+class JobService(object):
+    """
+    Long running service accepting job specs, in the format of the jobs of a manifest, and
+    running them on a bounded executor, so the imports are only paid once. At most workers jobs
+    run at a time, on a process pool when workers > 1, and at most max_pending jobs wait for
+    one, further submissions are refused until some start. The status of each job is kept until
+    max_finished later jobs have finished
+    """
+    def __init__(self, workers: int = 1, max_pending: int = MAX_PENDING,
+                 max_finished: int = MAX_FINISHED, log_dir: Optional[str] = None,
+                 base_dir: str = '.', logger: Optional[Any] = None) -> None:
+        """
+        :param workers: The number of jobs to run concurrently, 1 runs them on a thread of this
+        process
+        :param max_pending: The number of submitted jobs that can wait for a worker
+        :param max_finished: The number of finished jobs whose status is kept
+        :param log_dir: When set, each job logs to its own file in this directory
+        :param base_dir: The directory relative paths of the job specs are resolved against,
+        the paths of a job can not be outside of it
+        :param logger: The logger for the service itself
+        """
+        if workers < 1 or max_pending < 1:
+            raise ValueError('The service needs at least one worker and one pending job, got '
+                             'workers={} max_pending={}'.format(workers, max_pending))
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.log_dir = log_dir
+        self.base_dir = base_dir
+        if logger is None:
+            logger = logging.getLogger('fitfile.job_service')
+        self.logger = logger
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._finished: collections.deque = collections.deque()
+        self._ids = itertools.count(1)
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[Executor] = None
+        self._runners: List[asyncio.Task] = []
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+        return self._queue
+
+    def start(self) -> None:
+        """
+        Starts the executor, importing the job modules on each worker and giving it the postcode
+        validation cache size of this process, and the tasks feeding it the queued jobs. Needs a
+        running event loop
+        :return: None
+        """
+        initargs = (postcode_validation_cache.maxsize,)
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 initializer=warm_imports, initargs=initargs)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1, initializer=warm_imports,
+                                                initargs=initargs)
+        self._runners = [asyncio.ensure_future(self._run_jobs()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Stops taking jobs from the queue and shuts the executor down once the running jobs are
+        done, they are reported as failed since their results are not waited for
+        :return: None
+        """
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._runners = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def submit(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Builds a job from its spec and queues it
+        :param spec: A job in the format of the jobs of a manifest, with request_id, input,
+        output and its rules
+        :return: The job status, raises JobServiceBusy when max_pending jobs are waiting,
+        JobServiceConflict when a queued or running job has the same request ID or output, as
+        they would overwrite each other's log, output and state files, and ManifestException, or
+        the exception of the data manager, when the spec is not valid
+        """
+        if self.queue.full():
+            raise JobServiceBusy('{} jobs are already waiting'.format(self.max_pending))
+        self.check_spec(spec)
+        [data_manager] = manifest.build_jobs({'jobs': [spec]}, self.base_dir)
+        output_file_path = os.path.realpath(data_manager.output_file_path)
+        for active in self.jobs.values():
+            if active['status'] not in (QUEUED, RUNNING):
+                continue
+            if active['request_id'] == data_manager.request_id:
+                raise JobServiceConflict('Job {} already has request ID {}'.format(
+                    active['id'], data_manager.request_id))
+            if active['output_file_path'] == output_file_path:
+                raise JobServiceConflict('Job {} already writes to {}'.format(
+                    active['id'], spec['output']))
+        job_id = str(next(self._ids))
+        job: Dict[str, Any] = {
+            'id': job_id,
+            'request_id': data_manager.request_id,
+            'output_file_path': output_file_path,
+            'status': QUEUED,
+            'submitted': time.time(),
+            'started': None,
+            'finished': None,
+            'run_report': None,
+            'exception': None,
+        }
+        self.queue.put_nowait((job, data_manager))
+        self.jobs[job_id] = job
+        self.logger.info('Queued job {} for {}'.format(job_id, data_manager))
+        return job
+
+    def check_spec(self, spec: Dict[str, Any]) -> None:
+        """
+        Checks a job spec only sets the keys in SPEC_KEYS, and RULE_KEYS for its rules, and only
+        has paths inside base_dir, symbolic links resolved
+        :param spec: A job spec
+        :return: None, raises ManifestException when the spec is not allowed
+        """
+        unknown = set(spec) - SPEC_KEYS
+        for rule in spec.get('rules', []):
+            if not isinstance(rule, dict):
+                raise manifest.ManifestException('A rule must be an object, got {}'.format(rule))
+            unknown.update(set(rule) - RULE_KEYS)
+        if unknown:
+            raise manifest.ManifestException('Job specs can not set {}'.format(sorted(unknown)))
+        base_dir = os.path.realpath(self.base_dir)
+        for key in PATH_KEYS:
+            if not isinstance(spec.get(key), str):
+                continue
+            path = os.path.realpath(os.path.join(base_dir, spec[key]))
+            if os.path.commonpath([base_dir, path]) != base_dir:
+                raise manifest.ManifestException('The {} {} is outside of {}'.format(
+                    key, spec[key], self.base_dir))
+
+    def status(self) -> Dict[str, Any]:
+        """
+        :return: The number of jobs waiting, running and finished, and the service limits
+        """
+        statuses = collections.Counter(job['status'] for job in self.jobs.values())
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'queued': statuses[QUEUED],
+            'running': statuses[RUNNING],
+            'finished': len(self._finished),
+        }
+
+    async def join(self) -> None:
+        """
+        Waits until every queued job has finished
+        :return: None
+        """
+        await self.queue.join()
+
+    async def _run_jobs(self) -> None:
+        """
+        Takes the queued jobs one at a time and runs them on the executor
+        :return: None
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            job, data_manager = await self.queue.get()
+            job['status'] = RUNNING
+            job['started'] = time.time()
+            try:
+                job['status'], job['run_report'] = await loop.run_in_executor(
+                    self._executor, run_service_job, data_manager, self.log_dir)
+            except asyncio.CancelledError:
+                job['status'] = FAIL
+                job['exception'] = 'The service stopped while the job was running'
+                raise
+            except Exception as e:
+                self.logger.exception('Job {} raised {}'.format(data_manager, e))
+                job['status'] = FAIL
+                job['exception'] = repr(e)
+            finally:
+                job['finished'] = time.time()
+                self._forget_finished(job)
+                self.queue.task_done()
+            self.logger.info('Job {} for {} finished with status {}'.format(
+                job['id'], data_manager, job['status']))
+
+    def _forget_finished(self, job: Dict[str, Any]) -> None:
+        """
+        Keeps the status of the last max_finished finished jobs
+        :param job: The job that just finished
+        :return: None
+        """
+        self._finished.append(job['id'])
+        while len(self._finished) > self.max_finished:
+            self.jobs.pop(self._finished.popleft(), None)
+
+    async def handle_request(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        """
+        The HTTP API of the service: POST /jobs queues the job spec in the body, GET /jobs lists
+        the jobs, GET /jobs/<id> gets one and GET /status gets the status of the service
+        :param method: The HTTP method
+        :param path: The request path
+        :param body: The request body
+        :return: The HTTP status code and the json response
+        """
+        parts = path.strip('/').split('/')
+        if parts == ['status'] and method == 'GET':
+            return 200, self.status()
+        if parts[0] != 'jobs' or len(parts) > 2:
+            return 404, {'error': 'Unknown path {}'.format(path)}
+        if len(parts) == 2:
+            if method != 'GET':
+                return 405, {'error': 'Only GET is allowed on jobs'}
+            if parts[1] not in self.jobs:
+                return 404, {'error': 'Unknown job {}'.format(parts[1])}
+            return 200, self.jobs[parts[1]]
+        if method == 'GET':
+            return 200, list(self.jobs.values())
+        if method != 'POST':
+            return 405, {'error': 'Only GET and POST are allowed on /jobs'}
+        try:
+            spec = json.loads(body)
+            if not isinstance(spec, dict):
+                raise ValueError('A job spec must be an object, got {}'.format(spec))
+            return 202, self.submit(spec)
+        except JobServiceBusy as e:
+            return 503, {'error': str(e)}
+        except JobServiceConflict as e:
+            return 409, {'error': str(e)}
+        except Exception as e:
+            return 400, {'error': repr(e)}
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """
+        Serves a single HTTP/1.1 request, closing the connection after the response
+        :param reader: The connection stream reader
+        :param writer: The connection stream writer
+        :return: None
+        """
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) != 3:
+                code, response = 400, {'error': 'Malformed request line'}
+            elif int(headers.get('content-length', 0)) > MAX_BODY_SIZE:
+                code, response = 413, {'error': 'Bodies are limited to {} bytes'.format(
+                    MAX_BODY_SIZE)}
+            else:
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                code, response = await self.handle_request(request_line[0].upper(),
+                                                           request_line[1], body)
+            content = json.dumps(response, default=str).encode()
+            head = ['HTTP/1.1 {} {}'.format(code, HTTP_REASONS[code]),
+                    'Content-Type: application/json',
+                    'Content-Length: {}'.format(len(content)),
+                    'Connection: close']
+            if code == 503:
+                head.append('Retry-After: 1')
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + content)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            self.logger.warning('Dropped a request: {!r}'.format(e))
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8000,
+                    unix_socket: Optional[str] = None) -> None:
+        """
+        Serves the HTTP API on a TCP port, or a unix socket, until cancelled
+        :param host: The host to listen on
+        :param port: The port to listen on
+        :param unix_socket: When set, the path of the unix socket to listen on instead
+        :return: None
+        """
+        self.start()
+        if unix_socket is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            address = unix_socket
+        else:
+            server = await asyncio.start_server(self.handle_connection, host=host, port=port)
+            address = '{}:{}'.format(host, port)
+        self.logger.info('Serving jobs on {} with {} workers'.format(address, self.workers))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
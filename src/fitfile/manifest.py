@@ -0,0 +1,149 @@
+import importlib
+import json
+import os
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Type,
+)
+
+from fitfile.data_managers import (
+    AbstractDataManager,
+    CsvDataManager,
+    ExcelDataManager,
+    JsonDataManager,
+)
+from fitfile.data_rules import (
+    AbstractDataRule,
+    AgeBandRule,
+    PostCodeTrimToThreeRule,
+    PostCodeTrimToTwoRule,
+)
+
+tomllib: Optional[Any]
+try:
+    tomllib = importlib.import_module('tomllib')
+except ImportError:  # Python < 3.11
+    try:
+        tomllib = importlib.import_module('tomli')
+    except ImportError:
+        tomllib = None
+
+DATA_MANAGERS: Dict[str, Type[AbstractDataManager]] = {
+    'csv': CsvDataManager,
+    'excel': ExcelDataManager,
+    'json': JsonDataManager,
+}
+
+DATA_RULES: Dict[str, Type[AbstractDataRule]] = {
+    'AgeBandRule': AgeBandRule,
+    'PostCodeTrimToThreeRule': PostCodeTrimToThreeRule,
+    'PostCodeTrimToTwoRule': PostCodeTrimToTwoRule,
+}
+
+FORMATS_BY_EXTENSION = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.jsonl': 'json',
+    '.ndjson': 'json',
+    '.xlsx': 'excel',
+}
+# The excel reader streams workbooks with openpyxl, which only reads the xlsx format
+LEGACY_EXCEL_EXTENSIONS = ('.xls',)
+
+
+class ManifestException(Exception):
+    pass
+
+
+def load_manifest(manifest_path: str) -> Dict[str, Any]:
+    """
+    Reads a job manifest in json or toml format, depending on the file extension
+    :param manifest_path: The path of the manifest
+    :return: The manifest as a dictionary
+    """
+    if manifest_path.endswith('.toml'):
+        if tomllib is None:
+            raise ManifestException('Reading toml manifests needs python 3.11 or tomli')
+        with open(manifest_path, 'rb') as manifest_file:
+            manifest: Dict[str, Any] = tomllib.load(manifest_file)
+    else:
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+    if not isinstance(manifest.get('jobs'), list):
+        raise ManifestException('Manifest {} has no list of jobs'.format(manifest_path))
+    return manifest
+
+
+def build_jobs(manifest: Dict[str, Any], base_dir: str = '.') -> List[AbstractDataManager]:
+    """
+    Builds a data manager, with its rules, for each job of a manifest. A job has a request_id,
+    an input and an output path, relative to base_dir, an optional format (inferred from the
+    input extension otherwise) and an ordered list of rules, each with a rule name and fields.
+    Any other key of a job or a rule is passed to the data manager or rule constructor
+    :param manifest: The manifest as a dictionary
+    :param base_dir: The directory relative paths are resolved against
+    :return: A list of data managers, raises ManifestException when two jobs share a request ID,
+    as their statuses and log files are kept by request ID
+    """
+    jobs = [_build_job(job, base_dir) for job in manifest['jobs']]
+    request_ids = [job.request_id for job in jobs]
+    duplicates = sorted({request_id for request_id in request_ids
+                         if request_ids.count(request_id) > 1})
+    if duplicates:
+        raise ManifestException('Request IDs {} are used by more than one job'.format(duplicates))
+    return jobs
+
+
+def _build_job(job: Dict[str, Any], base_dir: str) -> AbstractDataManager:
+    """
+    Builds a single job of a manifest
+    :param job: The job entry
+    :param base_dir: The directory relative paths are resolved against
+    :return: A data manager with its rules set
+    """
+    job = dict(job)
+    try:
+        request_id = str(job.pop('request_id'))
+        input_file_path = os.path.join(base_dir, job.pop('input'))
+        output_file_path = os.path.join(base_dir, job.pop('output'))
+    except KeyError as e:
+        raise ManifestException('Job {} is missing {}'.format(job, e))
+    data_format = job.pop('format', None)
+    extension = os.path.splitext(input_file_path)[1].lower()
+    if data_format is None:
+        data_format = FORMATS_BY_EXTENSION.get(extension)
+    if extension in LEGACY_EXCEL_EXTENSIONS and data_format in (None, 'excel'):
+        raise ManifestException('Legacy {} workbooks are not supported, request ID {} needs {} '
+                                'saved as .xlsx'.format(extension, request_id, input_file_path))
+    if data_format not in DATA_MANAGERS:
+        raise ManifestException('Unknown format {} for request ID {}, expected one of {}'.format(
+            data_format, request_id, sorted(DATA_MANAGERS)))
+    rules = job.pop('rules', [])
+    if isinstance(job.get('input_cache'), str):
+        job['input_cache'] = os.path.join(base_dir, job['input_cache'])
+    data_manager = DATA_MANAGERS[data_format](
+        input_file_path=input_file_path,
+        output_file_path=output_file_path,
+        request_id=request_id,
+        **job
+    )
+    data_manager.set_rules([_build_rule(rule, data_manager) for rule in rules])
+    return data_manager
+
+
+def _build_rule(rule: Dict[str, Any], data_manager: AbstractDataManager) -> AbstractDataRule:
+    """
+    Builds a single rule of a job, logging to the data manager logger
+    :param rule: The rule entry
+    :param data_manager: The data manager the rule belongs to
+    :return: A data rule
+    """
+    rule = dict(rule)
+    name = rule.pop('rule', None)
+    if name not in DATA_RULES:
+        raise ManifestException('Unknown rule {} for request ID {}, expected one of {}'.format(
+            name, data_manager.request_id, sorted(DATA_RULES)))
+    return DATA_RULES[name](logger=data_manager.logger, **rule)
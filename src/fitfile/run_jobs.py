@@ -1,18 +1,48 @@
 import argparse
+import asyncio
 import os
+import sys
+from typing import (
+    List,
+    Optional,
+)
 
 from fitfile.data_managers import (
+    AbstractDataManager,
     JsonDataManager,
     CsvDataManager,
     ExcelDataManager,
 )
+from fitfile.data_managers.csv_data_manager import CSV_ENGINES
+from fitfile.data_managers.input_cache import (
+    INPUT_CACHE_SIZE,
+    InputCache,
+)
 from fitfile.data_rules import (
     AgeBandRule,
     PostCodeTrimToTwoRule,
     PostCodeTrimToThreeRule,
 )
-import logging
+from fitfile import manifest
+from fitfile.data_sinks import DATA_SINKS
+from fitfile.data_rules.postcode_trim_to_three_rule import (
+    POSTCODE_CACHE_SIZE,
+    resize_postcode_validation_cache,
+)
+from fitfile.job_scheduler import JobScheduler
+from fitfile.job_service import (
+    MAX_PENDING,
+    JobService,
+)
 
+OUTPUT_EXTENSIONS = {
+    'json': '.json',
+    'ndjson': '.ndjson',
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+    'feather': '.feather',
+    'csv': '.csv',
+}
 
 argument_parser = argparse.ArgumentParser(
     prog='Fitfile data manager',
@@ -28,99 +58,206 @@ argument_parser.add_argument('--excel-file', dest='excel_file',
 argument_parser.add_argument('--output-dir', dest='output_dir',
                              help='The output directory to save the outputs', required=True)
 argument_parser.add_argument('--log-dir', dest='log_dir', required=False, default=None,
-                             help='The output directory to save the outputs')
-
-
-def main() -> None:
-    args = argument_parser.parse_args()
-    json_out = os.path.join(args.output_dir, 'PatientCohortsOutput.json')
-    csv_out = os.path.join(args.output_dir, 'customerOutput.json')
-    excel_out = os.path.join(args.output_dir, 'ResearchListOutput.json')
-
-    if args.log_dir is None:
-
-        process_1 = CsvDataManager(
-            input_file_path=args.csv_file,
-            output_file_path=csv_out,
-            request_id='123',
-        )
-        p1_r1 = AgeBandRule(fields=['dob'], logger=process_1.logger)
-        process_1.set_rules([p1_r1])
-        process_1.run()
-        process_2 = JsonDataManager(
-            input_file_path=args.json_file,
-            output_file_path=json_out,
-            request_id='7282',
-        )
-        p2_r1 = AgeBandRule(fields=['age'], logger=process_2.logger)
-        p2_r2 = PostCodeTrimToThreeRule(fields=['PostCode'], logger=process_2.logger)
-        process_2.set_rules([p2_r1, p2_r2])
-        process_2.run()
-
-        process_3 = ExcelDataManager(
-            input_file_path=args.excel_file,
-            output_file_path=excel_out,
-            request_id='92421'
-        )
-        p3_r1 = PostCodeTrimToThreeRule(fields=['PostCode'], logger=process_3.logger)
-        p3_r2 = PostCodeTrimToTwoRule(fields=['PostCode'], logger=process_3.logger)
-        process_3.set_rules([p3_r1, p3_r2])
-        process_3.run()
+                             help='The output directory to save the logs, one file per job')
+argument_parser.add_argument('--workers', dest='workers', type=int, default=1,
+                             help='The number of jobs to run concurrently, defaults to 1')
+argument_parser.add_argument('--output-format', dest='output_format', default=None,
+                             choices=sorted(DATA_SINKS),
+                             help='The output format, defaults to indented json')
+argument_parser.add_argument('--postcode-cache-size', dest='postcode_cache_size', type=int,
+                             default=POSTCODE_CACHE_SIZE,
+                             help='The number of postcode validation results to cache, '
+                                  'defaults to {}'.format(POSTCODE_CACHE_SIZE))
+argument_parser.add_argument('--input-cache', dest='input_cache', default=None,
+                             help='The directory to cache the parsed inputs in, so unchanged '
+                                  'inputs are not parsed again')
+argument_parser.add_argument('--input-cache-size', dest='input_cache_size', type=int,
+                             default=INPUT_CACHE_SIZE,
+                             help='The maximum size of the input cache in bytes, defaults to '
+                                  '{}'.format(INPUT_CACHE_SIZE))
+argument_parser.add_argument('--incremental', dest='incremental', action='store_true',
+                             help='Only transform the rows that changed since the last run, '
+                                  'keeping their state next to the outputs')
+argument_parser.add_argument('--csv-engine', dest='csv_engine', default='c', choices=CSV_ENGINES,
+                             help='How the csv input is parsed, c with pandas, parallel on '
+                                  'byte ranges of it in worker processes or pyarrow, defaults '
+                                  'to c')
+
+manifest_argument_parser = argparse.ArgumentParser(
+    prog='fitfile run',
+    description='Runs a batch of jobs defined in a json or toml manifest',
+    epilog='For any queries enricserrasanz@gmail.com')
+
+manifest_argument_parser.add_argument('--manifest', dest='manifest', required=True,
+                                      help='The location of the jobs manifest, relative paths in '
+                                           'it are resolved against its directory')
+manifest_argument_parser.add_argument('--log-dir', dest='log_dir', required=False, default=None,
+                                      help='The output directory to save the logs, overrides the '
+                                           'manifest log_dir')
+manifest_argument_parser.add_argument('--workers', dest='workers', type=int, default=None,
+                                      help='The number of jobs to run concurrently, overrides '
+                                           'the manifest workers, defaults to 1')
+manifest_argument_parser.add_argument('--output-format', dest='output_format', default=None,
+                                      choices=sorted(DATA_SINKS),
+                                      help='The output format of the jobs that do not set one')
+manifest_argument_parser.add_argument('--postcode-cache-size', dest='postcode_cache_size',
+                                      type=int, default=POSTCODE_CACHE_SIZE,
+                                      help='The number of postcode validation results to cache, '
+                                           'defaults to {}'.format(POSTCODE_CACHE_SIZE))
+manifest_argument_parser.add_argument('--input-cache', dest='input_cache', default=None,
+                                      help='The directory to cache the parsed inputs in, for the '
+                                           'jobs that do not set one')
+manifest_argument_parser.add_argument('--input-cache-size', dest='input_cache_size', type=int,
+                                      default=INPUT_CACHE_SIZE,
+                                      help='The maximum size of the input cache in bytes, '
+                                           'defaults to {}'.format(INPUT_CACHE_SIZE))
+manifest_argument_parser.add_argument('--incremental', dest='incremental', action='store_true',
+                                      help='Only transform the rows that changed since the last '
+                                           'run on every job, keeping their state next to the '
+                                           'outputs')
+
+serve_argument_parser = argparse.ArgumentParser(
+    prog='fitfile serve',
+    description='Serves an HTTP API accepting jobs, in the format of the jobs of a manifest, and '
+                'runs them on a bounded pool of workers',
+    epilog='For any queries enricserrasanz@gmail.com')
+
+serve_argument_parser.add_argument('--host', dest='host', default='127.0.0.1',
+                                   help='The host to listen on, defaults to 127.0.0.1')
+serve_argument_parser.add_argument('--port', dest='port', type=int, default=8000,
+                                   help='The port to listen on, defaults to 8000')
+serve_argument_parser.add_argument('--unix-socket', dest='unix_socket', default=None,
+                                   help='The path of a unix socket to listen on instead of a port')
+serve_argument_parser.add_argument('--workers', dest='workers', type=int, default=1,
+                                   help='The number of jobs to run concurrently, defaults to 1')
+serve_argument_parser.add_argument('--max-pending', dest='max_pending', type=int,
+                                   default=MAX_PENDING,
+                                   help='The number of jobs that can wait for a worker, further '
+                                        'jobs are refused with 503, defaults to '
+                                        '{}'.format(MAX_PENDING))
+serve_argument_parser.add_argument('--base-dir', dest='base_dir', default='.',
+                                   help='The directory relative paths of the jobs are resolved '
+                                        'against, defaults to the working directory')
+serve_argument_parser.add_argument('--log-dir', dest='log_dir', required=False, default=None,
+                                   help='The output directory to save the logs, one file per job')
+serve_argument_parser.add_argument('--postcode-cache-size', dest='postcode_cache_size',
+                                   type=int, default=POSTCODE_CACHE_SIZE,
+                                   help='The number of postcode validation results to cache, '
+                                        'defaults to {}'.format(POSTCODE_CACHE_SIZE))
 
+
+def build_jobs(args: argparse.Namespace) -> List[AbstractDataManager]:
+    """
+    Builds the data manager jobs for each input file
+    :param args: The parsed command line arguments
+    :return: A list of data managers with their rules set
+    """
+    extension = OUTPUT_EXTENSIONS.get(args.output_format, '.json')
+    json_out = os.path.join(args.output_dir, 'PatientCohortsOutput' + extension)
+    csv_out = os.path.join(args.output_dir, 'customerOutput' + extension)
+    excel_out = os.path.join(args.output_dir, 'ResearchListOutput' + extension)
+    input_cache = _input_cache(args)
+
+    process_1 = CsvDataManager(
+        input_file_path=args.csv_file,
+        output_file_path=csv_out,
+        request_id='123',
+        output_format=args.output_format,
+        input_cache=input_cache,
+        incremental=args.incremental,
+        engine=args.csv_engine,
+    )
+    p1_r1 = AgeBandRule(fields=['dob'], logger=process_1.logger)
+    process_1.set_rules([p1_r1])
+
+    process_2 = JsonDataManager(
+        input_file_path=args.json_file,
+        output_file_path=json_out,
+        request_id='7282',
+        output_format=args.output_format,
+        input_cache=input_cache,
+        incremental=args.incremental,
+    )
+    p2_r1 = AgeBandRule(fields=['age'], logger=process_2.logger)
+    p2_r2 = PostCodeTrimToThreeRule(fields=['PostCode'], logger=process_2.logger)
+    process_2.set_rules([p2_r1, p2_r2])
+
+    process_3 = ExcelDataManager(
+        input_file_path=args.excel_file,
+        output_file_path=excel_out,
+        request_id='92421',
+        output_format=args.output_format,
+        input_cache=input_cache,
+        incremental=args.incremental,
+    )
+    p3_r1 = PostCodeTrimToThreeRule(fields=['PostCode'], logger=process_3.logger)
+    p3_r2 = PostCodeTrimToTwoRule(fields=['PostCode'], logger=process_3.logger)
+    process_3.set_rules([p3_r1, p3_r2])
+    return [process_1, process_2, process_3]
+
+
+def _input_cache(args: argparse.Namespace) -> Optional[InputCache]:
+    """
+    :param args: The parsed command line arguments
+    :return: The input cache shared by the jobs, None unless --input-cache is given
+    """
+    if args.input_cache is None:
+        return None
+    return InputCache(args.input_cache, max_bytes=args.input_cache_size)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == 'serve':
+        return serve(serve_argument_parser.parse_args(argv[1:]))
+    if argv and argv[0] == 'run':
+        args = manifest_argument_parser.parse_args(argv[1:])
+        base_dir = os.path.dirname(args.manifest)
+        job_manifest = manifest.load_manifest(args.manifest)
+        jobs = manifest.build_jobs(job_manifest, base_dir)
+        workers = args.workers if args.workers is not None else job_manifest.get('workers', 1)
+        log_dir = args.log_dir
+        if log_dir is None and job_manifest.get('log_dir') is not None:
+            log_dir = os.path.join(base_dir, job_manifest['log_dir'])
+        input_cache = _input_cache(args)
+        for job in jobs:
+            if job.output_format is None:
+                job.output_format = args.output_format
+            if job.input_cache is None:
+                job.input_cache = input_cache
+            if args.incremental and job.chunksize is None:
+                # Streaming jobs do not load the whole input, they are always run in full
+                job.incremental = True
     else:
-        logging.basicConfig(filename=os.path.join(args.log_dir, 'CsvProcessing_123.log'),
-                            filemode='w',
-                            datefmt='%H:%M:%S',
-                            level=logging.DEBUG)
-
-        logger = logging.getLogger('CsvDataManager')
-
-        process_1 = CsvDataManager(
-            input_file_path=args.csv_file,
-            output_file_path=csv_out,
-            request_id='123',
-            logger=logger,
-        )
-        p1_r1 = AgeBandRule(fields=['dob'], logger=process_1.logger)
-        process_1.set_rules([p1_r1])
-        process_1.run()
-
-        logging.basicConfig(filename=os.path.join(args.log_dir, 'JsonProcessing_7282.log'),
-                            filemode='w',
-                            datefmt='%H:%M:%S',
-                            level=logging.INFO,
-                            force=True)
-
-        logger = logging.getLogger('JsonDataManager')
-        process_2 = JsonDataManager(
-            input_file_path=args.json_file,
-            output_file_path=json_out,
-            request_id='7282',
-            logger=logger,
-        )
-        p2_r1 = AgeBandRule(fields=['age'], logger=process_2.logger)
-        p2_r2 = PostCodeTrimToThreeRule(fields=['PostCode'], logger=process_2.logger)
-        process_2.set_rules([p2_r1, p2_r2])
-        process_2.run()
-
-        logging.basicConfig(filename=os.path.join(args.log_dir, 'ExcelProcessing_92421.log'),
-                            filemode='w',
-                            datefmt='%H:%M:%S',
-                            level=logging.INFO,
-                            force=True)
-
-        logger = logging.getLogger('ExcelDataManager')
-        process_3 = ExcelDataManager(
-            input_file_path=args.excel_file,
-            output_file_path=excel_out,
-            request_id='92421',
-            logger=logger,
-        )
-        p3_r1 = PostCodeTrimToThreeRule(fields=['PostCode'], logger=process_3.logger)
-        p3_r2 = PostCodeTrimToTwoRule(fields=['PostCode'], logger=process_3.logger)
-        process_3.set_rules([p3_r1, p3_r2])
-        process_3.run()
+        args = argument_parser.parse_args(argv)
+        jobs = build_jobs(args)
+        workers = args.workers
+        log_dir = args.log_dir
+    resize_postcode_validation_cache(args.postcode_cache_size)
+    scheduler = JobScheduler(workers=workers, log_dir=log_dir)
+    for job in jobs:
+        scheduler.add_job(job)
+    statuses = scheduler.run()
+    scheduler.logger.info('Completed {} jobs: {}'.format(len(statuses), statuses))
+    return scheduler.exit_code
+
+
+def serve(args: argparse.Namespace) -> int:
+    """
+    Runs the job service until interrupted
+    :param args: The parsed serve command line arguments
+    :return: The exit code
+    """
+    resize_postcode_validation_cache(args.postcode_cache_size)
+    service = JobService(workers=args.workers, max_pending=args.max_pending,
+                         log_dir=args.log_dir, base_dir=args.base_dir)
+    try:
+        asyncio.run(service.serve(host=args.host, port=args.port, unix_socket=args.unix_socket))
+    except KeyboardInterrupt:
+        service.logger.info('Stopped serving jobs')
+    return 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
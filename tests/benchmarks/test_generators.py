@@ -0,0 +1,44 @@
+import unittest
+
+import pandas
+
+from fitfile.benchmarks import generators
+from fitfile.benchmarks.generators import (
+    customer,
+    patient_cohorts,
+    research_list,
+)
+
+
+class GeneratorsTest(unittest.TestCase):
+    def test_datasets_have_the_columns_of_the_sample_inputs(self):
+        self.assertEqual(list(customer(10).columns), [
+            'name', 'address', 'PostCode', 'region', 'MemberNumber', 'dob', 'yearscustomer'])
+        self.assertEqual(list(patient_cohorts(10).columns), [
+            'name', 'address', 'PostCode', 'region', 'nhsnumber', 'age'])
+        self.assertEqual(list(research_list(10).columns), [
+            'name', 'address', 'PostCode', 'region', 'nhsnumber', 'yearofbirth'])
+
+    def test_same_seed_generates_the_same_data(self):
+        pandas.testing.assert_frame_equal(customer(100, seed=3), customer(100, seed=3))
+        self.assertFalse(customer(100, seed=3).equals(customer(100, seed=4)))
+
+    def test_postcodes_are_long_tailed_with_some_invalid_and_missing(self):
+        postcodes = customer(20000)['PostCode']
+        counts = postcodes.value_counts()
+        self.assertGreater(counts.iloc[0], 100)
+        self.assertTrue((counts < 10).any())
+        self.assertTrue(postcodes.isin(generators.INVALID_POSTCODES).any())
+        self.assertTrue(postcodes.isna().any())
+
+    def test_dates_of_birth_are_iso_dates_before_the_reference_date(self):
+        dob = customer(20000)['dob']
+        dates = pandas.to_datetime(dob, format='ISO8601', errors='coerce')
+        self.assertTrue((dates.dropna() <= pandas.Timestamp(generators.REFERENCE_DATE)).all())
+        self.assertTrue(dob[dates.isna()].dropna().isin(generators.INVALID_DATES).all())
+        self.assertLess(dates.isna().mean(), 0.05)
+
+    def test_excel_is_limited_to_a_sheet(self):
+        with self.assertRaises(ValueError):
+            generators.write_excel(pandas.DataFrame(index=range(generators.EXCEL_MAX_ROWS + 1)),
+                                   'too_large.xlsx')
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from fitfile.benchmarks import (
+    BENCHMARKS,
+    DATASETS,
+    compare,
+    run_suite,
+)
+from fitfile.benchmarks.__main__ import main
+from fitfile.benchmarks.suite import parse_size
+from fitfile.data_managers import CsvDataManager
+
+
+class SuiteTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.output_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+        self.output_dir.cleanup()
+
+    def test_parse_size(self):
+        self.assertEqual([parse_size(size) for size in ['10k', '1M', '10m', '2500']],
+                         [10000, 1000000, 10000000, 2500])
+
+    def test_runs_every_benchmark_of_every_dataset(self):
+        results = run_suite(sorted(DATASETS), [50], BENCHMARKS, self.data_dir.name,
+                            self.output_dir.name, isolate=False, log=lambda message: None)
+        steps = {(result['dataset'], result['step']) for result in results}
+        self.assertIn(('customer', 'load CsvDataManager'), steps)
+        self.assertIn(('customer', 'load read_csv'), steps)
+        self.assertIn(('patient_cohorts', 'rule PostCodeTrimToThreeRule(PostCode)'), steps)
+        self.assertIn(('research_list', 'run ExcelDataManager'), steps)
+        self.assertTrue(all(result['rows'] == 50 for result in results))
+        self.assertTrue(all(result['rows_per_second'] > 0 for result in results
+                            if 'seconds' in result))
+        self.assertIn(('customer', 'memory CsvDataManager'), steps)
+
+    def test_run_loads_the_input_on_every_repeat(self):
+        with mock.patch.object(CsvDataManager, 'load_data', autospec=True,
+                               side_effect=CsvDataManager.load_data) as load_data:
+            results = run_suite(['customer'], [50], ['run'], self.data_dir.name,
+                                self.output_dir.name, repeat=3, isolate=False,
+                                log=lambda message: None)
+        self.assertEqual(load_data.call_count, 3)
+        self.assertEqual(results[0]['rows'], 50)
+
+    def test_rules_are_timed_on_the_output_of_the_rules_before_them(self):
+        results = run_suite(['research_list'], [1000], ['rule'], self.data_dir.name,
+                            self.output_dir.name, repeat=2, isolate=False,
+                            log=lambda message: None)
+        data_manager = DATASETS['research_list'].make_data_manager(
+            DATASETS['research_list'].path(self.data_dir.name, 1000, 0),
+            os.path.join(self.output_dir.name, 'job.json'))
+        data_manager.run()
+        self.assertEqual(sum(result['errors'] for result in results),
+                         data_manager.run_report['errors'])
+        self.assertLess(results[1]['errors'], results[1]['rows'] / 10)
+
+    def test_memory_is_measured_against_the_loaded_input(self):
+        [result] = run_suite(['patient_cohorts'], [20000], ['memory'], self.data_dir.name,
+                             self.output_dir.name, isolate=False, log=lambda message: None)
+        self.assertEqual(result['rows'], 20000)
+        self.assertGreater(result['input_bytes'], 0)
+        self.assertEqual(result['peak_growth_ratio'],
+                         round(result['peak_growth_bytes'] / result['input_bytes'], 3))
+        # Mostly the json output, the rules take about half the size of the input
+        self.assertLess(result['peak_growth_ratio'], 2)
+
+    def test_skips_sizes_the_format_can_not_hold(self):
+        messages = []
+        results = run_suite(['research_list'], [2 ** 21], ['load'], self.data_dir.name,
+                            self.output_dir.name, isolate=False, log=messages.append)
+        self.assertEqual(results, [])
+        self.assertIn('Skipping', messages[0])
+
+    def test_compare_flags_regressions_past_the_threshold(self):
+        baseline = [
+            {'dataset': 'customer', 'size': 10, 'step': 'load', 'rows_per_second': 100,
+             'peak_rss_bytes': 100},
+            {'dataset': 'customer', 'size': 10, 'step': 'run', 'rows_per_second': 100,
+             'peak_rss_bytes': 100},
+        ]
+        results = [
+            dict(baseline[0], rows_per_second=90, peak_rss_bytes=150),
+            dict(baseline[1], size=20),
+        ]
+        changes, regressions = compare(results, baseline, 0.2)
+        self.assertEqual(changes, [{'dataset': 'customer', 'size': 10, 'step': 'load',
+                                    'rows_per_second': 0.9, 'peak_rss_bytes': 1.5}])
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('peak_rss_bytes', regressions[0])
+
+    def test_main_runs_isolated_benchmarks(self):
+        exit_code = main(['--sizes', '20', '--datasets', 'customer', '--benchmarks', 'load',
+                          '--repeat', '1', '--data-dir', self.data_dir.name])
+        self.assertEqual(exit_code, 0)
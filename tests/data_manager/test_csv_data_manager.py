@@ -1,7 +1,20 @@
 import os
+import tempfile
+import tracemalloc
 import unittest
+from unittest.mock import patch
+import numpy
+import pandas
 from .test_abstract_data_manager import DataManagerTester
+from fitfile.benchmarks import generators
 from fitfile.data_managers import CsvDataManager
+from fitfile.data_sinks.exceptions import DataSinkException
+from fitfile.data_rules import (
+    AgeBandRule,
+    PostCodeTrimToThreeRule,
+    PostCodeTrimToTwoRule,
+)
+from fitfile.data_rules.age_band_rule import AGE_BAND_LABELS
 
 
 class CsvDataManagerTester(DataManagerTester, unittest.TestCase):
@@ -12,3 +25,184 @@ class CsvDataManagerTester(DataManagerTester, unittest.TestCase):
             output_file_path='test.json',
             request_id='TESTID123'
         )
+
+
+class CsvDataManagerRunTester(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.data_manager = CsvDataManager(input_file_path=os.path.join(os.path.dirname(
+            __file__
+        ), '../../20230320_FITFILEPythonTest/customer.csv'),
+            output_file_path=os.path.join(self.output_dir.name, 'test.json'),
+            request_id='TESTID123'
+        )
+        self.data_manager.set_rules([AgeBandRule(fields=['dob'])])
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def test_run_keeps_input_when_asked(self):
+        original_dob = list(self.data_manager.dataframe['dob'])
+        self.data_manager.run(keep_input=True)
+        self.assertEqual(list(self.data_manager.dataframe['dob']), original_dob)
+        self.assertTrue(os.path.exists(self.data_manager.output_file_path))
+
+    def test_run_replaces_dataframe_without_copying_untouched_columns(self):
+        name = self.data_manager.dataframe['name'].values
+        original_dob = list(self.data_manager.dataframe['dob'])
+        self.data_manager.run()
+        self.assertNotEqual(list(self.data_manager.dataframe['dob']), original_dob)
+        self.assertTrue(numpy.shares_memory(self.data_manager.dataframe['name'].values, name))
+
+    def test_run_writes_through_a_sink_when_given_an_output_format(self):
+        self.data_manager.output_format = 'ndjson'
+        self.data_manager.output_file_path += '.gz'
+        self.data_manager.run(keep_input=True)
+        results = pandas.read_json(self.data_manager.output_file_path, lines=True)
+        self.assertEqual(len(results), len(self.data_manager.dataframe))
+
+    def test_run_takes_less_memory_than_its_input(self):
+        self.data_manager.input_file_path = os.path.join(self.output_dir.name, 'customer.csv')
+        generators.customer(20000, 0).to_csv(self.data_manager.input_file_path, index=False)
+        self.data_manager.output_format = 'csv'
+        self.data_manager.set_rules([AgeBandRule(fields=['dob']),
+                                     PostCodeTrimToThreeRule(fields=['PostCode'])])
+        input_bytes = self.data_manager.dataframe.memory_usage(deep=True).sum()
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            self.data_manager.run()
+            peak_growth = tracemalloc.get_traced_memory()[1] - start
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak_growth, input_bytes)
+
+    def test_fails_on_unknown_output_formats(self):
+        with self.assertRaises(DataSinkException):
+            CsvDataManager(input_file_path='in.csv', output_file_path='out.xml',
+                           request_id='TESTID123', output_format='xml')
+
+
+class CsvDataManagerStreamingTester(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.input_file_path = os.path.join(self.output_dir.name, 'postcodes.csv')
+        postcodes = ['OX1 5XJ'] * 12 + ['NY1 3TY'] * 4 + ['SW1A 1AA'] * 9 + ['WRONG', None]
+        pandas.DataFrame({
+            'PostCode': postcodes,
+            'dob': ['1950-01-01'] * len(postcodes),
+        }).sample(frac=1, random_state=3).to_csv(self.input_file_path, index=False)
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def run_job(self, chunksize, output_name):
+        data_manager = CsvDataManager(
+            input_file_path=self.input_file_path,
+            output_file_path=os.path.join(self.output_dir.name, output_name),
+            request_id='TESTID123',
+            chunksize=chunksize,
+        )
+        data_manager.set_rules([
+            AgeBandRule(fields=['dob'], logger=data_manager.logger),
+            PostCodeTrimToThreeRule(fields=['PostCode'], logger=data_manager.logger),
+            PostCodeTrimToTwoRule(fields=['PostCode'], logger=data_manager.logger),
+        ])
+        data_manager.run()
+        return data_manager
+
+    def test_streaming_matches_in_memory_run(self):
+        in_memory = self.run_job(None, 'in_memory.json')
+        streamed = self.run_job(5, 'streamed.json')
+        expected = pandas.read_json(in_memory.output_file_path)
+        results = pandas.read_json(streamed.output_file_path, lines=True)
+        self.assertTrue(results.equals(expected))
+        self.assertEqual(streamed.error, in_memory.error)
+
+    def test_global_counts_are_accumulated_across_chunks(self):
+        streamed = self.run_job(5, 'streamed.json')
+        results = pandas.read_json(streamed.output_file_path, lines=True)
+        self.assertEqual(set(results['PostCode'].dropna()), {'OX1', 'NY', 'SW', 'WRONG', 'na'})
+
+    def test_validation_errors_are_only_reported_once(self):
+        with patch.object(PostCodeTrimToThreeRule, 'on_validation_error') as mock_on_error:
+            self.run_job(100, 'streamed.json')
+        # The accumulation pass does not report them again
+        mock_on_error.assert_called_once()
+
+
+class CsvDataManagerProjectionTester(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.data_manager = CsvDataManager(input_file_path=os.path.join(os.path.dirname(
+            __file__
+        ), '../../20230320_FITFILEPythonTest/customer.csv'),
+            output_file_path=os.path.join(self.output_dir.name, 'test.json'),
+            request_id='TESTID123',
+            output_columns=['name', 'dob'],
+        )
+        self.data_manager.set_rules([
+            AgeBandRule(fields=['dob']),
+            PostCodeTrimToThreeRule(fields=['PostCode']),
+        ])
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def test_columns_are_the_output_columns_and_the_rule_fields(self):
+        self.assertEqual(self.data_manager.columns, ['name', 'dob', 'PostCode'])
+
+    def test_only_loads_the_columns_the_job_uses(self):
+        self.assertEqual(list(self.data_manager.dataframe.columns), ['name', 'PostCode', 'dob'])
+
+    def test_only_saves_the_output_columns(self):
+        self.data_manager.run()
+        results = pandas.read_json(self.data_manager.output_file_path)
+        self.assertEqual(list(results.columns), ['name', 'dob'])
+
+    def test_streaming_only_saves_the_output_columns(self):
+        self.data_manager.chunksize = 100
+        self.data_manager.run()
+        results = pandas.read_json(self.data_manager.output_file_path, lines=True)
+        self.assertEqual(list(results.columns), ['name', 'dob'])
+
+
+class CsvDataManagerSchemaTester(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.data_manager = CsvDataManager(input_file_path=os.path.join(os.path.dirname(
+            __file__
+        ), '../../20230320_FITFILEPythonTest/customer.csv'),
+            output_file_path=os.path.join(self.output_dir.name, 'test.json'),
+            request_id='TESTID123',
+            dtype={'PostCode': 'category', 'yearscustomer': 'int32'},
+            parse_dates=['dob'],
+        )
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def test_load_data_applies_the_schema(self):
+        dataframe = self.data_manager.load_data()
+        self.assertIsInstance(dataframe['PostCode'].dtype, pandas.CategoricalDtype)
+        self.assertEqual(dataframe['yearscustomer'].dtype, 'int32')
+        self.assertTrue(pandas.api.types.is_datetime64_any_dtype(dataframe['dob']))
+        # Dates that do not parse are missing
+        self.assertTrue(dataframe['dob'].isna().any())
+
+    def test_load_chunks_applies_the_schema(self):
+        self.data_manager.chunksize = 100
+        for chunk in self.data_manager.load_chunks():
+            self.assertIsInstance(chunk['PostCode'].dtype, pandas.CategoricalDtype)
+            self.assertTrue(pandas.api.types.is_datetime64_any_dtype(chunk['dob']))
+
+    def test_typed_columns_are_banded_as_strings_are(self):
+        self.data_manager.set_rules([AgeBandRule(fields=['dob'])])
+        self.data_manager.run()
+        typed = pandas.read_json(self.data_manager.output_file_path)
+        self.data_manager.dtype = self.data_manager.parse_dates = None
+        self.data_manager.run()
+        untyped = pandas.read_json(self.data_manager.output_file_path)
+        valid = typed['dob'].isin(AGE_BAND_LABELS)
+        self.assertTrue(valid.any())
+        self.assertEqual(list(typed['dob'][valid]), list(untyped['dob'][valid]))
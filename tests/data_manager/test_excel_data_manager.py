@@ -1,7 +1,11 @@
+import datetime
 import os
+import tempfile
 import unittest
+import pandas
 from .test_abstract_data_manager import DataManagerTester
 from fitfile.data_managers import ExcelDataManager
+from fitfile.data_rules import PostCodeTrimToThreeRule
 
 
 class ExcelDataManagerTester(DataManagerTester, unittest.TestCase):
@@ -12,3 +16,78 @@ class ExcelDataManagerTester(DataManagerTester, unittest.TestCase):
             output_file_path='test.json',
             request_id='TESTID123'
         )
+
+
+class ExcelDataManagerReaderTester(unittest.TestCase):
+    def setUp(self):
+        self.input_file_path = os.path.join(os.path.dirname(
+            __file__
+        ), '../../20230320_FITFILEPythonTest/ResearchList.xlsx')
+        self.data_manager = ExcelDataManager(input_file_path=self.input_file_path,
+                                             output_file_path='test.json',
+                                             request_id='TESTID123')
+
+    def test_load_data_matches_pandas(self):
+        pandas.testing.assert_frame_equal(self.data_manager.load_data(),
+                                          pandas.read_excel(self.input_file_path))
+
+    def test_load_data_only_reads_usecols(self):
+        self.data_manager.usecols = ['yearofbirth', 'PostCode']
+        self.assertEqual(list(self.data_manager.load_data().columns), ['PostCode', 'yearofbirth'])
+
+    def test_load_data_applies_dtype_hints(self):
+        self.data_manager.dtype = {'yearofbirth': 'int32', 'region': 'category'}
+        self.data_manager.chunksize = 128
+        for dataframe in [self.data_manager.load_data()] + list(self.data_manager.load_chunks()):
+            self.assertEqual(dataframe['yearofbirth'].dtype, 'int32')
+            self.assertEqual(dataframe['region'].dtype, 'category')
+
+    def test_load_data_parses_dates(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_file_path = os.path.join(temp_dir, 'dates.xlsx')
+            pandas.DataFrame({'dob': ['2000-01-01', 'not a date', datetime.datetime(1990, 5, 5)]}
+                             ).to_excel(input_file_path, index=False)
+            data_manager = ExcelDataManager(input_file_path=input_file_path,
+                                            output_file_path='test.json', request_id='TESTID123',
+                                            parse_dates=['dob'], chunksize=2)
+            for dataframe in [data_manager.load_data()] + list(data_manager.load_chunks()):
+                self.assertTrue(pandas.api.types.is_datetime64_any_dtype(dataframe['dob']))
+            self.assertEqual(list(data_manager.load_data()['dob'].isna()), [False, True, False])
+
+    def test_load_data_only_reads_the_columns_the_job_uses(self):
+        self.data_manager.output_columns = ['name']
+        self.data_manager.set_rules([PostCodeTrimToThreeRule(fields=['PostCode'])])
+        self.assertEqual(list(self.data_manager.load_data().columns), ['name', 'PostCode'])
+
+    def test_fails_on_unknown_usecols(self):
+        self.data_manager.usecols = ['PostCode', 'dob']
+        with self.assertRaises(ValueError):
+            self.data_manager.load_data()
+
+    def test_load_chunks_streams_row_batches(self):
+        self.data_manager.chunksize = 128
+        chunks = list(self.data_manager.load_chunks())
+        self.assertEqual([len(chunk) for chunk in chunks], [128, 128, 128, 116])
+        pandas.testing.assert_frame_equal(pandas.concat(chunks), self.data_manager.load_data())
+
+
+class ExcelDataManagerSheetTester(unittest.TestCase):
+    def setUp(self):
+        self.input_dir = tempfile.TemporaryDirectory()
+        self.input_file_path = os.path.join(self.input_dir.name, 'sheets.xlsx')
+        with pandas.ExcelWriter(self.input_file_path) as writer:
+            pandas.DataFrame({'a': [1, 2]}).to_excel(writer, sheet_name='first', index=False)
+            pandas.DataFrame({'PostCode': ['OX1 5XJ', None, 'NY1 3TY', None]}).to_excel(
+                writer, sheet_name='second', index=False)
+
+    def tearDown(self):
+        self.input_dir.cleanup()
+
+    def test_reads_the_given_sheet(self):
+        for sheet_name in ['second', 1]:
+            data_manager = ExcelDataManager(input_file_path=self.input_file_path,
+                                            output_file_path='test.json',
+                                            request_id='TESTID123', sheet_name=sheet_name)
+            dataframe = data_manager.load_data()
+            pandas.testing.assert_frame_equal(dataframe, pandas.read_excel(
+                self.input_file_path, sheet_name=sheet_name))
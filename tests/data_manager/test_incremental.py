@@ -0,0 +1,144 @@
+import datetime
+import os
+import tempfile
+import unittest
+import pandas
+from fitfile.benchmarks import generators
+from fitfile.data_managers import CsvDataManager
+from fitfile.data_rules import (
+    AgeBandRule,
+    PostCodeTrimToThreeRule,
+    PostCodeTrimToTwoRule,
+)
+
+
+class IncrementalRunTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.input_file_path = os.path.join(self.output_dir.name, 'PatientCohorts.csv')
+        self.data = generators.patient_cohorts(2000, 0)
+        self.write_input(self.data)
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def write_input(self, dataframe):
+        dataframe.to_csv(self.input_file_path, index=False)
+
+    def run_job(self, incremental=True, output='incremental.ndjson', global_rules=True,
+                **kwargs):
+        data_manager = CsvDataManager(
+            input_file_path=self.input_file_path,
+            output_file_path=os.path.join(self.output_dir.name, output),
+            request_id='TESTID123', incremental=incremental, write_report=False,
+            output_format=kwargs.pop('output_format', 'ndjson'), **kwargs)
+        rules = [
+            AgeBandRule(fields=['age'], reference_date=datetime.datetime(2024, 1, 1)),
+            PostCodeTrimToThreeRule(fields=['PostCode']),
+        ]
+        if global_rules:
+            rules.append(PostCodeTrimToTwoRule(fields=['PostCode']))
+        data_manager.set_rules(rules)
+        data_manager.run()
+        return data_manager
+
+    def read_output(self, output):
+        output_file_path = os.path.join(self.output_dir.name, output)
+        if output.endswith('.csv'):
+            return pandas.read_csv(output_file_path, dtype=str)
+        return pandas.read_json(output_file_path, lines=True, dtype=False)
+
+    def assert_same_as_full_run(self, extension='.ndjson', **kwargs):
+        incremental = self.run_job(output='incremental' + extension, **kwargs)
+        self.run_job(incremental=False, output='full' + extension, **kwargs)
+        pandas.testing.assert_frame_equal(self.read_output('incremental' + extension),
+                                          self.read_output('full' + extension))
+        return incremental.run_report['incremental']
+
+    def postcode_groups(self, dataframe):
+        return dataframe['PostCode'].str.upper().str.replace(' ', '').str[:3]
+
+    def test_first_run_processes_every_row(self):
+        stats = self.assert_same_as_full_run()
+        self.assertEqual(stats, {'rows_reused': 0, 'rows_processed': 2000,
+                                 'rows_appended': None})
+        self.assertTrue(os.path.exists(self.run_job().state_path))
+
+    def test_unchanged_input_reuses_every_row(self):
+        self.run_job()
+        self.assertEqual(self.assert_same_as_full_run(),
+                         {'rows_reused': 2000, 'rows_processed': 0, 'rows_appended': 0})
+
+    def test_appended_rows_are_processed(self):
+        self.run_job()
+        self.write_input(pandas.concat([self.data, generators.patient_cohorts(100, 1)]))
+        stats = self.assert_same_as_full_run()
+        self.assertGreaterEqual(stats['rows_processed'], 100)
+        self.assertLess(stats['rows_processed'], 2100)
+
+    def test_changed_and_removed_rows(self):
+        self.run_job()
+        changed = self.data.copy()
+        changed.loc[10, 'age'] = 200
+        self.write_input(changed.drop(index=[5, 6]))
+        stats = self.assert_same_as_full_run()
+        self.assertEqual(stats['rows_reused'], 1997)
+        self.assertIsNone(stats['rows_appended'])
+
+    def test_appends_rows_appended_to_the_input(self):
+        self.run_job(global_rules=False, output_format='csv', output='incremental.csv')
+        self.write_input(pandas.concat([self.data, generators.patient_cohorts(100, 1)]))
+        stats = self.assert_same_as_full_run(global_rules=False, output_format='csv',
+                                             extension='.csv')
+        self.assertEqual(stats['rows_appended'], 100)
+
+    def test_rewrites_the_output_when_it_changed(self):
+        self.run_job(global_rules=False)
+        with open(os.path.join(self.output_dir.name, 'incremental.ndjson'), 'a') as output:
+            output.write('{}\n')
+        self.write_input(pandas.concat([self.data, generators.patient_cohorts(100, 1)]))
+        self.assertIsNone(self.assert_same_as_full_run(global_rules=False)['rows_appended'])
+
+    def test_reprocesses_postcodes_reaching_ten_entries(self):
+        self.run_job()
+        groups = self.postcode_groups(self.data)
+        counts = groups.value_counts()
+        group = counts[counts == 9].index[0]
+        self.write_input(pandas.concat([self.data, self.data[groups == group].iloc[:1]]))
+        stats = self.assert_same_as_full_run()
+        self.assertEqual(stats['rows_processed'], 10)
+
+    def test_reprocesses_rows_changed_into_copies_of_other_rows(self):
+        self.data = pandas.DataFrame({
+            'age': [40] * 19,
+            'PostCode': ['AB1 1AA'] * 10 + ['CD2 1AA'] * 9,
+        })
+        self.write_input(self.data)
+        self.run_job()
+        changed = self.data.copy()
+        changed.loc[0, 'PostCode'] = 'CD2 1AA'
+        self.write_input(changed)
+        self.assert_same_as_full_run()
+        output = self.read_output('incremental.ndjson')
+        self.assertEqual(sorted(output['PostCode'].unique()), ['AB', 'CD2'])
+
+    def test_changed_rules_process_every_row(self):
+        self.run_job()
+        self.assertEqual(self.assert_same_as_full_run(quarantine=True)['rows_reused'], 0)
+        self.assertEqual(self.assert_same_as_full_run(quarantine=True)['rows_reused'], 2000)
+
+    def test_rejects_only_cover_processed_rows(self):
+        self.run_job()
+        changed = self.data.copy()
+        changed.loc[10, 'age'] = -1
+        self.write_input(changed)
+        data_manager = self.run_job()
+        self.assertEqual(data_manager.validation_error_counts, {'AgeDatumException': 1})
+
+    def test_fails_when_streaming(self):
+        with self.assertRaises(ValueError):
+            self.run_job(chunksize=100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas
+from fitfile.data_managers import (
+    CsvDataManager,
+    ExcelDataManager,
+    JsonDataManager,
+)
+from fitfile.data_managers.input_cache import InputCache
+from fitfile.data_rules import AgeBandRule
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../../20230320_FITFILEPythonTest')
+
+
+class InputCacheTester(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = InputCache(os.path.join(self.temp_dir.name, 'cache'))
+        self.input_file_path = os.path.join(self.temp_dir.name, 'customer.csv')
+        shutil.copy(os.path.join(DATA_DIR, 'customer.csv'), self.input_file_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_data_manager(self, data_manager=CsvDataManager, input_file_path=None, **kwargs):
+        return data_manager(input_file_path=input_file_path or self.input_file_path,
+                            output_file_path=os.path.join(self.temp_dir.name, 'out.json'),
+                            request_id='TESTID123', input_cache=self.cache, **kwargs)
+
+    def test_second_load_is_a_hit_equal_to_load_data(self):
+        first = self.make_data_manager()
+        first.dataframe
+        second = self.make_data_manager()
+        cached = second.dataframe
+        self.assertEqual((first.input_cache_status, second.input_cache_status), ('miss', 'hit'))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        pandas.testing.assert_frame_equal(cached, second.load_data())
+
+    def test_cached_json_keeps_missing_values(self):
+        input_file_path = os.path.join(DATA_DIR, 'PatientCohorts.json')
+        self.make_data_manager(JsonDataManager, input_file_path).dataframe
+        data_manager = self.make_data_manager(JsonDataManager, input_file_path)
+        pandas.testing.assert_frame_equal(data_manager.dataframe, data_manager.load_data())
+        self.assertEqual(data_manager.input_cache_status, 'hit')
+
+    def test_cached_excel_equals_load_data(self):
+        input_file_path = os.path.join(DATA_DIR, 'ResearchList.xlsx')
+        self.make_data_manager(ExcelDataManager, input_file_path).dataframe
+        data_manager = self.make_data_manager(ExcelDataManager, input_file_path)
+        pandas.testing.assert_frame_equal(data_manager.dataframe, data_manager.load_data())
+        self.assertEqual(data_manager.input_cache_status, 'hit')
+
+    def test_changed_input_is_a_miss(self):
+        self.make_data_manager().dataframe
+        with open(self.input_file_path, 'a') as input_file:
+            input_file.write('99999,Someone,1990-01-01\n')
+        data_manager = self.make_data_manager()
+        data_manager.dataframe
+        self.assertEqual(data_manager.input_cache_status, 'miss')
+
+    def test_changed_load_options_are_a_miss(self):
+        self.make_data_manager().dataframe
+        data_manager = self.make_data_manager(output_columns=['dob'])
+        self.assertEqual(list(data_manager.dataframe.columns), ['dob'])
+        self.assertEqual(data_manager.input_cache_status, 'miss')
+
+    def test_evicts_least_recently_used(self):
+        self.make_data_manager().dataframe
+        self.make_data_manager(output_columns=['dob']).dataframe
+        self.assertEqual(len(self.cache._entries()), 2)
+        # Reading the first entry makes the second the least recently used
+        os.utime(self.cache._entries()[0].path, ns=(0, 0))
+        self.make_data_manager().dataframe
+        self.cache.max_bytes = self.cache.currsize - 1
+        self.cache.evict()
+        self.assertEqual(self.cache.evictions, 1)
+        data_manager = self.make_data_manager()
+        data_manager.dataframe
+        self.assertEqual(data_manager.input_cache_status, 'hit')
+        data_manager = self.make_data_manager(output_columns=['dob'])
+        data_manager.dataframe
+        self.assertEqual(data_manager.input_cache_status, 'miss')
+
+    def test_mixed_columns_are_not_cached(self):
+        key = self.cache.key(self.input_file_path, {})
+        self.assertFalse(self.cache.put(key, pandas.DataFrame({'a': [1, 'b']})))
+        self.assertIsNone(self.cache.get(key))
+
+    def test_run_report_has_cache_status(self):
+        for _ in range(2):
+            data_manager = self.make_data_manager(write_report=False)
+            data_manager.set_rules([AgeBandRule(fields=['dob'])])
+            data_manager.run()
+        self.assertEqual(data_manager.run_report['input_cache'], 'hit')
+
+
+if __name__ == '__main__':
+    unittest.main()
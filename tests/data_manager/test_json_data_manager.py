@@ -1,7 +1,16 @@
+import io
+import json
 import os
+import tempfile
 import unittest
+import pandas
 from .test_abstract_data_manager import DataManagerTester
 from fitfile.data_managers import JsonDataManager
+from fitfile.data_managers.json_data_manager import iter_array
+from fitfile.data_rules import (
+    AgeBandRule,
+    PostCodeTrimToThreeRule,
+)
 
 
 class JsonDataManagerTester(DataManagerTester, unittest.TestCase):
@@ -12,3 +21,148 @@ class JsonDataManagerTester(DataManagerTester, unittest.TestCase):
             output_file_path='test.json',
             request_id='TESTID123'
         )
+
+
+class JsonDataManagerProjectionTester(unittest.TestCase):
+    def setUp(self):
+        self.input_file_path = os.path.join(os.path.dirname(
+            __file__
+        ), '../../20230320_FITFILEPythonTest/PatientCohorts.json')
+        self.data_manager = JsonDataManager(input_file_path=self.input_file_path,
+                                            output_file_path='test.json',
+                                            request_id='TESTID123',
+                                            output_columns=['name', 'age'])
+        self.data_manager.set_rules([PostCodeTrimToThreeRule(fields=['PostCode'])])
+
+    def test_only_loads_the_columns_the_job_uses(self):
+        expected = pandas.read_json(self.input_file_path)[['name', 'age', 'PostCode']]
+        pandas.testing.assert_frame_equal(self.data_manager.load_data(), expected)
+
+    def test_missing_keys_are_null(self):
+        with tempfile.TemporaryDirectory() as input_dir:
+            self.data_manager.input_file_path = os.path.join(input_dir, 'records.json')
+            with open(self.data_manager.input_file_path, 'w') as input_file:
+                input_file.write('[{"name": "a", "age": 3, "PostCode": null},\n'
+                                 ' {"name": "b", "other": {"age": 1}}]')
+            dataframe = self.data_manager.load_data()
+        self.assertEqual(list(dataframe['name']), ['a', 'b'])
+        self.assertTrue(dataframe['PostCode'].isna().all())
+        self.assertEqual(dataframe['age'].isna().tolist(), [False, True])
+
+    def test_fails_on_columns_in_no_record(self):
+        self.data_manager.output_columns = ['name', 'agee']
+        with self.assertRaisesRegex(ValueError, 'agee'):
+            self.data_manager.load_data()
+        self.data_manager.chunksize = 128
+        with self.assertRaisesRegex(ValueError, 'agee'):
+            next(self.data_manager.load_chunks())
+
+    def test_empty_arrays_have_the_columns(self):
+        with tempfile.TemporaryDirectory() as input_dir:
+            self.data_manager.input_file_path = os.path.join(input_dir, 'records.json')
+            with open(self.data_manager.input_file_path, 'w') as input_file:
+                input_file.write(' [ ] ')
+            dataframe = self.data_manager.load_data()
+        self.assertEqual(list(dataframe.columns), ['name', 'age', 'PostCode'])
+        self.assertEqual(len(dataframe), 0)
+
+
+class JsonDataManagerStreamingTester(unittest.TestCase):
+    def setUp(self):
+        self.input_dir = tempfile.TemporaryDirectory()
+        self.input_file_path = os.path.join(os.path.dirname(
+            __file__
+        ), '../../20230320_FITFILEPythonTest/PatientCohorts.json')
+        self.expected = pandas.read_json(self.input_file_path)
+
+    def tearDown(self):
+        self.input_dir.cleanup()
+
+    def make_data_manager(self, input_file_path, **kwargs):
+        return JsonDataManager(input_file_path=input_file_path,
+                               output_file_path=os.path.join(self.input_dir.name, 'out.ndjson'),
+                               request_id='TESTID123', chunksize=128, **kwargs)
+
+    def test_load_chunks_streams_array_records(self):
+        chunks = list(self.make_data_manager(self.input_file_path).load_chunks())
+        self.assertEqual([len(chunk) for chunk in chunks[:-1]], [128] * (len(chunks) - 1))
+        pandas.testing.assert_frame_equal(pandas.concat(chunks), self.expected)
+
+    def test_load_chunks_streams_newline_delimited_records(self):
+        input_file_path = os.path.join(self.input_dir.name, 'PatientCohorts.ndjson')
+        self.expected.to_json(input_file_path, orient='records', lines=True)
+        data_manager = self.make_data_manager(input_file_path)
+        self.assertTrue(data_manager.lines)
+        pandas.testing.assert_frame_equal(pandas.concat(data_manager.load_chunks()),
+                                          self.expected)
+        pandas.testing.assert_frame_equal(data_manager.load_data(), self.expected)
+
+    def test_load_chunks_keeps_only_the_columns_the_job_uses(self):
+        data_manager = self.make_data_manager(self.input_file_path, output_columns=['age'])
+        data_manager.set_rules([PostCodeTrimToThreeRule(fields=['PostCode'])])
+        pandas.testing.assert_frame_equal(pandas.concat(data_manager.load_chunks()),
+                                          self.expected[['age', 'PostCode']])
+
+    def test_load_chunks_applies_the_schema(self):
+        data_manager = self.make_data_manager(self.input_file_path,
+                                              dtype={'PostCode': 'category', 'age': 'float32'})
+        for dataframe in [data_manager.load_data()] + list(data_manager.load_chunks()):
+            self.assertIsInstance(dataframe['PostCode'].dtype, pandas.CategoricalDtype)
+            self.assertEqual(dataframe['age'].dtype, 'float32')
+
+    def write_records(self, name):
+        records = [{'id': '{:03d}'.format(index), 'date': '2023-03-{:02d}'.format(index % 28 + 1),
+                    'age': index if index % 7 else None, 'score': index / 3}
+                   for index in range(300)]
+        input_file_path = os.path.join(self.input_dir.name, name)
+        with open(input_file_path, 'w') as input_file:
+            if name.endswith('.ndjson'):
+                input_file.writelines(json.dumps(record) + '\n' for record in records)
+            else:
+                json.dump(records, input_file)
+        return input_file_path
+
+    def test_chunks_do_not_change_the_values(self):
+        for name in ['records.json', 'records.ndjson']:
+            data_manager = self.make_data_manager(self.write_records(name))
+            dataframe = data_manager.load_data()
+            self.assertEqual(dataframe['id'][7], '007')
+            self.assertEqual(dataframe['date'][0], '2023-03-01')
+            pandas.testing.assert_frame_equal(pandas.concat(data_manager.load_chunks()),
+                                              dataframe)
+
+    def test_projection_does_not_change_the_columns_it_keeps(self):
+        for name in ['records.json', 'records.ndjson']:
+            data_manager = self.make_data_manager(self.write_records(name))
+            dataframe = data_manager.load_data()
+            data_manager.output_columns = ['id', 'date']
+            data_manager.set_rules([AgeBandRule(fields=['age'])])
+            pandas.testing.assert_frame_equal(data_manager.load_data(),
+                                              dataframe[['id', 'date', 'age']])
+            pandas.testing.assert_frame_equal(pandas.concat(data_manager.load_chunks()),
+                                              dataframe[['id', 'date', 'age']])
+
+    def test_streaming_run_matches_in_memory_run(self):
+        data_manager = self.make_data_manager(self.input_file_path)
+        data_manager.set_rules([AgeBandRule(fields=['age']),
+                                PostCodeTrimToThreeRule(fields=['PostCode'])])
+        data_manager.run()
+        streamed = pandas.read_json(data_manager.output_file_path, lines=True)
+        data_manager.chunksize = None
+        data_manager.output_format = 'ndjson'
+        data_manager.run()
+        self.assertTrue(streamed.equals(
+            pandas.read_json(data_manager.output_file_path, lines=True)))
+
+
+class IterArrayTester(unittest.TestCase):
+    def test_decodes_records_across_reads(self):
+        records = [{'a': index, 'b': {'c': [1, '}]', {'d': None}]}} for index in range(50)]
+        text = json.dumps(records, indent=2)
+        for read_size in [1, 7, 4096]:
+            self.assertEqual(list(iter_array(io.StringIO(text), read_size)), records)
+
+    def test_fails_on_invalid_arrays(self):
+        for text in ['{"a": 1}', '[{"a": 1} {}]', '[{"a": 1},', '[1]']:
+            with self.assertRaises(ValueError):
+                list(iter_array(io.StringIO(text), 2))
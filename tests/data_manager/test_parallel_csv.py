@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+import pandas
+from fitfile.data_managers import CsvDataManager
+from fitfile.data_managers.parallel_csv import (
+    read_csv_arrow,
+    read_csv_parallel,
+    split_csv,
+)
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+CUSTOMER_CSV = os.path.join(os.path.dirname(__file__),
+                            '../../20230320_FITFILEPythonTest/customer.csv')
+
+
+class SplitCsvTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_file_path = os.path.join(self.temp_dir.name, 'addresses.csv')
+        pandas.DataFrame({
+            'name': ['Name {}'.format(index) for index in range(200)],
+            'address': ['{} Some "Quoted" Street\nSome Town,\n\nAA{} 1AA'.format(index, index)
+                        for index in range(200)],
+            'yearscustomer': range(200),
+        }).to_csv(self.input_file_path, index=False)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_ranges_never_split_quoted_newlines(self):
+        header_size, ranges = split_csv(self.input_file_path, 16, min_range_size=64)
+        self.assertEqual(len(ranges), 16)
+        with open(self.input_file_path, 'rb') as input_file:
+            data = input_file.read()
+        self.assertEqual(data[:header_size], b'name,address,yearscustomer\n')
+        self.assertEqual((ranges[0][0], ranges[-1][1]), (header_size, len(data)))
+        for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[end - 1:end], b'\n')
+            self.assertEqual(data[:end].count(b'"') % 2, 0)
+
+    def test_parallel_read_equals_read_csv(self):
+        dataframe = read_csv_parallel(self.input_file_path, workers=4, min_range_size=64)
+        pandas.testing.assert_frame_equal(dataframe, pandas.read_csv(self.input_file_path))
+
+    def test_parallel_read_passes_read_options(self):
+        read_options = {'usecols': ['address', 'yearscustomer'], 'dtype': {'yearscustomer': str}}
+        dataframe = read_csv_parallel(self.input_file_path, workers=2, min_range_size=64,
+                                      read_options=read_options)
+        pandas.testing.assert_frame_equal(
+            dataframe, pandas.read_csv(self.input_file_path, **read_options))
+
+    def test_empty_file_has_no_ranges(self):
+        open(self.input_file_path, 'w').close()
+        self.assertEqual(split_csv(self.input_file_path, 4), (0, []))
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class ReadCsvArrowTest(unittest.TestCase):
+    def test_equals_read_csv(self):
+        pandas.testing.assert_frame_equal(read_csv_arrow(CUSTOMER_CSV),
+                                          pandas.read_csv(CUSTOMER_CSV))
+
+    def test_reads_columns_in_file_order(self):
+        dataframe = read_csv_arrow(CUSTOMER_CSV, ['dob', 'name'], ['dob'])
+        pandas.testing.assert_frame_equal(dataframe,
+                                          pandas.read_csv(CUSTOMER_CSV, usecols=['dob', 'name']))
+
+    def test_fails_on_missing_columns(self):
+        with self.assertRaises(ValueError):
+            read_csv_arrow(CUSTOMER_CSV, ['nope'])
+
+
+class CsvDataManagerEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_data_manager(self, engine, input_file_path=CUSTOMER_CSV, **kwargs):
+        return CsvDataManager(input_file_path=input_file_path,
+                              output_file_path=os.path.join(self.temp_dir.name, 'out.json'),
+                              request_id='TESTID123', engine=engine, **kwargs)
+
+    def assert_same_as_c_engine(self, engine, **kwargs):
+        pandas.testing.assert_frame_equal(self.make_data_manager(engine, **kwargs).load_data(),
+                                          self.make_data_manager('c', **kwargs).load_data())
+
+    def test_parallel_engine_equals_c_engine(self):
+        self.assert_same_as_c_engine('parallel', parse_workers=2)
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_pyarrow_engine_equals_c_engine(self):
+        self.assert_same_as_c_engine('pyarrow')
+        self.assert_same_as_c_engine('pyarrow', output_columns=['dob'],
+                                     dtype={'PostCode': 'category', 'MemberNumber': 'string'},
+                                     parse_dates=['dob'])
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_pyarrow_engine_falls_back_on_types_changing_after_the_first_block(self):
+        input_file_path = os.path.join(self.temp_dir.name, 'mixed.csv')
+        # Past the first block arrow infers the types from
+        dataframe = pandas.DataFrame({'value': list(range(300000)) + ['text']})
+        dataframe.to_csv(input_file_path, index=False)
+        data_manager = self.make_data_manager('pyarrow', input_file_path)
+        with self.assertLogs(data_manager.logger, 'WARNING'):
+            dataframe = data_manager.load_data()
+        self.assertEqual(dataframe['value'].iloc[-1], 'text')
+
+    def test_engine_is_a_load_option(self):
+        self.assertEqual(self.make_data_manager('parallel').load_options()['engine'], 'parallel')
+
+    def test_fails_on_unknown_engines(self):
+        with self.assertRaises(ValueError):
+            self.make_data_manager('python')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,245 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas
+
+from fitfile.data_managers import CsvDataManager
+from fitfile.data_managers.run_report import RunProfiler
+from fitfile.data_rules import (
+    AgeBandRule,
+    PostCodeTrimToThreeRule,
+    PostCodeTrimToTwoRule,
+)
+
+
+class RunProfilerTest(unittest.TestCase):
+    def test_stages_add_up_over_calls(self):
+        profiler = RunProfiler()
+        for rows in [3, 4]:
+            with profiler.stage('load', rows_in=rows) as stats:
+                stats.rows_out += rows
+        stats = profiler.stages['load']
+        self.assertEqual((stats.calls, stats.rows_in, stats.rows_out), (2, 7, 7))
+
+    def test_counts_the_errors_reported_during_the_stage(self):
+        profiler = RunProfiler()
+        rule = AgeBandRule(fields=['age'])
+        rule.error_count = 5
+        with profiler.stage('rule', rules=[rule]):
+            rule.apply_rule(pandas.DataFrame({'age': [-1, 3, -2]}))
+        self.assertEqual(profiler.stages['rule'].errors, 2)
+
+    def test_records_the_memory_growth_of_each_stage(self):
+        with patch('fitfile.data_managers.run_report.rss_bytes') as mock_rss_bytes:
+            mock_rss_bytes.side_effect = [1000, 1500, 1500, 1700, 900, 800]
+            profiler = RunProfiler()
+            for name in ['load', 'load', 'save']:
+                with profiler.stage(name):
+                    pass
+        self.assertEqual(profiler.stages['load'].rss_growth_bytes, 500)
+        self.assertEqual(profiler.stages['save'].rss_growth_bytes, 0)
+
+    def test_wall_time_does_not_wrap_at_one_second(self):
+        with patch('fitfile.data_managers.run_report.time.perf_counter') as mock_perf_counter:
+            mock_perf_counter.side_effect = [100.0, 100.0, 102.5, 103.0]
+            profiler = RunProfiler()
+            with profiler.stage('save'):
+                pass
+            report = profiler.report()
+        self.assertEqual(profiler.stages['save'].wall_seconds, 2.5)
+        self.assertEqual(report['wall_seconds'], 3.0)
+
+
+class RunReportTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.data_manager = CsvDataManager(input_file_path=os.path.join(os.path.dirname(
+            __file__
+        ), '../../20230320_FITFILEPythonTest/customer.csv'),
+            output_file_path=os.path.join(self.output_dir.name, 'test.json'),
+            request_id='TESTID123'
+        )
+        self.data_manager.set_rules([
+            AgeBandRule(fields=['dob']),
+            PostCodeTrimToThreeRule(fields=['PostCode']),
+            PostCodeTrimToTwoRule(fields=['PostCode']),
+        ])
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def test_run_saves_the_report_next_to_the_output(self):
+        self.data_manager.run()
+        with open(os.path.join(self.output_dir.name, 'test.json.report.json')) as report_file:
+            self.assertEqual(json.load(report_file), self.data_manager.run_report)
+
+    def test_report_has_every_stage(self):
+        self.data_manager.run()
+        report = self.data_manager.run_report
+        self.assertEqual([stage['name'] for stage in report['stages']], [
+            'load',
+            'rule 0 AgeBandRule(dob)',
+            # Rules on the same field are fused
+            'rule 1 PostCodeTrimToThreeRule(PostCode) + rule 2 PostCodeTrimToTwoRule(PostCode)',
+            'save',
+        ])
+        self.assertEqual((report['rows_in'], report['rows_out']), (500, 500))
+        self.assertEqual(report['status'], 'FAIL')
+        self.assertEqual(report['errors'], sum(rule.error_count for rule in
+                                               self.data_manager.rules))
+        self.assertGreater(report['errors'], 0)
+
+    def test_report_times_each_rule_when_not_fusing(self):
+        self.data_manager.fuse_rules = False
+        self.data_manager.run()
+        self.assertEqual([stage['name'] for stage in self.data_manager.run_report['stages']][2:4],
+                         ['rule 1 PostCodeTrimToThreeRule(PostCode)',
+                          'rule 2 PostCodeTrimToTwoRule(PostCode)'])
+
+    def test_streaming_report_adds_up_chunks(self):
+        self.data_manager.chunksize = 100
+        self.data_manager.run()
+        stages = {stage['name']: stage for stage in self.data_manager.run_report['stages']}
+        accumulate = 'accumulate rule 2 PostCodeTrimToTwoRule(PostCode)'
+        self.assertEqual(stages['load']['rows_out'], 500)
+        # The extra pass accumulating the postcode counts of PostCodeTrimToTwoRule
+        self.assertEqual(stages['load for ' + accumulate]['rows_out'], 500)
+        self.assertEqual(stages[accumulate]['rows_in'], 500)
+        self.assertEqual(stages['save']['calls'], 5)
+        self.assertEqual(self.data_manager.run_report['rows_in'], 500)
+        self.assertEqual(self.data_manager.run_report['rows_out'], 500)
+
+    def test_report_is_not_saved_when_disabled(self):
+        self.data_manager.write_report = False
+        self.data_manager.run()
+        self.assertIsNotNone(self.data_manager.run_report)
+        self.assertFalse(os.path.exists(self.data_manager.run_report_path))
+
+
+class RejectsTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.data_manager = CsvDataManager(input_file_path=os.path.join(os.path.dirname(
+            __file__
+        ), '../../20230320_FITFILEPythonTest/customer.csv'),
+            output_file_path=os.path.join(self.output_dir.name, 'test.json'),
+            request_id='TESTID123'
+        )
+        self.data_manager.set_rules([
+            AgeBandRule(fields=['dob']),
+            # Fails on every full postcode
+            PostCodeTrimToTwoRule(fields=['PostCode']),
+        ])
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def test_run_saves_every_rejected_entry_next_to_the_output(self):
+        self.data_manager.run()
+        rejects = pandas.read_json(self.data_manager.rejects_path, lines=True)
+        self.assertEqual(len(rejects), sum(rule.error_count for rule in self.data_manager.rules))
+        self.assertEqual(set(rejects['field']), {'dob', 'PostCode'})
+        self.assertEqual(set(rejects['rule']), {'AgeBandRule', 'PostCodeTrimToTwoRule'})
+        dataframe = pandas.read_csv(self.data_manager.input_file_path)
+        for reject in rejects.itertuples():
+            self.assertEqual(str(dataframe[reject.field][reject.row]), str(reject.value))
+
+    def test_report_counts_the_rejects_per_exception_class(self):
+        self.data_manager.run()
+        report = self.data_manager.run_report
+        self.assertEqual(set(report['validation_errors']),
+                         {'AgeDatumException', 'PostCodeValidationException'})
+        self.assertEqual(sum(report['validation_errors'].values()), report['errors'])
+        self.assertEqual(report['rejects_file_path'], self.data_manager.rejects_path)
+
+    def test_streaming_and_csv_rejects_match(self):
+        self.data_manager.run()
+        expected = pandas.read_json(self.data_manager.rejects_path, lines=True)
+        self.data_manager.chunksize = 64
+        self.data_manager.rejects_format = 'csv'
+        self.data_manager.run()
+        self.assertTrue(self.data_manager.rejects_path.endswith('.rejects.csv'))
+        rejects = pandas.read_csv(self.data_manager.rejects_path)
+        self.assertEqual(sorted(zip(rejects['row'], rejects['field'])),
+                         sorted(zip(expected['row'], expected['field'])))
+
+    def test_rejects_are_only_counted_without_rejects_format(self):
+        self.data_manager.rejects_format = None
+        self.data_manager.run()
+        self.assertFalse(os.path.exists(self.data_manager.output_file_path + '.rejects.ndjson'))
+        self.assertGreater(sum(self.data_manager.run_report['validation_errors'].values()), 0)
+
+
+class QuarantineTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.input_file_path = os.path.join(os.path.dirname(
+            __file__
+        ), '../../20230320_FITFILEPythonTest/customer.csv')
+        self.data_manager = CsvDataManager(
+            input_file_path=self.input_file_path,
+            output_file_path=os.path.join(self.output_dir.name, 'test.ndjson'),
+            request_id='TESTID123',
+            output_format='ndjson',
+            output_columns=['name', 'dob'],
+            quarantine=True,
+        )
+        self.data_manager.set_rules([
+            AgeBandRule(fields=['dob']),
+            PostCodeTrimToThreeRule(fields=['PostCode']),
+        ])
+        self.dataframe = pandas.read_csv(self.input_file_path)
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def test_only_saves_the_valid_rows(self):
+        self.data_manager.run()
+        results = pandas.read_json(self.data_manager.output_file_path, lines=True)
+        self.assertEqual(list(results.columns), ['name', 'dob'])
+        self.assertTrue(results['dob'].str.match(r'^(\d+ - \d+|90\+)$').all())
+        report = self.data_manager.run_report
+        self.assertEqual(report['rows_out'], len(results))
+        self.assertEqual(report['rows_out'] + report['rows_quarantined'], len(self.dataframe))
+        self.assertGreater(report['rows_quarantined'], 0)
+
+    def test_quarantines_the_loaded_rows_with_the_first_rule_they_failed(self):
+        self.data_manager.set_rules([
+            AgeBandRule(fields=['dob']),
+            # Fails on every full postcode, so every row
+            PostCodeTrimToTwoRule(fields=['PostCode']),
+        ])
+        self.data_manager.run()
+        quarantined = pandas.read_json(self.data_manager.quarantine_path, lines=True)
+        self.assertEqual(len(quarantined), len(self.dataframe))
+        self.assertEqual(list(quarantined.columns), [
+            'name', 'PostCode', 'dob', 'rejected_row', 'rejected_field', 'rejected_rule',
+            'rejected_error', 'rejected_message'])
+        expected = self.dataframe.loc[quarantined['rejected_row']]
+        self.assertEqual(list(quarantined['dob']), list(expected['dob']))
+        self.assertEqual(list(quarantined['PostCode']), list(expected['PostCode']))
+        rejects = pandas.read_json(self.data_manager.rejects_path, lines=True)
+        bad_dates = set(rejects['row'][rejects['rule'] == 'AgeBandRule'])
+        self.assertEqual(list(quarantined['rejected_rule']),
+                         ['AgeBandRule' if row in bad_dates else 'PostCodeTrimToTwoRule'
+                          for row in quarantined['rejected_row']])
+
+    def test_streaming_quarantine_matches_in_memory_quarantine(self):
+        self.data_manager.run()
+        expected_results = pandas.read_json(self.data_manager.output_file_path, lines=True)
+        expected = pandas.read_json(self.data_manager.quarantine_path, lines=True)
+        self.data_manager.chunksize = 64
+        self.data_manager.run()
+        pandas.testing.assert_frame_equal(
+            pandas.read_json(self.data_manager.output_file_path, lines=True), expected_results)
+        pandas.testing.assert_frame_equal(
+            pandas.read_json(self.data_manager.quarantine_path, lines=True), expected)
+
+    def test_nothing_is_quarantined_by_default(self):
+        self.data_manager.quarantine = False
+        self.data_manager.run()
+        self.assertFalse(os.path.exists(self.data_manager.quarantine_path))
+        self.assertEqual(self.data_manager.run_report['rows_out'], len(self.dataframe))
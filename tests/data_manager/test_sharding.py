@@ -0,0 +1,147 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+import pandas
+
+from fitfile.data_managers import CsvDataManager
+from fitfile.data_managers.sharding import apply_rules_sharded
+from fitfile.data_rules import (
+    AgeBandRule,
+    PostCodeTrimToThreeRule,
+    PostCodeTrimToTwoRule,
+    ValidationErrors,
+)
+from fitfile.data_rules.postcode_trim_to_three_rule import (
+    POSTCODE_CACHE_SIZE,
+    PostcodeValidationCache,
+    postcode_validation_cache,
+    resize_postcode_validation_cache,
+)
+
+
+class ApplyRulesShardedTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = ProcessPoolExecutor(max_workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def setUp(self):
+        self.dataframe = pandas.DataFrame({
+            'age': [23, 45, -3, 91, 7],
+            'PostCode': ['OX1 5XJ', 'NY1 3TY', 'WRONG', 'SW1A 1AA', 'OX1 5XJ'],
+        })
+
+    def test_matches_applying_the_rules_serially(self):
+        expected = PostCodeTrimToThreeRule(fields=['PostCode']).apply_rule(
+            AgeBandRule(fields=['age']).apply_rule(self.dataframe))
+        results = apply_rules_sharded(
+            self.dataframe,
+            [AgeBandRule(fields=['age']), PostCodeTrimToThreeRule(fields=['PostCode'])],
+            self.executor,
+            3,
+        )
+        self.assertEqual(list(results.index), list(expected.index))
+        self.assertEqual(results.astype(str).to_dict(), expected.astype(str).to_dict())
+
+    def test_merges_error_flags_and_logs_back(self):
+        logger = logging.getLogger('fitfile.test_sharding')
+        rules = [AgeBandRule(fields=['age'], logger=logger),
+                 PostCodeTrimToThreeRule(fields=['PostCode'], logger=logger)]
+        with self.assertLogs(logger, level='ERROR') as logs:
+            apply_rules_sharded(self.dataframe, rules, self.executor, 5)
+        self.assertTrue(all(rule.error for rule in rules))
+        self.assertEqual([rule.error_count for rule in rules], [1, 1])
+        self.assertEqual(len(logs.records), 2)
+        self.assertTrue(any('WRONG' in record.getMessage() for record in logs.records))
+
+    def test_shards_share_the_logged_errors_limit(self):
+        logger = logging.getLogger('fitfile.test_sharding')
+        rule = AgeBandRule(fields=['age'], logger=logger)
+        rule.max_logged_errors = 2
+        dataframe = pandas.DataFrame({'age': [-1, -2, -3, -4, -5]})
+        with self.assertLogs(logger, level='ERROR') as logs:
+            apply_rules_sharded(dataframe, [rule], self.executor, 5)
+        messages = [record.getMessage() for record in logs.records]
+        self.assertEqual(rule.error_count, 5)
+        self.assertEqual(rule.logged_errors, 5)
+        self.assertEqual(len(messages), 3)
+        self.assertIn('further errors are only counted', messages[2])
+        with patch.object(logger, 'handle') as mock_handle:
+            apply_rules_sharded(dataframe, [rule], self.executor, 5)
+        mock_handle.assert_not_called()
+
+    def test_merges_the_postcode_cache_stats_of_the_workers(self):
+        rule = PostCodeTrimToThreeRule(fields=['PostCode'], cache=PostcodeValidationCache())
+        apply_rules_sharded(self.dataframe, [rule], self.executor, 5)
+        self.assertEqual((rule.cache.hits, rule.cache.misses), (0, 5))
+        self.assertIn('misses: 5', rule.summary())
+
+    def test_collects_the_rejects_of_every_shard(self):
+        rules = [AgeBandRule(fields=['age']), PostCodeTrimToThreeRule(fields=['PostCode'])]
+        for rule in rules:
+            rule.validation_errors = ValidationErrors()
+        apply_rules_sharded(self.dataframe, rules, self.executor, 5)
+        self.assertEqual([list(rule.validation_errors.take()['value']) for rule in rules],
+                         [[-3], ['WRONG']])
+
+    def test_more_shards_than_rows(self):
+        results = apply_rules_sharded(self.dataframe.iloc[:1], [AgeBandRule(fields=['age'])],
+                                      self.executor, 4)
+        self.assertEqual(list(results['age']), ['20 - 30'])
+
+
+class ShardedDataManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def make_data_manager(self, shards):
+        data_manager = CsvDataManager(input_file_path=os.path.join(os.path.dirname(
+            __file__
+        ), '../../20230320_FITFILEPythonTest/customer.csv'),
+            output_file_path=os.path.join(self.output_dir.name, '{}.json'.format(shards)),
+            request_id='TESTID123',
+            shards=shards,
+        )
+        data_manager.set_rules([
+            AgeBandRule(fields=['dob'], reference_date=pandas.Timestamp('2023-03-20')),
+            PostCodeTrimToThreeRule(fields=['PostCode']),
+            PostCodeTrimToTwoRule(fields=['PostCode']),
+        ])
+        return data_manager
+
+    def run_job(self, shards):
+        data_manager = self.make_data_manager(shards)
+        data_manager.run()
+        return data_manager
+
+    def test_shard_workers_use_the_postcode_cache_size_of_the_parent(self):
+        data_manager = self.make_data_manager(2)
+        start_method = multiprocessing.get_start_method()
+        multiprocessing.set_start_method('spawn', force=True)
+        resize_postcode_validation_cache(7)
+        try:
+            with data_manager._shard_executor():
+                size = data_manager._executor.submit(getattr, postcode_validation_cache,
+                                                     'maxsize').result()
+        finally:
+            multiprocessing.set_start_method(start_method, force=True)
+            resize_postcode_validation_cache(POSTCODE_CACHE_SIZE)
+        self.assertEqual(size, 7)
+
+    def test_sharded_run_matches_serial_run(self):
+        serial = self.run_job(None)
+        sharded = self.run_job(3)
+        self.assertTrue(pandas.read_json(sharded.output_file_path).equals(
+            pandas.read_json(serial.output_file_path)))
+        self.assertEqual(sharded.error, serial.error)
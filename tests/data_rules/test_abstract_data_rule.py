@@ -1,7 +1,11 @@
+import logging
 import unittest
 from unittest.mock import patch
+import numpy
+import pandas
 
 from fitfile.data_rules.abstract_data_rule import AbstractDataRule
+from fitfile.data_rules.validation_errors import ValidationErrors
 
 
 class DataRuleTester(object):
@@ -22,3 +26,165 @@ class AbstractDataRuleTester(DataRuleTester, unittest.TestCase):
     @patch.multiple(AbstractDataRule, __abstractmethods__=set())
     def setUp(self):
         self.data_rule = AbstractDataRule()
+
+
+class UpperCaseRule(AbstractDataRule):
+    def transform_datum(self, datum):
+        return datum.upper()
+
+    def validate_datum(self, datum):
+        if not isinstance(datum, str):
+            raise ValueError('Not a string {}'.format(datum))
+
+
+class VectorizedUpperCaseRule(UpperCaseRule):
+    def transform_series(self, series):
+        return series.str.upper()
+
+    def validate_series(self, series):
+        return ~series.map(lambda x: isinstance(x, str))
+
+
+class SeriesPathTest(unittest.TestCase):
+    def setUp(self):
+        self.dataframe = pandas.DataFrame([{'name': 'a'}, {'name': 3}, {'name': 'c'}])
+
+    def test_scalar_rule_does_not_support_series(self):
+        self.assertFalse(UpperCaseRule(fields=['name']).supports_series)
+
+    def test_vectorized_rule_supports_series(self):
+        self.assertTrue(VectorizedUpperCaseRule(fields=['name']).supports_series)
+
+    def test_series_path_matches_scalar_path(self):
+        scalar = UpperCaseRule(fields=['name']).apply_rule(self.dataframe)
+        vectorized = VectorizedUpperCaseRule(fields=['name']).apply_rule(self.dataframe)
+        self.assertEqual(list(scalar['name']), list(vectorized['name']))
+        self.assertEqual(list(vectorized['name']), ['A', '3', 'C'])
+
+    def test_series_path_calls_on_validation_error_once_with_invalid_entries(self):
+        rule = VectorizedUpperCaseRule(fields=['name'])
+        with patch.object(rule, 'on_validation_error') as mock_on_validation_error:
+            rule.apply_rule(self.dataframe)
+        mock_on_validation_error.assert_called_once()
+        self.assertEqual(list(mock_on_validation_error.call_args[0][0]), [3])
+
+    def test_series_path_sets_error(self):
+        rule = VectorizedUpperCaseRule(fields=['name'])
+        rule.apply_rule(self.dataframe)
+        self.assertTrue(rule.error)
+
+    def test_apply_rule_only_replaces_the_fields_it_owns(self):
+        dataframe = pandas.DataFrame({'name': ['a', 'b'], 'other': ['x', 'y']})
+        results = VectorizedUpperCaseRule(fields=['name']).apply_rule(dataframe)
+        self.assertEqual(list(dataframe['name']), ['a', 'b'])
+        self.assertTrue(numpy.shares_memory(results['other'].values, dataframe['other'].values))
+
+
+class FactorizedPathTest(unittest.TestCase):
+    def setUp(self):
+        self.dataframe = pandas.DataFrame({'name': ['a', 3, 'b', 'a', 3, None, 'b', None]})
+
+    def test_is_off_by_default(self):
+        self.assertFalse(UpperCaseRule(fields=['name']).factorize)
+
+    def test_factorized_path_matches_scalar_path(self):
+        scalar = UpperCaseRule(fields=['name']).apply_rule(self.dataframe)
+        factorized = UpperCaseRule(fields=['name'], factorize=True).apply_rule(self.dataframe)
+        self.assertEqual(list(scalar['name']), list(factorized['name']))
+
+    def test_transforms_each_distinct_value_once(self):
+        rule = UpperCaseRule(fields=['name'], factorize=True)
+        with patch.object(rule, 'transform_datum', side_effect=str.upper) as mock_transform:
+            rule.apply_rule(self.dataframe)
+        self.assertEqual(mock_transform.call_count, 2)
+
+    def test_reports_errors_once_per_distinct_value_with_all_occurrences(self):
+        rule = UpperCaseRule(fields=['name'], factorize=True)
+        with patch.object(rule, 'on_validation_error') as mock_on_validation_error:
+            rule.apply_rule(self.dataframe)
+        self.assertEqual(mock_on_validation_error.call_count, 2)
+        self.assertEqual(
+            sorted(list(call[0][0].index) for call in mock_on_validation_error.call_args_list),
+            [[1, 4], [5, 7]],
+        )
+
+    def test_keeps_numerical_dtypes(self):
+        class DoubleRule(UpperCaseRule):
+            def transform_datum(self, datum):
+                return datum * 2
+
+            def validate_datum(self, datum):
+                pass
+
+        dataframe = pandas.DataFrame({'age': [1, 2, 1]})
+        results = DoubleRule(fields=['age'], factorize=True).apply_rule(dataframe)
+        self.assertEqual(results['age'].dtype, dataframe['age'].dtype)
+        self.assertEqual(list(results['age']), [2, 4, 2])
+
+    def test_unhashable_values_fall_back_to_the_scalar_path(self):
+        dataframe = pandas.DataFrame({'name': [['a'], ['a']]})
+        rule = UpperCaseRule(fields=['name'], factorize=True)
+        self.assertEqual(list(rule.apply_rule(dataframe)['name']), ["['a']", "['a']"])
+
+
+class ValidationErrorReportingTest(unittest.TestCase):
+    def setUp(self):
+        self.dataframe = pandas.DataFrame({'name': ['a', 3, 'b', None, 4.5]})
+
+    def test_per_datum_path_reports_once_per_exception_class(self):
+        rule = UpperCaseRule(fields=['name'])
+        with patch.object(rule, 'on_validation_error') as mock_on_validation_error:
+            results = rule.apply_rule(self.dataframe)
+        mock_on_validation_error.assert_called_once()
+        self.assertEqual(list(mock_on_validation_error.call_args[0][0].index), [1, 3, 4])
+        self.assertEqual(list(results['name']), ['A', '3', 'B', 'None', '4.5'])
+        self.assertEqual(rule.error_count, 3)
+
+    def test_collects_the_row_field_value_and_exception_of_each_entry(self):
+        for rule in [UpperCaseRule(fields=['name']), VectorizedUpperCaseRule(fields=['name'])]:
+            rule.validation_errors = ValidationErrors()
+            rule.apply_rule(self.dataframe)
+            rejects = rule.validation_errors.take()
+            self.assertEqual(list(rejects.columns), ValidationErrors.columns)
+            self.assertEqual(list(rejects['row']), [1, 3, 4])
+            self.assertEqual(list(rejects['field']), ['name'] * 3)
+            self.assertEqual(list(rejects['value'][[0, 2]]), [3, 4.5])
+            self.assertEqual(set(rejects['error']), {'ValueError'} if not rule.supports_series
+                             else {'Exception'})
+            self.assertEqual(rule.validation_errors.counts, {rejects['error'][0]: 3})
+            self.assertEqual(len(rule.validation_errors), 0)
+
+    def test_per_datum_path_keeps_the_message_of_each_entry(self):
+        rule = UpperCaseRule(fields=['name'])
+        rule.validation_errors = ValidationErrors()
+        rule.apply_rule(self.dataframe)
+        self.assertEqual(list(rule.validation_errors.take()['message']),
+                         ['Not a string 3', 'Not a string None', 'Not a string 4.5'])
+
+    def test_only_counts_without_keep_rows(self):
+        rule = UpperCaseRule(fields=['name'])
+        rule.validation_errors = ValidationErrors(keep_rows=False)
+        rule.apply_rule(self.dataframe)
+        self.assertEqual(rule.validation_errors.counts, {'ValueError': 3})
+        self.assertEqual(len(rule.validation_errors.take()), 0)
+
+    def test_logs_a_single_line_per_column_with_a_sample(self):
+        logger = logging.getLogger('fitfile.test_abstract_data_rule')
+        rule = VectorizedUpperCaseRule(fields=['name'], logger=logger)
+        dataframe = pandas.DataFrame({'name': ['a'] + list(range(100))})
+        with self.assertLogs(logger, level='ERROR') as logs:
+            rule.apply_rule(dataframe)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('100 entries of name', logs.records[0].getMessage())
+        self.assertIn('first values [0, 1, 2, 3, 4]', logs.records[0].getMessage())
+
+    def test_stops_logging_after_max_logged_errors(self):
+        logger = logging.getLogger('fitfile.test_abstract_data_rule')
+        rule = UpperCaseRule(fields=['name'], logger=logger)
+        rule.max_logged_errors = 2
+        with self.assertLogs(logger, level='ERROR') as logs:
+            for datum in range(5):
+                rule.validate_and_transform(datum)
+        # The two errors and a line saying the rest are only counted
+        self.assertEqual(len(logs.records), 3)
+        self.assertEqual(rule.error_count, 5)
@@ -1,3 +1,4 @@
+import datetime
 import unittest
 import random
 import pandas
@@ -81,9 +82,86 @@ class AgeBandRuleTest(DataRuleTester, unittest.TestCase):
         self.assertEqual(results['age'][0], '-23')
 
     def test_calls_on_validation_error_when_dob_is_on_the_future(self):
-        dataframe = pandas.DataFrame([{'dob': '2024-12-12'}])
+        tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+        dataframe = pandas.DataFrame([{'dob': tomorrow}])
         negative_age = AgeBandRule(fields=['dob'])
         with patch.object(negative_age, 'on_validation_error') as mock_on_validation_error:
             results = negative_age.apply_rule(dataframe)
         mock_on_validation_error.assert_called()
-        self.assertEqual(results['dob'][0], '2024-12-12')
+        self.assertEqual(results['dob'][0], tomorrow)
+
+    # Series path
+
+    def test_series_path_matches_datum_path_on_dates(self):
+        reference_date = datetime.datetime(2023, 3, 20)
+        start = datetime.date(1920, 1, 1)
+        dates = [(start + datetime.timedelta(days=random.randint(0, 37000))).isoformat()
+                 for _ in range(0, 2000)] + ['2023-03-20', '2013-03-20', '2013-03-21']
+        age_band_rule = AgeBandRule(fields=['dob'], reference_date=reference_date)
+        with patch('fitfile.data_rules.age_band_rule.datetime') as mock_datetime:
+            mock_datetime.datetime.now.return_value = reference_date
+            mock_datetime.datetime.fromisoformat = datetime.datetime.fromisoformat
+            mock_datetime.date.fromisoformat = datetime.date.fromisoformat
+            expected = [age_band_rule.validate_and_transform(date) for date in dates]
+        results = age_band_rule.apply_rule(pandas.DataFrame({'dob': dates}))
+        self.assertEqual(list(results['dob']), expected)
+
+    def test_series_path_matches_datum_path_on_partial_and_malformed_dates(self):
+        reference_date = datetime.datetime(2023, 3, 20)
+        dates = ['1990', '1990-01', '1990-1-1', ' 1990-01-01', '1990-01-01 ', '1990-02-30',
+                 '1990-W01-1', '19900101', '1990-01-01T10', '1500-06-01', '2023-03-21',
+                 '1990-01-01', '', 'nope']
+        age_band_rule = AgeBandRule(fields=['dob'], reference_date=reference_date)
+        with patch('fitfile.data_rules.age_band_rule.datetime') as mock_datetime:
+            mock_datetime.datetime.now.return_value = reference_date
+            mock_datetime.datetime.fromisoformat = datetime.datetime.fromisoformat
+            expected = [age_band_rule.validate_and_transform(date) for date in dates]
+            results = age_band_rule.apply_rule(pandas.DataFrame({'dob': dates}))
+        self.assertEqual(list(results['dob']), expected)
+        self.assertEqual(expected[:6], dates[:6])
+        self.assertEqual(expected[9], '90+')
+
+    def test_series_path_returns_a_categorical_when_all_entries_are_valid(self):
+        dataframe = pandas.DataFrame({'age': [5, 15, 95]})
+        results = AgeBandRule(fields=['age']).apply_rule(dataframe)
+        self.assertIsInstance(results['age'].dtype, pandas.CategoricalDtype)
+        self.assertEqual(list(results['age']), ['0 - 10', '10 - 20', '90+'])
+
+    def test_series_path_handles_mixed_ages_and_dates(self):
+        dataframe = pandas.DataFrame({'dob': [23, '2003-03-19', 45.5]})
+        age_band_rule = AgeBandRule(fields=['dob'], reference_date=datetime.datetime(2023, 3, 20))
+        results = age_band_rule.apply_rule(dataframe)
+        self.assertEqual(list(results['dob']), ['20 - 30', '20 - 30', '40 - 50'])
+
+    def test_series_path_reports_invalid_entries_in_bulk(self):
+        tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+        dataframe = pandas.DataFrame({'dob': ['2010-23-05', tomorrow, '2010-10-05', None]})
+        age_band_rule = AgeBandRule(fields=['dob'])
+        with patch.object(age_band_rule, 'on_validation_error') as mock_on_validation_error:
+            results = age_band_rule.apply_rule(dataframe)
+        mock_on_validation_error.assert_called_once()
+        self.assertEqual(list(mock_on_validation_error.call_args[0][0].index), [0, 1, 3])
+        self.assertEqual(list(results['dob']), ['2010-23-05', tomorrow, '10 - 20', 'None'])
+
+    def test_series_path_bands_typed_columns(self):
+        age_band_rule = AgeBandRule(fields=['dob'], reference_date=datetime.datetime(2023, 3, 20))
+        dates = ['2003-03-19', None, '1950-01-01', '2003-03-19']
+        for dtype in ['category', 'datetime64[ns]']:
+            with patch.object(age_band_rule, 'on_validation_error') as mock_on_validation_error:
+                results = age_band_rule.apply_rule(pandas.DataFrame({'dob': dates}, dtype=dtype))
+            self.assertEqual(list(mock_on_validation_error.call_args[0][0].index), [1])
+            self.assertEqual(list(results['dob'][[0, 2, 3]]), ['20 - 30', '70 - 80', '20 - 30'])
+
+    def test_bands_time_zone_aware_dates_by_their_local_date(self):
+        age_band_rule = AgeBandRule(fields=['dob'], reference_date=datetime.datetime(2023, 3, 20))
+        aware = ['2003-03-20T00:30:00+01:00', '2003-03-21T23:00:00-05:00']
+        # Strings, a datetime64 column with a time zone and timestamps mixing time zones
+        for dates in [aware + ['2003-03-19'], pandas.to_datetime(aware, format='ISO8601'),
+                      pandas.to_datetime(aware + ['2003-03-19'], format='ISO8601')]:
+            results = age_band_rule.apply_rule(pandas.DataFrame({'dob': dates}))
+            self.assertEqual(list(results['dob']), ['20 - 30', '10 - 20', '20 - 30'][:len(dates)])
+
+    def test_datum_path_accepts_time_zone_aware_dates(self):
+        age_band_rule = AgeBandRule(fields=['dob'])
+        self.assertEqual(age_band_rule.validate_and_transform('2000-01-01T00:00:00+01:00'),
+                         age_band_rule.validate_and_transform('2000-01-01'))
@@ -0,0 +1,133 @@
+import datetime
+import unittest
+
+import pandas
+
+from fitfile.data_rules import (
+    AgeBandRule,
+    FusedRuleChain,
+    PostCodeTrimToThreeRule,
+    PostCodeTrimToTwoRule,
+    ValidationErrors,
+)
+from fitfile.data_rules.abstract_data_rule import AbstractDataRule
+from fitfile.data_rules.fused_rule_chain import plan_rules
+from .test_abstract_data_rule import (
+    UpperCaseRule,
+    VectorizedUpperCaseRule,
+)
+
+
+class LegacyRule(UpperCaseRule):
+    def apply_to_series(self, series):
+        return series.map(self.validate_and_transform)
+
+
+class IdentityRule(AbstractDataRule):
+    def transform_datum(self, datum):
+        return datum
+
+    def validate_datum(self, datum):
+        pass
+
+
+class TypeNameRule(IdentityRule):
+    def transform_datum(self, datum):
+        return type(datum).__name__
+
+
+class FusedRuleChainTest(unittest.TestCase):
+    def setUp(self):
+        postcodes = ['OX1 5XJ', 'OX1 6AB', 'SW1A 1AA', 'WRONG', None, 'NY1 3TY', 12] * 3
+        postcodes += ['EC1A 1BB'] * 12
+        self.dataframe = pandas.DataFrame({
+            'PostCode': postcodes,
+            'dob': ['2003-03-19'] * len(postcodes),
+        }, index=range(10, 10 + len(postcodes)))
+
+    def make_rules(self):
+        rules = [PostCodeTrimToThreeRule(fields=['PostCode']),
+                 PostCodeTrimToTwoRule(fields=['PostCode'])]
+        for rule in rules:
+            rule.validation_errors = ValidationErrors()
+        return rules
+
+    def test_matches_applying_the_rules_in_sequence(self):
+        rules = self.make_rules()
+        expected = self.dataframe
+        for rule in rules:
+            expected = rule.apply_rule(expected)
+        fused_rules = self.make_rules()
+        results = FusedRuleChain(fused_rules).apply_rule(self.dataframe)
+        pandas.testing.assert_frame_equal(results, expected)
+        for rule, fused_rule in zip(rules, fused_rules):
+            self.assertEqual(fused_rule.error_count, rule.error_count)
+            pandas.testing.assert_frame_equal(fused_rule.validation_errors.take(),
+                                              rule.validation_errors.take())
+
+    def test_matches_in_sequence_on_typed_and_per_datum_rules(self):
+        dataframe = pandas.DataFrame({'name': ['a', 3, 'b', None, 'a', 4.5]})
+        for dtype in [object, 'category']:
+            typed = dataframe.astype(dtype)
+            expected = VectorizedUpperCaseRule(fields=['name']).apply_rule(
+                UpperCaseRule(fields=['name']).apply_rule(typed))
+            results = FusedRuleChain([UpperCaseRule(fields=['name']),
+                                      VectorizedUpperCaseRule(fields=['name'])]).apply_rule(typed)
+            self.assertEqual(list(results['name']), list(expected['name']))
+
+    def test_keeps_categorical_results(self):
+        rules = [AgeBandRule(fields=['dob'], reference_date=datetime.datetime(2023, 3, 20)),
+                 UpperCaseRule(fields=['dob'])]
+        results = FusedRuleChain(rules[:1]).apply_rule(self.dataframe)
+        self.assertIsInstance(results['dob'].dtype, pandas.CategoricalDtype)
+        self.assertEqual(set(results['dob']), {'20 - 30'})
+
+    def test_reports_each_rule_failures_with_their_rows_and_messages(self):
+        rules = [UpperCaseRule(fields=['PostCode']), PostCodeTrimToTwoRule(fields=['PostCode'])]
+        for rule in rules:
+            rule.validation_errors = ValidationErrors()
+        FusedRuleChain(rules).apply_rule(self.dataframe)
+        rejects = rules[0].validation_errors.take()
+        self.assertEqual(list(rejects['row']), [14, 16, 21, 23, 28, 30])
+        self.assertEqual(list(rejects['message'][:2]), ['Not a string None', 'Not a string 12'])
+
+    def test_rejects_rules_on_different_fields(self):
+        with self.assertRaises(ValueError):
+            FusedRuleChain([UpperCaseRule(fields=['a']), UpperCaseRule(fields=['b'])])
+        with self.assertRaises(ValueError):
+            FusedRuleChain([UpperCaseRule(fields=['a', 'b']), UpperCaseRule(fields=['a', 'b'])])
+
+    def test_plan_fuses_consecutive_rules_on_the_same_field(self):
+        rules = [AgeBandRule(fields=['dob']), PostCodeTrimToThreeRule(fields=['PostCode']),
+                 PostCodeTrimToTwoRule(fields=['PostCode']), LegacyRule(fields=['PostCode']),
+                 UpperCaseRule(fields=['PostCode'])]
+        plan = plan_rules(rules)
+        self.assertEqual([indices for indices, _ in plan], [[0], [1, 2], [3], [4]])
+        self.assertIsInstance(plan[1][1], FusedRuleChain)
+        self.assertEqual(plan[1][1].chained_rules, rules[1:3])
+        self.assertFalse(plan[1][1].row_local)
+        self.assertIs(plan[0][1], rules[0])
+
+    def test_per_datum_rules_keep_the_type_of_each_datum(self):
+        series = pandas.Series([1, 1.0, True, None, float('nan')], dtype=object)
+        expected = ['int', 'float', 'bool', 'NoneType', 'float']
+        rules = [IdentityRule(fields=['a']), TypeNameRule(fields=['a'])]
+        self.assertEqual(list(FusedRuleChain(rules).apply_to_series(series)), expected)
+        self.assertEqual([indices for indices, _ in plan_rules(rules)], [[0], [1]])
+        # Rules that factorize opt in to merging equal values
+        rules = [IdentityRule(fields=['a'], factorize=True),
+                 TypeNameRule(fields=['a'], factorize=True)]
+        self.assertEqual([indices for indices, _ in plan_rules(rules)], [[0, 1]])
+
+    def test_rules_only_get_the_distinct_values(self):
+        rules = self.make_rules()
+        sizes = []
+        for rule in rules:
+            def apply_to_values(values, counts, apply_to_values=rule.apply_to_values):
+                sizes.append((len(values), int(counts.sum())))
+                return apply_to_values(values, counts)
+            rule.apply_to_values = apply_to_values
+        results = FusedRuleChain(rules).apply_to_series(self.dataframe['PostCode'])
+        # Seven distinct postcodes and the missing ones
+        self.assertEqual(sizes, [(8, len(self.dataframe))] * 2)
+        self.assertEqual(list(results.index), list(self.dataframe.index))
@@ -1,9 +1,12 @@
+import pickle
 import unittest
 import pandas
 from mock import patch
 
 from fitfile.data_rules.postcode_trim_to_three_rule import (
     PostCodeTrimToThreeRule,
+    PostcodeValidationCache,
+    postcode_validation_cache,
 )
 from .test_abstract_data_rule import DataRuleTester
 from faker import Faker
@@ -86,3 +89,42 @@ class PostCodeTrimToThreeTest(DataRuleTester, unittest.TestCase):
             results = postcode_rule.apply_rule(dataframe)
         self.assertFalse(mock_on_validation_error.called)
         self.assertTrue(all([len(x) == 3 for x in results['postcode']]))
+
+
+class PostcodeValidationCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = PostcodeValidationCache(maxsize=2)
+
+    def test_counts_hits_and_misses(self):
+        self.assertTrue(self.cache.validate('OX1 5XJ'))
+        self.assertTrue(self.cache.validate('OX1 5XJ'))
+        self.assertFalse(self.cache.validate('WRONG'))
+        self.assertEqual((self.cache.hits, self.cache.misses, self.cache.currsize), (1, 2, 2))
+
+    def test_is_bounded(self):
+        for postcode in ['OX1 5XJ', 'NY1 3TY', 'SW1A 1AA']:
+            self.cache.validate(postcode)
+        self.assertEqual(self.cache.currsize, 2)
+
+    def test_resize_clears_the_cache(self):
+        self.cache.validate('OX1 5XJ')
+        self.cache.resize(10)
+        self.assertEqual((self.cache.maxsize, self.cache.currsize, self.cache.misses), (10, 0, 0))
+
+    def test_pickles_the_shared_cache_by_reference(self):
+        self.assertIs(pickle.loads(pickle.dumps(postcode_validation_cache)),
+                      postcode_validation_cache)
+        copied_cache = pickle.loads(pickle.dumps(self.cache))
+        self.assertEqual((copied_cache.maxsize, copied_cache.currsize), (2, 0))
+
+    def test_validates_each_distinct_postcode_once(self):
+        with patch('postcodes_uk.validate', return_value=True) as mock_validate:
+            postcode_rule = PostCodeTrimToThreeRule(fields=['postcode'],
+                                                    cache=PostcodeValidationCache())
+        dataframe = pandas.DataFrame({'postcode': ['OX1 5XJ', 'NY1 3TY'] * 50 + [None]})
+        with patch.object(postcode_rule, 'on_validation_error') as mock_on_validation_error:
+            results = postcode_rule.apply_rule(dataframe)
+        self.assertEqual(mock_validate.call_count, 2)
+        mock_on_validation_error.assert_called_once()
+        self.assertEqual(list(results['postcode'][:2]), ['OX1', 'NY1'])
+        self.assertEqual(results['postcode'][100], 'None')
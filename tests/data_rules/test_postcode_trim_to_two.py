@@ -74,3 +74,56 @@ class PostCodeTrimToTwoTest(DataRuleTester, unittest.TestCase):
         postcode_rule = PostCodeTrimToTwoRule(fields=['postcode'])
         results = postcode_rule.apply_rule(pandas.DataFrame(to_test))
         self.assertTrue(all([len(x) == 3 for x in results['postcode']]))
+
+    def test_only_trims_postcodes_with_less_than_ten_entries(self):
+        dataframe = pandas.DataFrame({'postcode': ['OX1'] * 10 + ['NY1'] * 9})
+        results = PostCodeTrimToTwoRule(fields=['postcode']).apply_rule(dataframe)
+        self.assertEqual(list(results['postcode']), ['OX1'] * 10 + ['NY'] * 9)
+
+    def test_does_not_leave_helper_columns_on_the_output(self):
+        dataframe = pandas.DataFrame({'postcode': ['OX1', 'NY1'], 'name': ['a', 'b']})
+        results = PostCodeTrimToTwoRule(fields=['postcode']).apply_rule(dataframe)
+        self.assertEqual(list(results.columns), ['postcode', 'name'])
+
+    def test_reports_invalid_postcodes_in_bulk(self):
+        dataframe = pandas.DataFrame({'postcode': ['OX1', 'O', None, 'NY1']})
+        postcode_rule = PostCodeTrimToTwoRule(fields=['postcode'])
+        with patch.object(postcode_rule, 'on_validation_error') as mock_on_validation_error:
+            results = postcode_rule.apply_rule(dataframe)
+        mock_on_validation_error.assert_called_once()
+        self.assertEqual(list(mock_on_validation_error.call_args[0][0].index), [1, 2])
+        self.assertEqual(list(results['postcode']), ['OX', 'O', None, 'NY'])
+
+    def test_non_string_columns_fail_to_validate(self):
+        postcode_rule = PostCodeTrimToTwoRule(fields=['postcode'])
+        results = postcode_rule.apply_rule(pandas.DataFrame({'postcode': [1, 2]}))
+        self.assertTrue(postcode_rule.error)
+        self.assertEqual(list(results['postcode']), [1, 2])
+
+    def test_uses_accumulated_counts_over_the_series_counts(self):
+        postcode_rule = PostCodeTrimToTwoRule(fields=['postcode'])
+        postcode_rule.accumulate(pandas.DataFrame({'postcode': ['OX1'] * 6}))
+        postcode_rule.accumulate(pandas.DataFrame({'postcode': ['OX1'] * 6}))
+        results = postcode_rule.apply_rule(pandas.DataFrame({'postcode': ['OX1']}))
+        self.assertEqual(results['postcode'][0], 'OX1')
+        postcode_rule.reset_state()
+        results = postcode_rule.apply_rule(pandas.DataFrame({'postcode': ['OX1']}))
+        self.assertEqual(results['postcode'][0], 'OX')
+
+    def test_stale_rows_are_those_of_postcodes_crossing_ten_entries(self):
+        postcode_rule = PostCodeTrimToTwoRule(fields=['postcode'])
+        previous = pandas.DataFrame({'postcode': ['OX1'] * 9 + ['SW1'] * 12 + ['ME1']})
+        current = pandas.DataFrame({'postcode': ['OX1'] * 10 + ['SW1'] * 11 + ['ME1']})
+        stale = postcode_rule.stale_rows(previous, current)
+        self.assertEqual(list(stale), [True] * 10 + [False] * 12)
+
+    def test_trims_categorical_columns(self):
+        postcodes = ['OX1'] * 10 + ['SW1'] * 3 + ['WRONG']
+        dataframe = pandas.DataFrame({'postcode': postcodes}, dtype='category')
+        postcode_rule = PostCodeTrimToTwoRule(fields=['postcode'])
+        with patch.object(postcode_rule, 'on_validation_error'):
+            results = postcode_rule.apply_rule(dataframe)
+        self.assertIsInstance(results['postcode'].dtype, pandas.CategoricalDtype)
+        self.assertEqual(list(results['postcode']), ['OX1'] * 10 + ['SW'] * 3 + ['WRONG'])
+        postcode_rule.accumulate(dataframe)
+        self.assertEqual(postcode_rule.stale_rows(dataframe, dataframe).sum(), 0)
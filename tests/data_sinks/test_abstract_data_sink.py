@@ -0,0 +1,94 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas
+
+from fitfile.data_sinks.abstract_data_sink import AbstractDataSink
+from fitfile.data_sinks.exceptions import DataSinkException
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class DataSinkTester(object):
+    """Mixin, subclasses set sink_class and implement read_output"""
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        self.dataframe = pandas.DataFrame({
+            'name': ['a', 'b', 'c', 'd', 'e'],
+            'age': [1, 2, 3, 4, 5],
+        })
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def output_path(self, name):
+        return os.path.join(self.output_dir.name, name)
+
+    def write(self, name, chunks, **kwargs):
+        with self.sink_class(self.output_path(name), **kwargs) as sink:
+            for chunk in chunks:
+                sink.write(chunk)
+        return sink
+
+    def test_writes_a_single_chunk(self):
+        self.write('out', [self.dataframe])
+        self.assertTrue(self.read_output('out').equals(self.dataframe))
+
+    def test_writes_chunks_in_small_batches(self):
+        sink = self.write('out', [self.dataframe.iloc[:2], self.dataframe.iloc[2:]], batch_size=2)
+        self.assertEqual(sink.rows_written, 5)
+        self.assertTrue(self.read_output('out').equals(self.dataframe))
+
+    def test_skips_empty_chunks(self):
+        self.write('out', [self.dataframe.iloc[:0], self.dataframe, self.dataframe.iloc[:0]])
+        self.assertTrue(self.read_output('out').equals(self.dataframe))
+
+    def test_infers_gzip_compression(self):
+        self.write('out.gz', [self.dataframe])
+        with gzip.open(self.output_path('out.gz'), 'rt') as compressed:
+            content = compressed.read()
+        with open(self.output_path('out'), 'w') as uncompressed:
+            uncompressed.write(content)
+        self.assertTrue(self.read_output('out').equals(self.dataframe))
+
+    @unittest.skipIf(zstandard is None, 'zstandard is not installed')
+    def test_zstd_compression(self):
+        self.write('out.zst', [self.dataframe])
+        with open(self.output_path('out.zst'), 'rb') as compressed:
+            content = zstandard.ZstdDecompressor().stream_reader(compressed).read()
+        with open(self.output_path('out'), 'wb') as uncompressed:
+            uncompressed.write(content)
+        self.assertTrue(self.read_output('out').equals(self.dataframe))
+
+    def test_appends_to_the_output(self):
+        if not self.sink_class.appendable:
+            self.skipTest('{} can not append'.format(self.sink_class.__name__))
+        self.write('out', [self.dataframe.iloc[:2]])
+        self.write('out', [self.dataframe.iloc[2:]], append=True)
+        self.assertTrue(self.read_output('out').equals(self.dataframe))
+
+    def test_fails_when_not_open(self):
+        with self.assertRaises(DataSinkException):
+            self.sink_class(self.output_path('out')).write(self.dataframe)
+
+
+class AbstractDataSinkTest(unittest.TestCase):
+    @patch.multiple(AbstractDataSink, __abstractmethods__=set())
+    def test_fails_on_unknown_compression(self):
+        with self.assertRaises(DataSinkException):
+            AbstractDataSink('out.json', compression='rar')
+
+    @patch.multiple(AbstractDataSink, __abstractmethods__=set())
+    def test_infers_no_compression(self):
+        self.assertIsNone(AbstractDataSink('out.json').compression)
+
+    @patch.multiple(AbstractDataSink, __abstractmethods__=set())
+    def test_fails_to_append_when_not_appendable(self):
+        with self.assertRaises(DataSinkException):
+            AbstractDataSink('out.json', append=True)
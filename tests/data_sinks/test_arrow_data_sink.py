@@ -0,0 +1,57 @@
+import unittest
+
+import pandas
+
+from fitfile.data_sinks import ArrowDataSink
+from fitfile.data_sinks.exceptions import DataSinkException
+from .test_abstract_data_sink import DataSinkTester
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class ArrowDataSinkTest(DataSinkTester, unittest.TestCase):
+    sink_class = ArrowDataSink
+
+    def read_output(self, name):
+        return pandas.read_feather(self.output_path(name))
+
+    def test_infers_gzip_compression(self):
+        with self.assertRaises(DataSinkException):
+            self.sink_class(self.output_path('out.gz'))
+
+    def test_zstd_compression(self):
+        sink = self.write('out.zst', [self.dataframe])
+        self.assertEqual(sink.compression, 'zstd')
+        self.assertTrue(self.read_output('out.zst').equals(self.dataframe))
+
+    def test_stores_categoricals_dictionary_encoded_across_batches(self):
+        bands = pandas.CategoricalDtype(['0 - 10', '10 - 20', '90+'])
+        first = pandas.DataFrame({'age': pandas.Series(['0 - 10', '90+'], dtype=bands)})
+        second = pandas.DataFrame({'age': pandas.Series(
+            ['10 - 20', '-3'], dtype=pandas.CategoricalDtype(['-3', '10 - 20']))})
+        self.write('out', [first, second])
+        results = self.read_output('out')
+        self.assertIsInstance(results['age'].dtype, pandas.CategoricalDtype)
+        self.assertEqual(list(results['age']), ['0 - 10', '90+', '10 - 20', '-3'])
+
+    def test_types_sparse_columns_from_the_whole_chunk(self):
+        dataframe = pandas.DataFrame({'note': [None] * 20000 + ['hello']})
+        self.write('out', [dataframe])
+        self.assertEqual(self.read_output('out')['note'].iloc[-1], 'hello')
+
+    def test_stores_columns_empty_on_the_first_chunk_as_strings(self):
+        first = pandas.DataFrame({'note': [float('nan')] * 2, 'count': [1, 2]})
+        second = pandas.DataFrame({'note': ['hello', 3], 'count': [3, 4]})
+        self.write('out', [first, second])
+        results = self.read_output('out')
+        self.assertEqual(list(results['note'][2:]), ['hello', '3'])
+        self.assertEqual(list(results['count']), [1, 2, 3, 4])
+
+    def test_fails_on_columns_changing_type(self):
+        first = pandas.DataFrame({'count': [1, 2]})
+        with self.assertRaises(DataSinkException):
+            self.write('out', [first, pandas.DataFrame({'count': ['many']})])
@@ -0,0 +1,20 @@
+import unittest
+
+import pandas
+
+from fitfile.data_sinks import CsvDataSink
+from .test_abstract_data_sink import DataSinkTester
+
+
+class CsvDataSinkTest(DataSinkTester, unittest.TestCase):
+    sink_class = CsvDataSink
+
+    def read_output(self, name):
+        return pandas.read_csv(self.output_path(name))
+
+    def test_writes_the_header_once(self):
+        self.write('out', [self.dataframe.iloc[:2], self.dataframe.iloc[2:]], batch_size=1)
+        with open(self.output_path('out')) as output_file:
+            lines = output_file.readlines()
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(lines[0], 'name,age\n')
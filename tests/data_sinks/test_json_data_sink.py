@@ -0,0 +1,24 @@
+import json
+import unittest
+
+import pandas
+
+from fitfile.data_sinks import JsonDataSink
+from .test_abstract_data_sink import DataSinkTester
+
+
+class JsonDataSinkTest(DataSinkTester, unittest.TestCase):
+    sink_class = JsonDataSink
+
+    def read_output(self, name):
+        return pandas.read_json(self.output_path(name))
+
+    def test_writes_an_empty_array_without_rows(self):
+        self.write('out', [])
+        with open(self.output_path('out')) as output_file:
+            self.assertEqual(json.load(output_file), [])
+
+    def test_is_compact(self):
+        self.write('out', [self.dataframe])
+        with open(self.output_path('out')) as output_file:
+            self.assertNotIn('\n', output_file.read())
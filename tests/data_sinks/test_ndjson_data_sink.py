@@ -0,0 +1,18 @@
+import unittest
+
+import pandas
+
+from fitfile.data_sinks import NdjsonDataSink
+from .test_abstract_data_sink import DataSinkTester
+
+
+class NdjsonDataSinkTest(DataSinkTester, unittest.TestCase):
+    sink_class = NdjsonDataSink
+
+    def read_output(self, name):
+        return pandas.read_json(self.output_path(name), lines=True)
+
+    def test_writes_one_record_per_line(self):
+        self.write('out', [self.dataframe.iloc[:2], self.dataframe.iloc[2:]], batch_size=1)
+        with open(self.output_path('out')) as output_file:
+            self.assertEqual(len(output_file.readlines()), 5)
@@ -0,0 +1,57 @@
+import unittest
+
+import pandas
+
+from fitfile.data_sinks import ParquetDataSink
+from .test_abstract_data_sink import DataSinkTester
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class ParquetDataSinkTest(DataSinkTester, unittest.TestCase):
+    sink_class = ParquetDataSink
+
+    def read_output(self, name):
+        return pandas.read_parquet(self.output_path(name))
+
+    # Compression is part of the parquet format, not of the stream
+    def test_infers_gzip_compression(self):
+        sink = self.write('out.gz', [self.dataframe])
+        self.assertEqual(sink.compression, 'gzip')
+        self.assertTrue(self.read_output('out.gz').equals(self.dataframe))
+
+    def test_zstd_compression(self):
+        self.write('out.zst', [self.dataframe])
+        self.assertTrue(self.read_output('out.zst').equals(self.dataframe))
+
+    def test_keeps_column_types(self):
+        self.write('out', [self.dataframe])
+        self.assertEqual(list(self.read_output('out').dtypes), list(self.dataframe.dtypes))
+
+    def test_stores_categoricals_dictionary_encoded_across_batches(self):
+        bands = pandas.CategoricalDtype(['0 - 10', '10 - 20', '90+'])
+        first = pandas.DataFrame({'age': pandas.Series(['0 - 10', '90+'], dtype=bands)})
+        # A batch with an invalid entry, which is an extra category
+        second = pandas.DataFrame({'age': pandas.Series(
+            ['10 - 20', '-3'], dtype=pandas.CategoricalDtype(list(bands.categories) + ['-3']))})
+        third = pandas.DataFrame({'age': ['90+', None]})
+        self.write('out', [first, second, third])
+        schema = pyarrow.parquet.read_schema(self.output_path('out'))
+        self.assertTrue(pyarrow.types.is_dictionary(schema.field('age').type))
+        results = self.read_output('out')['age']
+        self.assertEqual(list(results[:5]), ['0 - 10', '90+', '10 - 20', '-3', '90+'])
+        self.assertTrue(pandas.isna(results[5]))
+
+    def test_stores_columns_empty_on_the_first_chunk_as_strings(self):
+        first = pandas.DataFrame({'note': [None] * 3})
+        self.write('out', [first, pandas.DataFrame({'note': ['hello']})])
+        self.assertEqual(list(self.read_output('out')['note']), [None] * 3 + ['hello'])
+
+    def test_writes_an_empty_file_without_rows(self):
+        self.write('out', [])
+        self.assertTrue(self.read_output('out').empty)
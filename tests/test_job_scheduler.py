@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from fitfile.data_managers import (
+    CsvDataManager,
+    JsonDataManager,
+)
+from fitfile.data_rules import (
+    AgeBandRule,
+    PostCodeTrimToThreeRule,
+)
+from fitfile.job_scheduler import (
+    JobScheduler,
+    job_log_file_name,
+)
+
+data_dir = os.path.join(os.path.dirname(__file__), '../20230320_FITFILEPythonTest')
+
+
+class JobSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def make_jobs(self):
+        csv_job = CsvDataManager(
+            input_file_path=os.path.join(data_dir, 'customer.csv'),
+            output_file_path=os.path.join(self.output_dir.name, 'customerOutput.json'),
+            request_id='123',
+        )
+        csv_job.set_rules([AgeBandRule(fields=['dob'], logger=csv_job.logger)])
+        json_job = JsonDataManager(
+            input_file_path=os.path.join(data_dir, 'PatientCohorts.json'),
+            output_file_path=os.path.join(self.output_dir.name, 'PatientCohortsOutput.json'),
+            request_id='7282',
+        )
+        json_job.set_rules([
+            AgeBandRule(fields=['age'], logger=json_job.logger),
+            PostCodeTrimToThreeRule(fields=['PostCode'], logger=json_job.logger),
+        ])
+        return [csv_job, json_job]
+
+    def run_scheduler(self, workers, jobs=None):
+        scheduler = JobScheduler(workers=workers, log_dir=self.output_dir.name)
+        for job in jobs or self.make_jobs():
+            scheduler.add_job(job)
+        scheduler.run()
+        return scheduler
+
+    def test_aggregates_job_statuses(self):
+        scheduler = self.run_scheduler(workers=1)
+        # customer.csv has malformed dates of birth
+        self.assertEqual(scheduler.statuses, {'123': 'FAIL', '7282': 'SUCCESS'})
+        self.assertEqual(scheduler.exit_code, 1)
+
+    def test_runs_jobs_on_a_process_pool(self):
+        scheduler = self.run_scheduler(workers=2)
+        self.assertEqual(scheduler.statuses, {'123': 'FAIL', '7282': 'SUCCESS'})
+        for job in scheduler.jobs:
+            self.assertTrue(os.path.exists(job.output_file_path))
+
+    def test_writes_one_log_file_per_job(self):
+        scheduler = self.run_scheduler(workers=2)
+        for job in scheduler.jobs:
+            with open(os.path.join(self.output_dir.name, job_log_file_name(job))) as log_file:
+                self.assertIn('request ID: {}'.format(job.request_id), log_file.read())
+
+    def test_exit_code_is_zero_when_all_jobs_succeed(self):
+        scheduler = self.run_scheduler(workers=1, jobs=self.make_jobs()[1:])
+        self.assertEqual(scheduler.exit_code, 0)
+
+    def test_a_job_raising_an_exception_fails(self):
+        job = CsvDataManager(
+            input_file_path=os.path.join(self.output_dir.name, 'missing.csv'),
+            output_file_path=os.path.join(self.output_dir.name, 'missing.json'),
+            request_id='404',
+        )
+        scheduler = self.run_scheduler(workers=2, jobs=[job])
+        self.assertEqual(scheduler.statuses, {'404': 'FAIL'})
+
+    def test_fails_on_duplicate_request_ids(self):
+        scheduler = JobScheduler()
+        scheduler.add_job(self.make_jobs()[0])
+        with self.assertRaises(ValueError):
+            scheduler.add_job(self.make_jobs()[0])
+
+    def test_log_file_name(self):
+        self.assertEqual(job_log_file_name(self.make_jobs()[0]), 'CsvProcessing_123.log')
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+from fitfile.job_service import (
+    QUEUED,
+    JobService,
+    JobServiceBusy,
+    JobServiceConflict,
+)
+from fitfile.data_rules.postcode_trim_to_three_rule import (
+    POSTCODE_CACHE_SIZE,
+    postcode_validation_cache,
+    resize_postcode_validation_cache,
+)
+from fitfile.manifest import ManifestException
+
+data_dir = os.path.join(os.path.dirname(__file__), '../20230320_FITFILEPythonTest')
+
+
+def copy_inputs(base_dir):
+    for input_name in ['PatientCohorts.json', 'customer.csv']:
+        shutil.copy(os.path.join(data_dir, input_name), base_dir)
+
+
+def job_spec(request_id, input_name='PatientCohorts.json'):
+    return {
+        'request_id': request_id,
+        'input': input_name,
+        'output': '{}.json'.format(request_id),
+        'write_report': False,
+        'rules': [{'rule': 'PostCodeTrimToThreeRule', 'fields': ['PostCode']}],
+    }
+
+
+class JobServiceTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+        copy_inputs(self.output_dir.name)
+        self.service = JobService(max_pending=2, base_dir=self.output_dir.name)
+
+    async def asyncTearDown(self):
+        await self.service.stop()
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def spec(self, request_id, input_name='PatientCohorts.json'):
+        return job_spec(request_id, input_name)
+
+    async def request(self, method, path, body=None):
+        content = b'' if body is None else json.dumps(body).encode()
+        server = await asyncio.start_server(self.service.handle_connection, '127.0.0.1', 0)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write('{} {} HTTP/1.1\r\nContent-Length: {}\r\n\r\n'.format(
+                method, path, len(content)).encode() + content)
+            response = await reader.read()
+            writer.close()
+        head, _, content = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(content)
+
+    async def test_runs_submitted_jobs(self):
+        self.service.start()
+        job = self.service.submit(self.spec('7282'))
+        self.assertEqual(job['status'], QUEUED)
+        await self.service.join()
+        self.assertEqual(job['status'], 'SUCCESS')
+        self.assertEqual(job['run_report']['request_id'], '7282')
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir.name, '7282.json')))
+
+    async def test_reports_failed_jobs(self):
+        self.service.start()
+        # customer.csv has malformed dates of birth
+        failed = self.service.submit(dict(self.spec('123', 'customer.csv'), rules=[
+            {'rule': 'AgeBandRule', 'fields': ['dob']}]))
+        missing = self.service.submit(self.spec('404', 'missing.csv'))
+        await self.service.join()
+        self.assertEqual((failed['status'], failed['exception']), ('FAIL', None))
+        self.assertEqual(missing['status'], 'FAIL')
+        self.assertIn('FileNotFoundError', missing['exception'])
+
+    async def test_refuses_jobs_past_max_pending(self):
+        self.service.submit(self.spec('1'))
+        self.service.submit(self.spec('2'))
+        with self.assertRaises(JobServiceBusy):
+            self.service.submit(self.spec('3'))
+        self.assertEqual(self.service.status()['queued'], 2)
+
+    async def test_refuses_jobs_sharing_a_request_id_or_output_with_an_active_job(self):
+        self.service.max_pending = 3
+        self.service.submit(self.spec('1'))
+        with self.assertRaisesRegex(JobServiceConflict, 'request ID 1'):
+            self.service.submit(dict(self.spec('1'), output='other.json'))
+        with self.assertRaisesRegex(JobServiceConflict, '1.json'):
+            self.service.submit(dict(self.spec('2'), output='./1.json'))
+        self.assertEqual(self.service.status()['queued'], 1)
+        self.service.start()
+        await self.service.join()
+        self.assertEqual(self.service.submit(self.spec('1'))['status'], QUEUED)
+
+    async def test_forgets_the_oldest_finished_jobs(self):
+        self.service.max_finished = 1
+        self.service.start()
+        first = self.service.submit(self.spec('1'))
+        second = self.service.submit(self.spec('2'))
+        await self.service.join()
+        self.assertEqual(list(self.service.jobs), [second['id']])
+        self.assertNotIn(first['id'], self.service.jobs)
+
+    def test_refuses_paths_outside_of_the_base_dir(self):
+        for key, path in [('input', os.path.join(data_dir, 'PatientCohorts.json')),
+                          ('output', '../1.json'), ('input_cache', '/tmp/cache')]:
+            with self.assertRaisesRegex(ManifestException, 'outside'):
+                self.service.submit(dict(self.spec('1'), **{key: path}))
+        os.symlink(data_dir, os.path.join(self.output_dir.name, 'link'))
+        with self.assertRaisesRegex(ManifestException, 'outside'):
+            self.service.submit(self.spec('1', 'link/PatientCohorts.json'))
+        self.assertEqual(self.service.status()['queued'], 0)
+
+    def test_refuses_keys_outside_of_the_spec_keys(self):
+        with self.assertRaisesRegex(ManifestException, 'shards'):
+            self.service.submit(dict(self.spec('1'), shards=10 ** 6))
+        with self.assertRaisesRegex(ManifestException, 'logger'):
+            self.service.submit(dict(self.spec('1'), rules=[
+                {'rule': 'AgeBandRule', 'fields': ['age'], 'logger': None}]))
+        self.assertEqual(self.service.status()['queued'], 0)
+
+    async def test_http_api(self):
+        code, job = await self.request('POST', '/jobs', self.spec('7282'))
+        self.assertEqual((code, job['status']), (202, QUEUED))
+        code, listed = await self.request('GET', '/jobs')
+        self.assertEqual((code, [entry['id'] for entry in listed]), (200, [job['id']]))
+        code, status = await self.request('GET', '/status')
+        self.assertEqual((code, status['queued']), (200, 1))
+        self.service.start()
+        await self.service.join()
+        code, job = await self.request('GET', '/jobs/{}'.format(job['id']))
+        self.assertEqual((code, job['status']), (200, 'SUCCESS'))
+
+    async def test_http_api_errors(self):
+        self.assertEqual((await self.request('GET', '/jobs/99'))[0], 404)
+        self.assertEqual((await self.request('GET', '/nope'))[0], 404)
+        self.assertEqual((await self.request('DELETE', '/jobs'))[0], 405)
+        code, response = await self.request('POST', '/jobs', {'request_id': '1'})
+        self.assertEqual(code, 400)
+        self.assertIn('missing', response['error'])
+        await self.request('POST', '/jobs', self.spec('1'))
+        self.assertEqual((await self.request('POST', '/jobs', self.spec('1')))[0], 409)
+        await self.request('POST', '/jobs', self.spec('2'))
+        self.assertEqual((await self.request('POST', '/jobs', self.spec('3')))[0], 503)
+
+
+class JobServiceProcessPoolTest(unittest.IsolatedAsyncioTestCase):
+    async def test_workers_use_the_postcode_cache_size_of_the_service(self):
+        start_method = multiprocessing.get_start_method()
+        multiprocessing.set_start_method('spawn', force=True)
+        resize_postcode_validation_cache(7)
+        service = JobService(workers=2)
+        try:
+            service.start()
+            size = await asyncio.get_event_loop().run_in_executor(
+                service._executor, getattr, postcode_validation_cache, 'maxsize')
+        finally:
+            await service.stop()
+            multiprocessing.set_start_method(start_method, force=True)
+            resize_postcode_validation_cache(POSTCODE_CACHE_SIZE)
+        self.assertEqual(size, 7)
+
+    async def test_runs_jobs_on_a_process_pool(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            copy_inputs(output_dir)
+            service = JobService(workers=2, base_dir=output_dir, log_dir=output_dir)
+            service.start()
+            jobs = [service.submit(job_spec(request_id)) for request_id in '123']
+            await service.join()
+            await service.stop()
+            self.assertEqual([job['status'] for job in jobs], ['SUCCESS'] * 3)
+            self.assertTrue(os.path.exists(os.path.join(output_dir, 'JsonProcessing_1.log')))
+
+
+if __name__ == '__main__':
+    unittest.main()
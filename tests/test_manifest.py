@@ -0,0 +1,130 @@
+import json
+import os
+import tempfile
+import unittest
+
+from fitfile.data_managers import (
+    CsvDataManager,
+    ExcelDataManager,
+)
+from fitfile.data_rules import (
+    PostCodeTrimToThreeRule,
+    PostCodeTrimToTwoRule,
+)
+from fitfile.manifest import (
+    ManifestException,
+    build_jobs,
+    load_manifest,
+)
+from fitfile.run_jobs import main
+
+data_dir = os.path.join(os.path.dirname(__file__), '../20230320_FITFILEPythonTest')
+
+toml_manifest = '''
+[[jobs]]
+request_id = "92421"
+input = "ResearchList.xlsx"
+output = "ResearchListOutput.json"
+
+[[jobs.rules]]
+rule = "PostCodeTrimToThreeRule"
+fields = ["PostCode"]
+
+[[jobs.rules]]
+rule = "PostCodeTrimToTwoRule"
+fields = ["PostCode"]
+'''
+
+
+class ManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def write_manifest(self, name, content):
+        manifest_path = os.path.join(self.output_dir.name, name)
+        with open(manifest_path, 'w') as manifest_file:
+            manifest_file.write(content)
+        return manifest_path
+
+    def test_builds_jobs_and_rules_in_order(self):
+        jobs = build_jobs(load_manifest(self.write_manifest('jobs.toml', toml_manifest)),
+                          data_dir)
+        self.assertEqual(len(jobs), 1)
+        self.assertIsInstance(jobs[0], ExcelDataManager)
+        self.assertEqual(jobs[0].request_id, '92421')
+        self.assertEqual([type(rule) for rule in jobs[0].rules],
+                         [PostCodeTrimToThreeRule, PostCodeTrimToTwoRule])
+        self.assertEqual(jobs[0].rules[0].fields, ['PostCode'])
+        self.assertIs(jobs[0].rules[0].logger, jobs[0].logger)
+
+    def test_passes_extra_keys_to_the_data_manager(self):
+        manifest = {'jobs': [{'request_id': 123, 'format': 'csv', 'input': 'in.txt',
+                              'output': 'out.json', 'chunksize': 10}]}
+        job = build_jobs(manifest)[0]
+        self.assertIsInstance(job, CsvDataManager)
+        self.assertEqual(job.chunksize, 10)
+        self.assertEqual(job.request_id, '123')
+
+    def test_resolves_the_input_cache_against_the_manifest_directory(self):
+        manifest = {'jobs': [{'request_id': '1', 'input': 'in.csv', 'output': 'out.json',
+                              'input_cache': 'cache'}]}
+        job = build_jobs(manifest, self.output_dir.name)[0]
+        self.assertEqual(job.input_cache.cache_dir, os.path.join(self.output_dir.name, 'cache'))
+
+    def test_fails_on_unknown_rules(self):
+        manifest = {'jobs': [{'request_id': '1', 'input': 'in.csv', 'output': 'out.json',
+                              'rules': [{'rule': 'NoSuchRule', 'fields': ['dob']}]}]}
+        with self.assertRaises(ManifestException):
+            build_jobs(manifest)
+
+    def test_fails_on_unknown_formats(self):
+        manifest = {'jobs': [{'request_id': '1', 'input': 'in.parquet', 'output': 'out.json'}]}
+        with self.assertRaises(ManifestException):
+            build_jobs(manifest)
+
+    def test_fails_on_legacy_excel_workbooks(self):
+        for job in [{}, {'format': 'excel'}]:
+            manifest = {'jobs': [dict(job, request_id='1', input='in.xls', output='out.json')]}
+            with self.assertRaisesRegex(ManifestException, 'xlsx'):
+                build_jobs(manifest)
+
+    def test_fails_on_missing_keys(self):
+        with self.assertRaises(ManifestException):
+            build_jobs({'jobs': [{'request_id': '1', 'input': 'in.csv'}]})
+
+    def test_fails_on_duplicate_request_ids(self):
+        job = {'request_id': 'R1', 'input': 'in.csv', 'output': 'out.json'}
+        with self.assertRaises(ManifestException):
+            build_jobs({'jobs': [job, dict(job, output='other.json')]})
+
+    def test_fails_without_jobs(self):
+        with self.assertRaises(ManifestException):
+            load_manifest(self.write_manifest('jobs.json', '{}'))
+
+    def test_runs_a_json_manifest_from_the_command_line(self):
+        manifest = {'jobs': [{
+            'request_id': '7282',
+            'input': os.path.abspath(os.path.join(data_dir, 'PatientCohorts.json')),
+            'output': 'PatientCohortsOutput.json',
+            'rules': [{'rule': 'AgeBandRule', 'fields': ['age']}],
+        }]}
+        manifest_path = self.write_manifest('jobs.json', json.dumps(manifest))
+        self.assertEqual(main(['run', '--manifest', manifest_path]), 0)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.output_dir.name, 'PatientCohortsOutput.json')))
+
+    def test_command_line_input_cache_is_shared_by_the_jobs(self):
+        manifest = {'jobs': [{
+            'request_id': '7282-{}'.format(index),
+            'input': os.path.abspath(os.path.join(data_dir, 'PatientCohorts.json')),
+            'output': 'PatientCohortsOutput{}.json'.format(index),
+            'rules': [{'rule': 'AgeBandRule', 'fields': ['age']}],
+        } for index in range(2)]}
+        manifest_path = self.write_manifest('jobs.json', json.dumps(manifest))
+        cache_dir = os.path.join(self.output_dir.name, 'cache')
+        self.assertEqual(main(['run', '--manifest', manifest_path, '--workers', '1',
+                               '--input-cache', cache_dir]), 0)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)